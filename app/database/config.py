@@ -21,6 +21,13 @@ def init_db(app):
     from ..models.realtime import HydroRealtimeData, NaturalGasRealtimeData
     from ..models.production import ProductionData
     from ..models.demand import DemandData
+    from ..models.rolling import RollingDailyState
+    from ..models.demand_rollup import DemandDailyRollup, DemandWeeklyRollup, DemandMonthlyRollup
+    from ..models.sync_state import SyncWatermark
+    from ..models.combined_solar import CombinedSolarHourly
+    from ..models.forecast_metrics import ForecastErrorDaily
+    from ..models.feature_store import ChronosFeatureHourly
+    from ..models.meteologica_hourly import MeteologicaHourly
     from ..models.forecasting import UnlicensedSolar, LicensedSolar, Wind, DamHydro, RunOfRiverHydro, Demand, SystemDirection
     
     # Create all tables
@@ -0,0 +1,201 @@
+"""
+The process-wide Supabase engine, sized for the pooler it connects through, with checkout metrics
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_HOST = os.getenv('SUPABASE_HOST', 'aws-0-us-east-2.pooler.supabase.com')
+# 'session': every client connection holds a server connection (port 5432).
+# 'transaction': server connections are shared between transactions (port 6543),
+# so no session state (SET, temp tables, advisory locks) survives a commit.
+SUPABASE_POOL_MODE = os.getenv('SUPABASE_POOL_MODE', 'session')
+_POOLER_PORTS = {'session': 5432, 'transaction': 6543}
+
+# Session-mode client connections the whole app may hold at once (all web workers,
+# the scheduler included: it runs inside one of them), kept under the pooler's pool size
+SUPABASE_CONNECTION_BUDGET = int(os.getenv('SUPABASE_CONNECTION_BUDGET', '12'))
+
+POOL_TIMEOUT_SECONDS = 30
+POOL_RECYCLE_SECONDS = 1800
+# Checkouts that waited longer than this are logged with the pool status
+SLOW_CHECKOUT_SECONDS = 1.0
+
+
+def pool_sizing(mode=None, workers=None, threads=None, budget=None):
+    """``(pool_size, max_overflow)`` for one process.
+
+    ``workers`` and ``threads`` default to WEB_CONCURRENCY and GUNICORN_THREADS,
+    the values gunicorn_config.py runs with.  In session mode the connection
+    budget is split between the web workers, each keeping one connection per
+    request thread and the rest of its share as overflow (the worker holding
+    the scheduler lock runs the jobs on it); in transaction mode client
+    connections are cheap, so every thread gets one plus the same again as
+    overflow.  SUPABASE_POOL_SIZE / SUPABASE_MAX_OVERFLOW override both.
+    """
+    if os.getenv('SUPABASE_POOL_SIZE'):
+        return int(os.getenv('SUPABASE_POOL_SIZE')), int(os.getenv('SUPABASE_MAX_OVERFLOW', '0'))
+    mode = mode or SUPABASE_POOL_MODE
+    workers = workers or int(os.getenv('WEB_CONCURRENCY', '2'))
+    threads = threads or int(os.getenv('GUNICORN_THREADS', '4'))
+    if mode == 'transaction':
+        return threads, threads
+    per_process = max(1, (budget or SUPABASE_CONNECTION_BUDGET) // workers)
+    pool_size = min(threads, per_process)
+    return pool_size, per_process - pool_size
+
+
+class PoolMetrics:
+    """Checkout counts, waits and connection churn of one engine's pool."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.peak_checked_out = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.slow_checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+
+    def waited(self, seconds, pool):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+            slow = seconds >= SLOW_CHECKOUT_SECONDS
+            if slow:
+                self.slow_checkouts += 1
+        if slow:
+            logger.warning("%s pool checkout waited %.2fs (%s)", self.name, seconds, pool.status())
+
+    def timed_out(self, seconds, pool):
+        with self._lock:
+            self.timeouts += 1
+        logger.error("%s pool checkout timed out after %.2fs (%s)", self.name, seconds, pool.status())
+
+    def connected(self):
+        with self._lock:
+            self.connects += 1
+
+    def invalidated(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self, pool):
+        with self._lock:
+            return {
+                'name': self.name,
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+                'peak_checked_out': self.peak_checked_out,
+                'checkouts': self.checkouts,
+                'avg_wait_ms': round(self.wait_seconds_total / self.checkouts * 1000, 2) if self.checkouts else 0,
+                'max_wait_ms': round(self.wait_seconds_max * 1000, 2),
+                'slow_checkouts': self.slow_checkouts,
+                'timeouts': self.timeouts,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+            }
+
+
+class _MeteredQueuePool(QueuePool):
+    """QueuePool that times how long each checkout waited for a connection."""
+
+    metrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timed_out(time.perf_counter() - started, self)
+            raise
+        self.metrics.waited(time.perf_counter() - started, self)
+        return connection
+
+
+def _supabase_url():
+    sb_user = os.getenv("SUPABASE_USER")
+    sb_password = os.getenv("SUPABASE_PASSWORD")
+    if not sb_user or not sb_password:
+        raise RuntimeError("SUPABASE_USER / SUPABASE_PASSWORD not set")
+    port = os.getenv('SUPABASE_PORT') or _POOLER_PORTS.get(SUPABASE_POOL_MODE, 5432)
+    return f"postgresql+psycopg2://{sb_user}:{sb_password}@{SUPABASE_HOST}:{port}/postgres"
+
+
+def _build_supabase():
+    metrics = PoolMetrics('supabase')
+    pool_size, max_overflow = pool_sizing()
+    engine = create_engine(
+        _supabase_url(),
+        # A subclass per engine so pool.recreate() (which uses self.__class__) keeps the metrics
+        poolclass=type('SupabaseQueuePool', (_MeteredQueuePool,), {'metrics': metrics}),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=POOL_TIMEOUT_SECONDS,
+        pool_recycle=POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+        # Roll back on checkin so a pooler in transaction mode can hand the server connection on
+        pool_reset_on_return='rollback',
+        connect_args={'connect_timeout': 10, 'application_name': 'rwe-dashboard'},
+    )
+
+    @event.listens_for(engine, 'connect')
+    def _connected(dbapi_connection, connection_record):
+        metrics.connected()
+
+    @event.listens_for(engine, 'invalidate')
+    def _invalidated(dbapi_connection, connection_record, exception):
+        metrics.invalidated()
+
+    logger.info("Supabase engine: %s mode, pool_size=%d, max_overflow=%d",
+                SUPABASE_POOL_MODE, pool_size, max_overflow)
+    return engine
+
+
+_BUILDERS = {'supabase': _build_supabase}
+_engines = {}
+_lock = threading.Lock()
+
+
+def get_engine(name='supabase'):
+    """The shared engine called ``name``, created on first use in this process."""
+    with _lock:
+        if name not in _engines:
+            _engines[name] = _BUILDERS[name]()
+        return _engines[name]
+
+
+def get_supabase_engine():
+    """The one Supabase engine of this process."""
+    return get_engine('supabase')
+
+
+def pool_stats():
+    """Metrics of every engine created so far, keyed by name."""
+    with _lock:
+        engines = dict(_engines)
+    return {name: engine.pool.metrics.snapshot(engine.pool) for name, engine in engines.items()}
+
+
+def _reset_after_fork():
+    # A forked child must not reuse the parent's sockets; it builds its own engines
+    for engine in _engines.values():
+        engine.dispose(close=False)
+    _engines.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -2,45 +2,37 @@ import pandas as pd
 import numpy as np
 import pytz
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, pool, text
+from sqlalchemy import text
 import os
 from dotenv import load_dotenv
 import time
 import random
+import threading
+from ..services.market_mirror import market_engine
+from ..services.meteologica_hourly import read_hourly
 # darts imported lazily inside functions to reduce per-worker memory on Render
 
 # Load environment variables
 load_dotenv()
 
-_engine = None
+# Tables build_chronos_features and the forecasting routes read
+FORECASTING_TABLES = [
+    ('meteologica', 'unlicensed_solar'), ('meteologica', 'licensed_solar'), ('meteologica', 'wind'),
+    ('meteologica', 'dam_hydro'), ('meteologica', 'runofriver_hydro'), ('meteologica', 'demand'),
+    ('epias', 'smf'), ('epias', 'ptf'), ('epias', 'ramadan_dates'), ('epias', 'yal'),
+]
 
 def get_database_connection():
-    """Return the module-level Supabase engine, creating it once on first call."""
-    global _engine
-    if _engine is None:
-        sb_user = os.getenv("SUPABASE_USER")
-        sb_password = os.getenv("SUPABASE_PASSWORD")
-        if not sb_user or not sb_password:
-            raise ValueError("Database credentials not found in environment variables")
-        _engine = create_engine(
-            f"postgresql+psycopg2://{sb_user}:{sb_password}"
-            "@aws-0-us-east-2.pooler.supabase.com:5432/postgres",
-            poolclass=pool.QueuePool,
-            pool_size=3,
-            max_overflow=5,
-            pool_timeout=30,
-            pool_recycle=1800,
-            pool_pre_ping=True,
-        )
-    return _engine
-
-def fetch_with_retry(query, engine, max_retries=3):
+    """Engine for the forecasting reads: the local market mirror while fresh, else Supabase."""
+    return market_engine(*FORECASTING_TABLES)
+
+def fetch_with_retry(query, engine, max_retries=3, params=None):
     """Fetch data with retry logic to handle connection issues."""
     for attempt in range(max_retries):
         try:
             # Use an explicit connection to support both pandas 1.x and SQLAlchemy 2.x
             with engine.connect() as conn:
-                df = pd.read_sql(text(query), con=conn)
+                df = pd.read_sql(text(query), con=conn, params=params)
             return df
         except Exception as e:
             if "max clients reached" in str(e) and attempt < max_retries - 1:
@@ -53,10 +45,44 @@ def fetch_with_retry(query, engine, max_retries=3):
 
 CONTEXT_LENGTHS = {"Model 1": 168, "Model 2": 336}
 
-def fetch_generation_data(engine):
-    """Fetch generation data (wind/hydro/solar/demand) including future Meteologica forecasts."""
-    # 90 days covers the longest context window (336 h) plus warm-up margin many times over
-    query = """
+# Days of history a feature frame is built from; 90 days covers the longest
+# context window (336 h) plus warm-up margin many times over
+FEATURE_WINDOW_DAYS = 90
+# Leading rows dropped from a feature frame so smf_lag168 is defined everywhere
+WARMUP_HOURS = 168
+
+# Lag/MA columns derived from system_direction; only Model 2 keeps them
+SYSTEM_DIRECTION_FEATURES = ['system_direction_lag1', 'system_direction_ma3', 'system_direction_ma6', 'system_direction_ma12']
+
+_HOUR_PARTS = ['off-peak1', 'off-peak2', 'peak']
+_WEEK_PARTS = ['Saturday', 'Sunday', 'Weekday']
+
+def _since_clause(column, since):
+    """``(condition, params)`` bounding ``column`` to the default window or to ``since``."""
+    if since is None:
+        return f"{column} >= NOW() - INTERVAL '{FEATURE_WINDOW_DAYS} days'", None
+    return f"{column} >= :since", {'since': since}
+
+def fetch_generation_data(engine, since=None):
+    """Fetch generation data (wind/hydro/solar/demand) including future Meteologica forecasts.
+
+    Read from meteologica_hourly while it is fresh, otherwise by joining the
+    series tables on ``engine``.
+    """
+    # NOW() on the database is UTC
+    start = since if since is not None else datetime.utcnow() - timedelta(days=FEATURE_WINDOW_DAYS)
+    hourly = read_hourly(['demand', 'wind', 'dam_hydro', 'runofriver_hydro', 'unlicensed_solar', 'licensed_solar'], start)
+    if hourly is not None:
+        return pd.DataFrame({
+            'date': hourly['date'],
+            'demand': hourly['demand'],
+            'wind': hourly['wind'],
+            'hydro': hourly['dam_hydro'] + hourly['runofriver_hydro'],
+            'solar': hourly['unlicensed_solar'] + hourly['licensed_solar'],
+        })
+
+    condition, params = _since_clause('u."From-yyyy-mm-dd-hh-mm"::timestamp', since)
+    query = f"""
     SELECT u."From-yyyy-mm-dd-hh-mm" AS date,
     mdem.demand_forecast AS demand,
     w.wind_forecast AS wind,
@@ -68,27 +94,28 @@ def fetch_generation_data(engine):
     JOIN meteologica.dam_hydro dam on u."From-yyyy-mm-dd-hh-mm" = dam."From-yyyy-mm-dd-hh-mm"
     JOIN meteologica.runofriver_hydro r on u."From-yyyy-mm-dd-hh-mm" = r."From-yyyy-mm-dd-hh-mm"
     JOIN meteologica.demand mdem on u."From-yyyy-mm-dd-hh-mm" = mdem."From-yyyy-mm-dd-hh-mm"
-    WHERE u."From-yyyy-mm-dd-hh-mm"::timestamp >= NOW() - INTERVAL '90 days'
+    WHERE {condition}
     ORDER BY 1
     """
 
-    generation_df = fetch_with_retry(query, engine)
+    generation_df = fetch_with_retry(query, engine, params=params)
     generation_df['date'] = pd.to_datetime(generation_df['date']).dt.tz_localize(None)
     return generation_df
 
-def fetch_smf_ptf_data(engine):
+def fetch_smf_ptf_data(engine, since=None):
     """Fetch combined SMF + PTF data; PTF has future day-ahead prices, SMF is real-time."""
-    query = """
+    condition, params = _since_clause('ptf.date', since)
+    query = f"""
     SELECT ptf.date, smf."systemMarginalPrice" AS smf,
     ptf.price AS ptf,
     smf."systemMarginalPrice" - ptf.price AS smf_ptf_diff
     FROM epias.smf
     RIGHT JOIN epias.ptf ON smf.date = ptf.date
-    WHERE ptf.date >= NOW() - INTERVAL '90 days'
+    WHERE {condition}
     ORDER BY 1
     """
 
-    df = fetch_with_retry(query, engine)
+    df = fetch_with_retry(query, engine, params=params)
     df['date'] = pd.to_datetime(df['date']).dt.tz_localize(None)
     return df
 
@@ -99,21 +126,63 @@ def fetch_ramadan_data(engine):
     df['date'] = pd.to_datetime(df['date']).dt.normalize()
     return set(df['date'])
 
-def fetch_dgp_data(engine):
-    """Fetch DGP data from the database with retry logic."""
+def settled_cutoff():
+    """Start of yesterday in Turkey: system direction from here on comes from the uploaded Excel."""
     turkey_tz   = pytz.timezone("Europe/Istanbul")
     now_tr      = datetime.now(tz=turkey_tz)
     today_start = now_tr.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
-    d1_start    = today_start - timedelta(days=1)
-    
-    query = f"""
-    SELECT date, net AS system_direction FROM epias.yal
-    WHERE date < '{d1_start.isoformat().split('T')[0]}'
+    return today_start - timedelta(days=1)
+
+# Days of settled system direction fetch_dgp_data keeps: the feature window plus a day,
+# so every generation hour of a fallback build finds its value
+DGP_WINDOW_DAYS = FEATURE_WINDOW_DAYS + 1
+
+_dgp_lock  = threading.Lock()
+_dgp_cache = {'frame': None, 'newest': None}
+
+def fetch_dgp_data(engine):
+    """Settled system direction (epias.yal before yesterday) over the last DGP_WINDOW_DAYS.
+
+    Cached per process: after the first call only the hours newer than the
+    newest cached one are fetched, and hours that left the window are dropped.
     """
-    
-    dgp_df = fetch_with_retry(query, engine)
-    dgp_df['date'] = pd.to_datetime(dgp_df['date']).dt.tz_localize(None)
-    return dgp_df
+    d1_start     = settled_cutoff()
+    window_start = d1_start - timedelta(days=DGP_WINDOW_DAYS)
+
+    with _dgp_lock:
+        cached, newest = _dgp_cache['frame'], _dgp_cache['newest']
+
+    if newest is None:
+        query  = "SELECT date, net AS system_direction FROM epias.yal WHERE date >= :since AND date < :until"
+        params = {'since': window_start, 'until': d1_start}
+    else:
+        query  = "SELECT date, net AS system_direction FROM epias.yal WHERE date > :newest AND date < :until"
+        params = {'newest': newest, 'until': d1_start}
+
+    new_df = fetch_with_retry(query, engine, params=params)
+    new_df['date'] = pd.to_datetime(new_df['date']).dt.tz_localize(None)
+
+    if cached is None:
+        dgp_df = new_df
+    else:
+        dgp_df = pd.concat([cached, new_df]) if not new_df.empty else cached
+    dgp_df = (
+        dgp_df[dgp_df['date'] >= window_start]
+        .drop_duplicates(subset=['date'], keep='last')
+        .sort_values('date')
+        .reset_index(drop=True)
+    )
+    with _dgp_lock:
+        _dgp_cache['frame']  = dgp_df
+        _dgp_cache['newest'] = dgp_df['date'].max().to_pydatetime() if not dgp_df.empty else None
+    return dgp_df.copy()
+
+def fetch_system_direction(engine, since):
+    """Published system direction (epias.yal) from ``since`` on, including hours after yesterday."""
+    query = "SELECT date, net AS system_direction FROM epias.yal WHERE date >= :since"
+    df = fetch_with_retry(query, engine, params={'since': since})
+    df['date'] = pd.to_datetime(df['date']).dt.tz_localize(None)
+    return df
 
 def process_excel_data(excel_data):
     """Process uploaded Excel data.
@@ -152,88 +221,127 @@ def process_excel_data(excel_data):
     print(f"Processed Excel data: {n} rows from {d1_start} to {settled['date'].max()}")
     return settled
 
-def build_chronos_features(engine, excel_data, model_name, lagged_hour_selection=1):
-    """Build a fully feature-engineered flat DataFrame for Chronos-2 predict_df.
-
-    Returns a single DataFrame with:
-    - All feature columns (demand, wind, hydro, solar, lags, MAs, temporal, etc.)
-    - system_direction column: real values for historical rows, NaN for future rows
-    - id = 'DF', date column (not index)
-
-    Caller splits into train/covariates based on system_direction nullability.
+def merge_excel_tail(dgp_df, excel_data):
+    """System direction with the settled hours of the uploaded Excel laid over it."""
+    if excel_data is None:
+        return dgp_df
+    today_df = process_excel_data(excel_data)
+    if today_df.empty:
+        return dgp_df
+    return (
+        pd.concat([dgp_df, today_df])
+        .drop_duplicates(subset=['date'], keep='last')
+        .sort_values('date')
+        .reset_index(drop=True)
+    )
+
+def engineer_features(generation_df, smf_ptf_df, dgp_df, ramadan_dates):
+    """Date-indexed feature frame of every model, before the warm-up rows are dropped.
+
+    Everything except the system_direction lags/MAs (see add_system_direction_features),
+    so it only depends on the database and can be stored.
     """
-    ctx_len = CONTEXT_LENGTHS.get(model_name, 168)
-
-    # 1. Fetch data
-    generation_df = fetch_generation_data(engine)
-    smf_ptf_df    = fetch_smf_ptf_data(engine)
-    dgp_df        = fetch_dgp_data(engine)
-    ramadan_dates = fetch_ramadan_data(engine)
-
-    # 2. Merge today's Excel data into system_direction
-    if excel_data is not None:
-        today_df = process_excel_data(excel_data)
-        if not today_df.empty:
-            dgp_df = (
-                pd.concat([dgp_df, today_df])
-                .drop_duplicates(subset=['date'], keep='last')
-                .sort_values('date')
-                .reset_index(drop=True)
-            )
-
-    # 3. Merge all sources on date
+    # Merge all sources on date
     df = pd.merge(generation_df, smf_ptf_df, on='date', how='left')
     df = pd.merge(df, dgp_df, on='date', how='left')
     df = df.drop_duplicates(subset=['date'], keep='last').sort_values('date')
     df.set_index('date', inplace=True)
 
-    # 4. Holiday flags using the `holidays` package (no Darts dependency needed)
+    # Holiday flags using the `holidays` package (no Darts dependency needed)
     import holidays as _holidays_lib
     tr_holidays = _holidays_lib.Turkey(years=sorted(df.index.year.unique().tolist()))
     df['is_holiday'] = df.index.normalize().isin(tr_holidays).astype(float)
 
-    # 5. Ramadan flag
+    # Ramadan flag
     df['is_ramadan'] = df.index.normalize().isin(ramadan_dates).astype(float)
 
-    # 6. Temporal features
+    # Temporal features; fixed categories so a short frame still gets every dummy column
     df['hour'] = df.index.hour.astype(float)
     hour_map = {h: ('off-peak1' if h < 10 else ('peak' if h >= 18 else 'off-peak2')) for h in range(24)}
-    df['is_peak'] = df.index.hour.map(hour_map)
-    unique_days = df.index.day_name().unique()
-    day_map = {d: ('Sunday' if d == 'Sunday' else ('Saturday' if d == 'Saturday' else 'Weekday')) for d in unique_days}
-    df['week_part'] = df.index.day_name().map(day_map)
+    df['is_peak'] = pd.Categorical(df.index.hour.map(hour_map), categories=_HOUR_PARTS)
+    day_names = df.index.day_name()
+    df['week_part'] = pd.Categorical(day_names.where(day_names.isin(['Saturday', 'Sunday']), 'Weekday'),
+                                     categories=_WEEK_PARTS)
     df = pd.get_dummies(df, dtype='float')
 
-    # 7. Derived demand features
+    # Derived demand features
     df['demand_renewable_diff'] = df['demand'] - df['wind'] - df['solar'] - df['hydro']
     df['demand_diff24'] = df['demand'].diff(24)
 
-    # 8. Price lag features
+    # Price lag features
     df['smf_lag24']        = df['smf'].shift(24)
     df['smf_lag168']       = df['smf'].shift(168)
     df['smf_ptf_diff_lag24'] = df['smf_ptf_diff'].shift(24)
     # Keep ptf (used for known_price_length) but drop raw smf and smf_ptf_diff
     df.drop(columns=['smf', 'smf_ptf_diff'], inplace=True, errors='ignore')
+    return df
 
-    # 9. System direction lags and rolling averages
+def add_system_direction_features(df, model_name):
+    """System direction lags and rolling averages (Model 2 only), in place."""
+    df.drop(columns=SYSTEM_DIRECTION_FEATURES, inplace=True, errors='ignore')
+    if model_name == "Model 1":
+        return df
     lagged_hour_selection = 1
     df['system_direction_lag1'] = df['system_direction'].shift(lagged_hour_selection)
     df['system_direction_ma3']  = df['system_direction'].rolling(3).mean().shift(lagged_hour_selection)
     df['system_direction_ma6']  = df['system_direction'].rolling(6).mean().shift(lagged_hour_selection)
     df['system_direction_ma12'] = df['system_direction'].rolling(12).mean().shift(lagged_hour_selection)
+    return df
 
-    if model_name == "Model 1":
-        df.drop(columns=['system_direction_lag1', 'system_direction_ma3', 'system_direction_ma6', 'system_direction_ma12'], inplace=True, errors='ignore')
-
-    # 10. Drop warmup rows needed for smf_lag168
-    df = df.iloc[168:].copy()
+def finish_chronos_frame(df):
+    """Drop the warm-up rows and flatten; returns ``(df, known_price_length)``."""
+    # Drop warmup rows needed for smf_lag168
+    df = df.iloc[WARMUP_HOURS:].copy()
 
-    # 11. Compute known_price_length: future rows where PTF price is available
+    # Compute known_price_length: future rows where PTF price is available
     test_df = df[-df['system_direction'].isnull().sum():]
     known_price_length = min(len(test_df[test_df['ptf'].notnull()]), len(test_df[test_df['smf_lag24'].notnull()]))
 
-    # 12. Flatten: reset index, add id column
+    # Flatten: reset index, add id column
     df.reset_index(inplace=True)
     df['id'] = 'DF'
 
-    return df, known_price_length
\ No newline at end of file
+    return df, known_price_length
+
+def stored_chronos_features(excel_data, model_name):
+    """build_chronos_features from the feature store, or None while the store is stale.
+
+    Only the uploaded Excel tail is merged in and the system_direction lags are
+    recomputed over it; everything else is read as stored.
+    """
+    from ..services.feature_store import stored_features
+
+    df = stored_features(model_name)
+    if df is None:
+        return None
+    # Hours from yesterday on come from the Excel, exactly as fetch_dgp_data leaves them
+    df.loc[df.index >= settled_cutoff(), 'system_direction'] = np.nan
+    if excel_data is not None:
+        tail = process_excel_data(excel_data).set_index('date')['system_direction']
+        tail = tail[tail.index.isin(df.index)]
+        df.loc[tail.index, 'system_direction'] = tail
+    return finish_chronos_frame(add_system_direction_features(df, model_name))
+
+def build_chronos_features(engine, excel_data, model_name, lagged_hour_selection=1):
+    """Build a fully feature-engineered flat DataFrame for Chronos-2 predict_df.
+
+    Returns a single DataFrame with:
+    - All feature columns (demand, wind, hydro, solar, lags, MAs, temporal, etc.)
+    - system_direction column: real values for historical rows, NaN for future rows
+    - id = 'DF', date column (not index)
+
+    Caller splits into train/covariates based on system_direction nullability.
+    Served from the feature store while it is fresh, otherwise built from the
+    source tables.
+    """
+    stored = stored_chronos_features(excel_data, model_name)
+    if stored is not None:
+        return stored
+
+    generation_df = fetch_generation_data(engine)
+    smf_ptf_df    = fetch_smf_ptf_data(engine)
+    dgp_df        = merge_excel_tail(fetch_dgp_data(engine), excel_data)
+    ramadan_dates = fetch_ramadan_data(engine)
+
+    df = engineer_features(generation_df, smf_ptf_df, dgp_df, ramadan_dates)
+    return finish_chronos_frame(add_system_direction_features(df, model_name))
@@ -1,7 +1,7 @@
 import sys
 import time
 from datetime import datetime, timedelta, timezone
-from flask import abort, app, Blueprint, session, render_template, redirect, url_for, Response, request, jsonify, Request, Response, current_app, flash, send_file
+from flask import abort, app, Blueprint, session, render_template, redirect, url_for, Response, request, jsonify, Request, Response, current_app, flash, send_file, stream_with_context
 from requests import post, Session
 from .functions import get_tgt_token, asutc, invalidates_or_none, fetch_plant_data, login_required
 from requests.adapters import HTTPAdapter
@@ -23,33 +23,27 @@ from app.models.demand import DemandData
 from sqlalchemy import extract
 from app.models.unlicensed_solar import UnlicensedSolarData
 from app.models.licensed_solar import LicensedSolarData
+from app.models.combined_solar import CombinedSolarHourly
 import zipfile
 import tempfile
 from dotenv import load_dotenv
 import psycopg2
-from sqlalchemy import create_engine, pool
 from sqlalchemy.exc import IntegrityError
-
-_supabase_engine = None
-
-def _get_supabase_engine():
-    global _supabase_engine
-    if _supabase_engine is None:
-        sb_user = os.getenv("SUPABASE_USER")
-        sb_password = os.getenv("SUPABASE_PASSWORD")
-        if not sb_user or not sb_password:
-            raise RuntimeError("SUPABASE_USER / SUPABASE_PASSWORD not set")
-        _supabase_engine = create_engine(
-            f"postgresql+psycopg2://{sb_user}:{sb_password}"
-            "@aws-0-us-east-2.pooler.supabase.com:5432/postgres",
-            poolclass=pool.QueuePool,
-            pool_size=3,
-            max_overflow=5,
-            pool_timeout=30,
-            pool_recycle=1800,
-            pool_pre_ping=True,
-        )
-    return _supabase_engine
+from .services.ingest import fill_production_gaps, DEMAND_REVISIONS_WATERMARK
+from .services.watermarks import get_watermark, request_run
+from .services.solar_sync import SOLAR_WATERMARK
+from .services.export import stream_series, EXPORT_SERIES, EXPORT_FORMATS, XLSX_MIMETYPE, build_workbook, iter_file, write_frame
+from .services.downsample import parse_max_points, downsample_records
+from .services.rolling import refresh_rolling_state, has_rolling_state, rolling_series_for_year
+from .services.demand_rollups import ensure_demand_rollups, refresh_demand_rollups
+from .services.forecast_performance import comparison_frame, comparison_tables
+from .services.forecast_metrics import window_metrics, metrics_trend, FORECAST_METRICS_WATERMARK
+from .services.merit_order import (
+    merit_order_comparison, current_outages, today_aic, load_prediction, load_forecast_reference,
+    evaluate_scenarios, scenario_error, MeritOrderCurves, MERIT_ORDER_TABLES, MAX_SCENARIOS, SUPPLY_DEMAND_QUERY,
+)
+from .services.market_mirror import market_engine, mirror_status
+from .database.supabase import get_supabase_engine, pool_stats
 
 # Conditionally set pandas option if it exists (available in pandas 2.1.0+)
 try:
@@ -492,6 +486,18 @@ def get_aic_data():
                 'code': 400,
                 'message': 'Some data sources returned no data'
             }), 400
+
+        # Optional thinning: pick hours by LTTB on the AIC total and keep the same
+        # hours in realtime/dpp so the three traces still line up on the x axis
+        max_points = parse_max_points(request.args.get('max_points'))
+        if max_points:
+            kept = {
+                (item['date'][:10], item.get('time'))
+                for item in downsample_records(all_data['aic'], 'toplam', max_points)
+            }
+            all_data['aic'] = [i for i in all_data['aic'] if (i['date'][:10], i.get('time')) in kept]
+            all_data['realtime'] = [i for i in all_data['realtime'] if (i['date'][:10], i.get('hour')) in kept]
+            all_data['dpp'] = [i for i in all_data['dpp'] if (i['date'][:10], i.get('time')) in kept]
         
         return jsonify({
             'code': 200,
@@ -1511,106 +1517,42 @@ def get_production_data():
                 'message': 'Start date and end date are required'
             }), 400
             
-        # Check if data exists in database
+        # Fetch only the days with missing hours; warm ranges stay a pure DB read.
+        # The fill is best-effort: when EPIAS is unreachable the stored hours are still served
+        try:
+            fill_production_gaps(
+                datetime.strptime(start_date, '%Y-%m-%d').date(),
+                datetime.strptime(end_date, '%Y-%m-%d').date(),
+                lambda: get_tgt_token(
+                    current_app.config.get('USERNAME'),
+                    current_app.config.get('PASSWORD')
+                )
+            )
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning("Production gap fill failed, serving stored hours: %s", e)
+
         existing_data = ProductionData.query.filter(
             ProductionData.datetime.between(
                 datetime.strptime(start_date, '%Y-%m-%d'),
                 datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
             )
-        ).all()
-        
-        if existing_data:
-            return jsonify({
-                'code': 200,
-                'data': [record.to_dict() for record in existing_data]
-            })
-        
-        # If no data in database, fetch from API
-        tgt_token = get_tgt_token(
-            current_app.config.get('USERNAME'),
-            current_app.config.get('PASSWORD')
-        )
-        
-        url = "https://seffaflik.epias.com.tr/electricity-service/v1/generation/data/realtime-generation"
-        
-        payload = {
-            "startDate": f"{start_date}T00:00:00+03:00",
-            "endDate": f"{end_date}T23:59:59+03:00",
-            "region": "TR1",
-        }
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': "application/json",
-            'TGT': tgt_token
-        }
-        
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
+        ).order_by(ProductionData.datetime).all()
 
-        # Process the data
-        items = response.json().get('items', [])
-        if not items:
+        if not existing_data:
             return jsonify({
                 'code': 404,
                 'message': 'No data found for the specified date range'
             }), 404
-            
-        # Convert to DataFrame for easier processing
-        df = pd.json_normalize(items)
-        df['date'] = pd.to_datetime(df['date'])
-        
-        # Create DateTime column
-        if 'hour' in df.columns:
-            df['DateTime'] = pd.to_datetime(
-                df['date'].dt.date.astype(str) + ' ' + df['hour']
-            )
-            df['DateTime'] = df['DateTime'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Store in database
-        response_records = []
-        try:
-            for _, row in df.iterrows():
-                dt = datetime.strptime(row['DateTime'], '%Y-%m-%d %H:%M:%S')
-                record = ProductionData(
-                    datetime=dt,
-                    fueloil=row.get('fueloil', 0),
-                    gasoil=0,
-                    blackcoal=row.get('blackCoal', 0),
-                    lignite=row.get('lignite', 0),
-                    geothermal=row.get('geothermal', 0),
-                    naturalgas=row.get('naturalGas', 0),
-                    river=row.get('river', 0),
-                    dammedhydro=row.get('dammedHydro', 0),
-                    lng=row.get('lng', 0),
-                    biomass=row.get('biomass', 0),
-                    naphta=row.get('naphta', 0),
-                    importcoal=row.get('importCoal', 0),
-                    asphaltitecoal=row.get('asphaltiteCoal', 0),
-                    wind=row.get('wind', 0),
-                    nuclear=0,
-                    sun=row.get('sun', 0),
-                    importexport=row.get('importExport', 0),
-                    total=row.get('total', 0),
-                    wasteheat=row.get('wasteheat', 0)
-                )
-                db.session.add(record)
-                response_records.append(record)
-            db.session.commit()
-        except IntegrityError:
-            # Concurrent request already committed the same rows; return what's in the DB.
-            db.session.rollback()
-            existing_data = ProductionData.query.filter(
-                ProductionData.datetime.between(
-                    datetime.strptime(start_date, '%Y-%m-%d'),
-                    datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-                )
-            ).all()
-            return jsonify({'code': 200, 'data': [r.to_dict() for r in existing_data]})
+
+        records = [record.to_dict() for record in existing_data]
+        max_points = parse_max_points(data.get('max_points'))
+        if max_points:
+            records = downsample_records(records, 'Total', max_points)
 
         return jsonify({
             'code': 200,
-            'data': [r.to_dict() for r in response_records]
+            'data': records
         })
         
     except Exception as e:
@@ -1618,6 +1560,68 @@ def get_production_data():
         print(f"Error in get_production_data: {str(e)}")
         return _err("get_production_data", e)
 
+@main.route('/export/<series>')
+@login_required
+def export_series(series):
+    """Stream an hourly series as NDJSON or CSV (optionally gzip) without buffering the range."""
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        fmt = request.args.get('format', 'ndjson').lower()
+        compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+        if series not in EXPORT_SERIES or fmt not in EXPORT_FORMATS:
+            return jsonify({
+                'code': 400,
+                'message': f"series must be one of {sorted(EXPORT_SERIES)} and format one of {sorted(EXPORT_FORMATS)}"
+            }), 400
+        if not start_date or not end_date:
+            return jsonify({
+                'code': 400,
+                'message': 'Start date and end date are required'
+            }), 400
+
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+
+        filename = f"{series}_{start_date}_{end_date}.{fmt}"
+        mimetype = EXPORT_FORMATS[fmt]
+        if compress:
+            filename += '.gz'
+            mimetype = 'application/gzip'
+
+        return Response(
+            stream_with_context(stream_series(series, start, end, fmt=fmt, compress=compress)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+
+    except ValueError as e:
+        return jsonify({'code': 400, 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error in export_series: {str(e)}")
+        return _err("export_series", e)
+
+@main.route('/supabase-pool-stats')
+@login_required
+def supabase_pool_stats():
+    """Checkout counts, waits and timeouts of this worker's Supabase connection pool."""
+    try:
+        return jsonify({'code': 200, 'pid': os.getpid(), 'data': pool_stats()})
+    except Exception as e:
+        print(f"Error in supabase_pool_stats: {str(e)}")
+        return _err("supabase_pool_stats", e)
+
+@main.route('/market-mirror-status')
+@login_required
+def market_mirror_status():
+    """Last run, watermark and window of every locally mirrored Supabase table."""
+    try:
+        return jsonify({'code': 200, 'data': mirror_status()})
+    except Exception as e:
+        print(f"Error in market_mirror_status: {str(e)}")
+        return _err("market_mirror_status", e)
+
 @main.route('/check-data-completeness')
 @login_required
 def check_data_completeness():
@@ -1717,257 +1721,23 @@ def get_rolling_data():
         else:
             print("Combined solar historical data file not found")
 
-        # Get current year data (2026 and beyond)
+        # Current year comes from the rolling state, which ingest extends one
+        # complete day at a time; build it once if this year has no rows yet
         current_year = datetime.now().year
-        cutoff_date = datetime(current_year, 1, 1)
-        
-        # Query production data (excluding solar since we'll use separate tables)
-        production_query = db.session.query(ProductionData).filter(
-            ProductionData.datetime >= cutoff_date
-        ).order_by(ProductionData.datetime)
-        
-        # Query unlicensed solar data
-        unlicensed_query = db.session.query(UnlicensedSolarData).filter(
-            UnlicensedSolarData.datetime >= cutoff_date
-        ).order_by(UnlicensedSolarData.datetime)
-        
-        # Query licensed solar data
-        licensed_query = db.session.query(LicensedSolarData).filter(
-            LicensedSolarData.datetime >= cutoff_date
-        ).order_by(LicensedSolarData.datetime)
-        
-        current_data = production_query.all()
-        unlicensed_data = unlicensed_query.all()
-        licensed_data = licensed_query.all()
-        
-        print(f"Found {len(current_data)} production records, {len(unlicensed_data)} unlicensed solar records, and {len(licensed_data)} licensed solar records")
-        
-        if current_data:
-            print(f"Processing {len(current_data)} current year records")
-            
-            # Convert to DataFrame with timezone handling
-            df = pd.DataFrame([{
-                'datetime': d.datetime.astimezone(pytz.UTC),
-                'fueloil': d.fueloil,
-                'gasoil': d.gasoil,
-                'blackcoal': d.blackcoal,
-                'lignite': d.lignite,
-                'geothermal': d.geothermal,
-                'naturalgas': d.naturalgas,
-                'river': d.river,
-                'dammedhydro': d.dammedhydro,
-                'lng': d.lng,
-                'biomass': d.biomass,
-                'naphta': d.naphta,
-                'importcoal': d.importcoal,
-                'asphaltitecoal': d.asphaltitecoal,
-                'wind': d.wind,
-                'nuclear': d.nuclear,
-                'sun': d.sun,  # Keep this for renewables calculation
-                'importexport': d.importexport,
-                'total': d.total,
-                'wasteheat': d.wasteheat
-            } for d in current_data])
-            
-            # Convert datetime to pandas datetime with UTC timezone
-            df['datetime'] = pd.to_datetime(df['datetime'], utc=True)
-            df = df.set_index('datetime')
-            
-            # Ensure timezone is set before conversion
-            if df.index.tz is None:
-                print("Warning: DataFrame index has no timezone, localizing to UTC")
-                df.index = df.index.tz_localize('UTC')
-            
-            # Convert to Istanbul timezone using string instead of pytz object
-            df.index = df.index.tz_convert('Europe/Istanbul')
-            
-            # Process solar data from separate tables first
-            if unlicensed_data or licensed_data:
-                print(f"Processing {len(unlicensed_data)} unlicensed and {len(licensed_data)} licensed solar records")
-                
-                # Create unlicensed solar DataFrame
-                if unlicensed_data:
-                    unlicensed_df = pd.DataFrame([{
-                        'datetime': d.datetime.astimezone(pytz.UTC),
-                        'unlicensed_solar': d.unlicensed_solar
-                    } for d in unlicensed_data])
-                    
-                    unlicensed_df['datetime'] = pd.to_datetime(unlicensed_df['datetime'], utc=True)
-                    unlicensed_df = unlicensed_df.set_index('datetime')
-                    if unlicensed_df.index.tz is None:
-                        unlicensed_df.index = unlicensed_df.index.tz_localize('UTC')
-                    unlicensed_df.index = unlicensed_df.index.tz_convert('Europe/Istanbul')
-                else:
-                    unlicensed_df = pd.DataFrame(columns=['unlicensed_solar'])
-                    unlicensed_df.index = pd.DatetimeIndex([])
-                
-                # Create licensed solar DataFrame
-                if licensed_data:
-                    licensed_df = pd.DataFrame([{
-                        'datetime': d.datetime.astimezone(pytz.UTC),
-                        'licensed_solar': d.licensed_solar
-                    } for d in licensed_data])
-                    
-                    licensed_df['datetime'] = pd.to_datetime(licensed_df['datetime'], utc=True)
-                    licensed_df = licensed_df.set_index('datetime')
-                    if licensed_df.index.tz is None:
-                        licensed_df.index = licensed_df.index.tz_localize('UTC')
-                    licensed_df.index = licensed_df.index.tz_convert('Europe/Istanbul')
-                else:
-                    licensed_df = pd.DataFrame(columns=['licensed_solar'])
-                    licensed_df.index = pd.DatetimeIndex([])
-                
-                print(f"Unlicensed solar data range: {unlicensed_df.index.min() if not unlicensed_df.empty else 'None'} to {unlicensed_df.index.max() if not unlicensed_df.empty else 'None'}")
-                print(f"Licensed solar data range: {licensed_df.index.min() if not licensed_df.empty else 'None'} to {licensed_df.index.max() if not licensed_df.empty else 'None'}")
-                print(f"Production data range: {df.index.min()} to {df.index.max()}")
-                
-                # Resample all DataFrames to hourly frequency to align timestamps
-                df_hourly = df.resample('h', closed='left', label='left').mean()
-                unlicensed_hourly = unlicensed_df.resample('h', closed='left', label='left').mean() if not unlicensed_df.empty else pd.DataFrame()
-                licensed_hourly = licensed_df.resample('h', closed='left', label='left').mean() if not licensed_df.empty else pd.DataFrame()
-                
-                print(f"After resampling - Production shape: {df_hourly.shape}")
-                if not unlicensed_hourly.empty:
-                    print(f"Unlicensed shape: {unlicensed_hourly.shape}")
-                if not licensed_hourly.empty:
-                    print(f"Licensed shape: {licensed_hourly.shape}")
-                
-                # Merge all DataFrames
-                if not unlicensed_hourly.empty:
-                    df_hourly = df_hourly.join(unlicensed_hourly, how='outer')
-                    df_hourly['unlicensed_solar'] = df_hourly['unlicensed_solar'].fillna(0)
-                else:
-                    df_hourly['unlicensed_solar'] = 0
-                
-                if not licensed_hourly.empty:
-                    df_hourly = df_hourly.join(licensed_hourly, how='outer')
-                    df_hourly['licensed_solar'] = df_hourly['licensed_solar'].fillna(0)
-                else:
-                    df_hourly['licensed_solar'] = 0
-                
-                # Calculate combined solar (unlicensed + licensed)
-                df_hourly['solar_combined'] = df_hourly['unlicensed_solar'] + df_hourly['licensed_solar']
-                
-                # Build completeness sets per-series so solar-derived series can lag without
-                # forcing other series to drop the latest day
-                print("Computing completeness per series (production vs solar)...")
-                today = datetime.now().date()
-                
-                # Production completeness (use overall index)
-                prod_counts_by_day = df_hourly.groupby(df_hourly.index.date).size()
-                prod_complete_days = [d for d, c in prod_counts_by_day.items() if c == 24 and d != today]
-                
-                # Solar completeness (require 24 points in both unlicensed and licensed if they exist)
-                solar_complete_days = None
-                if not unlicensed_hourly.empty:
-                    unl_counts = unlicensed_hourly.groupby(unlicensed_hourly.index.date).size()
-                    unl_complete = set([d for d, c in unl_counts.items() if c == 24 and d != today])
-                else:
-                    unl_complete = set()
-                if not licensed_hourly.empty:
-                    lic_counts = licensed_hourly.groupby(licensed_hourly.index.date).size()
-                    lic_complete = set([d for d, c in lic_counts.items() if c == 24 and d != today])
-                else:
-                    lic_complete = set()
-                
-                if not unlicensed_hourly.empty and not licensed_hourly.empty:
-                    solar_complete_days = unl_complete.intersection(lic_complete)
-                elif not unlicensed_hourly.empty:
-                    solar_complete_days = unl_complete
-                elif not licensed_hourly.empty:
-                    solar_complete_days = lic_complete
-                else:
-                    # No separate solar sources → treat as production completeness
-                    solar_complete_days = set(prod_complete_days)
-                
-                print(f"Production complete days: {len(prod_complete_days)} | Solar complete days: {len(solar_complete_days)}")
-                
-                # Do not filter df_hourly globally anymore; we will apply these day sets per-series
-                # when constructing outputs to avoid unintended drops.
-                
-                print(f"Sample unlicensed solar values: {df_hourly['unlicensed_solar'].head()}")
-                print(f"Sample licensed solar values: {df_hourly['licensed_solar'].head()}")
-                print(f"Sample combined solar values: {df_hourly['solar_combined'].head()}")
-                
-                # Use the hourly DataFrame for further processing without global trimming
-                df = df_hourly
-            else:
-                # No solar data from separate tables, set to 0
-                df['unlicensed_solar'] = 0
-                df['licensed_solar'] = 0
-                df['solar_combined'] = 0
-                print("No separate solar data found, setting all solar values to 0")
-            
-            # Calculate renewables total and ratio (using combined solar data) - AFTER solar processing
-            df['renewablestotal'] = df['geothermal'] + df['biomass'] + df['wind'] + df['solar_combined']
-            df['renewablesratio'] = df['renewablestotal'] / df['total']
-            
-            # Calculate rolling averages for current year
-            rolling_data = historical_data.copy() if historical_data else {}
-            
-            # Process regular columns with 7-day rolling averages
-            regular_columns = [col for col in df.columns if col not in ['renewablesratio', 'solar_combined']]
-            regular_columns.append('solar_combined')  # Add combined solar data
-            for column in regular_columns:
-                # For solar columns, only average daytime hours (07:00-18:00)
-                # to avoid diluting the average with zero-generation night hours
-                if column in ['solar_combined', 'unlicensed_solar', 'licensed_solar', 'sun']:
-                    col_series = df[df.index.hour.isin(range(7, 19))][column]
-                    daily_avg = col_series.resample('d', closed='left', label='left').mean()
-                    daily_avg = daily_avg[daily_avg.index.map(lambda x: x.date() in solar_complete_days)]
-                else:
-                    daily_avg = df[column].resample('d', closed='left', label='left').mean()
-                    daily_avg = daily_avg[daily_avg.index.map(lambda x: x.date() in set(prod_complete_days))]
-                rolling_avg = daily_avg.rolling(window=7, min_periods=1).mean()
-                
-                # Get current year data
-                year_data = rolling_avg[rolling_avg.index.year == current_year]
-                
-                # Create or update column data
-                if column not in rolling_data:
-                    rolling_data[column] = {}
-                
-                # Add current year data
-                rolling_data[column][str(current_year)] = [
-                    round(float(x), 2) if pd.notnull(x) else None 
-                    for x in year_data.values
-                ]
-            
-            # Special handling for renewables ratio - monthly averages for current year
-            if 'renewablesratio' in df.columns:
-                # For renewables ratio, restrict to solar-complete days to avoid sharp drops
-                df_ratio = df[df.index.map(lambda x: x.date() in solar_complete_days)]
-                monthly_data = df_ratio.groupby([df_ratio.index.month, df_ratio.index.year])['renewablesratio'].mean()
-            
-            # Convert to DataFrame for easier manipulation
-            monthly_df = pd.DataFrame(monthly_data)
-            monthly_df.index.names = ['month', 'year']
-            monthly_df.reset_index(inplace=True)
-            
-            # Create or update renewablesratio_monthly
-            if 'renewablesratio_monthly' not in rolling_data:
-                rolling_data['renewablesratio_monthly'] = {}
-            
-            # Add current year data
-            year_data = []
-            for month in range(1, 13):
-                value = monthly_df[(monthly_df['month'] == month) & (monthly_df['year'] == current_year)]['renewablesratio'].values
-                if len(value) > 0:
-                    year_data.append(round(float(value[0]), 4))
-                else:
-                    year_data.append(None)
-            
-            rolling_data['renewablesratio_monthly'][str(current_year)] = year_data
-                
-            print(f"Sample renewables data for current year: {df['renewablesratio'].mean():.4f}")
-            
-            # Add this after calculating solar_combined
-            print(f"Sample solar data - Licensed: {df['licensed_solar'].iloc[0] if len(df) > 0 else 'No data'}, Unlicensed: {df['unlicensed_solar'].iloc[0] if len(df) > 0 else 'No data'}, Combined: {df['solar_combined'].iloc[0] if len(df) > 0 else 'No data'}")
-            
-            return jsonify(rolling_data)
-        else:
+        if not has_rolling_state(current_year):
+            print(f"No rolling state for {current_year}, building it from hourly data")
+            refresh_rolling_state(year=current_year)
+
+        current_series = rolling_series_for_year(current_year)
+        if not current_series:
             # If no current year data, just return historical data
             return jsonify(historical_data)
+
+        rolling_data = historical_data.copy() if historical_data else {}
+        for column, values in current_series.items():
+            rolling_data.setdefault(column, {})[str(current_year)] = values
+
+        return jsonify(rolling_data)
         
     except Exception as e:
         print(f"Error in get_rolling_data: {str(e)}")
@@ -2007,7 +1777,9 @@ def get_solar_weekly_data():
         import datetime as dt_module
         istanbul_tz = pytz.timezone('Europe/Istanbul')
 
-        latest_solar = db.session.query(UnlicensedSolarData.datetime).order_by(UnlicensedSolarData.datetime.desc()).first()
+        latest_solar = db.session.query(CombinedSolarHourly.datetime).filter(
+            CombinedSolarHourly.has_unlicensed
+        ).order_by(CombinedSolarHourly.datetime.desc()).first()
         if not latest_solar:
             return jsonify({'error': 'No solar data found'}), 404
 
@@ -2028,19 +1800,14 @@ def get_solar_weekly_data():
                                 tzinfo=istanbul_tz).astimezone(pytz.UTC)
             return from_utc, to_utc
 
-        def _solar_from_rows(rows_unl, rows_lic):
-            unl_map, lic_map = {}, {}
-            for r in rows_unl:
-                key = r.datetime.replace(tzinfo=pytz.UTC).astimezone(istanbul_tz).replace(
-                    minute=0, second=0, microsecond=0)
-                unl_map[key] = unl_map.get(key, 0) + (r.unlicensed_solar or 0)
-            for r in rows_lic:
-                key = r.datetime.replace(tzinfo=pytz.UTC).astimezone(istanbul_tz).replace(
-                    minute=0, second=0, microsecond=0)
-                lic_map[key] = lic_map.get(key, 0) + (r.licensed_solar or 0)
-            all_keys = sorted(set(unl_map) | set(lic_map))
+        def _solar_from_rows(rows):
+            combined = {}
+            for r in rows:
+                key = r.datetime.replace(tzinfo=pytz.UTC).astimezone(istanbul_tz)
+                combined[key] = combined.get(key, 0) + r.solar_combined
+            all_keys = sorted(combined)
             labels = [k.strftime('%a %d %b %H:%M') for k in all_keys]
-            values = [round(unl_map.get(k, 0) + lic_map.get(k, 0), 1) for k in all_keys]
+            values = [round(combined[k], 1) for k in all_keys]
             return labels, values
 
         def smooth(values, window=5):
@@ -2066,40 +1833,31 @@ def get_solar_weekly_data():
             ('ly',   ly_start,    ly_end),
         ] + [('hist', hs, he) for hs, he in hist_ranges]
 
-        # Two queries total — one per solar table — covering all ranges via OR
-        def _fetch_solar_table(model_cls, field):
-            clauses, params = [], {}
-            for i, (_, d_from, d_to) in enumerate(named_ranges):
-                f, t = _utc_bounds(d_from, d_to)
-                clauses.append(f"(datetime >= :f{i} AND datetime <= :t{i})")
-                params[f'f{i}'] = f
-                params[f't{i}'] = t
-            return db.session.query(model_cls).filter(
-                db.or_(*[db.text(c) for c in clauses])
-            ).params(**params).order_by(model_cls.datetime).all()
-
-        all_unl = _fetch_solar_table(UnlicensedSolarData, 'unlicensed_solar')
-        all_lic = _fetch_solar_table(LicensedSolarData,   'licensed_solar')
-
-        def _subset(rows, attr, d_from, d_to):
+        # One query on the combined hourly table covering all ranges via OR
+        clauses, params = [], {}
+        for i, (_, d_from, d_to) in enumerate(named_ranges):
+            f, t = _utc_bounds(d_from, d_to)
+            clauses.append(f"(datetime >= :f{i} AND datetime <= :t{i})")
+            params[f'f{i}'] = f.replace(tzinfo=None)
+            params[f't{i}'] = t.replace(tzinfo=None)
+        all_solar = db.session.query(
+            CombinedSolarHourly.datetime, CombinedSolarHourly.solar_combined
+        ).filter(
+            db.or_(*[db.text(c) for c in clauses])
+        ).params(**params).order_by(CombinedSolarHourly.datetime).all()
+
+        def _subset(rows, d_from, d_to):
             f, t = _utc_bounds(d_from, d_to)
+            f, t = f.replace(tzinfo=None), t.replace(tzinfo=None)
             return [r for r in rows if f <= r.datetime <= t]
 
-        cur_labels,  cur_values  = _solar_from_rows(
-            _subset(all_unl, None, start_date, end_date),
-            _subset(all_lic, None, start_date, end_date))
-        prev_labels, prev_values = _solar_from_rows(
-            _subset(all_unl, None, prev_start, prev_end),
-            _subset(all_lic, None, prev_start, prev_end))
-        ly_labels,   ly_values   = _solar_from_rows(
-            _subset(all_unl, None, ly_start, ly_end),
-            _subset(all_lic, None, ly_start, ly_end))
+        cur_labels,  cur_values  = _solar_from_rows(_subset(all_solar, start_date, end_date))
+        prev_labels, prev_values = _solar_from_rows(_subset(all_solar, prev_start, prev_end))
+        ly_labels,   ly_values   = _solar_from_rows(_subset(all_solar, ly_start, ly_end))
 
         all_hist = []
         for hs, he in hist_ranges:
-            _, h_vals = _solar_from_rows(
-                _subset(all_unl, None, hs, he),
-                _subset(all_lic, None, hs, he))
+            _, h_vals = _solar_from_rows(_subset(all_solar, hs, he))
             if h_vals and len(h_vals) >= 100:
                 all_hist.append(smooth(h_vals, window=5))
 
@@ -2132,138 +1890,24 @@ def get_solar_weekly_data():
         return _err("get_solar_weekly_data", e)
 
 
+def _sync_status(state, label):
+    """Response body shared by the update endpoints that queue a scheduler sync."""
+    result = state.last_result or {}
+    return {
+        'message': f"{label} update queued; last sync added {result.get('inserted', 0)} records, revised {result.get('revised', 0)}.",
+        'records_added': result.get('inserted', 0),
+        'records_revised': result.get('revised', 0),
+        'data_until': state.watermark.strftime('%Y-%m-%d %H:%M') if state.watermark else None,
+        'last_run': state.to_dict()
+    }
+
 @main.route('/update-rolling-data')
 @login_required
 def update_rolling_data():
+    """Queue a production sync for the scheduler and report the last completed one."""
     try:
-        # Get the most recent record's datetime
-        latest_record = db.session.query(ProductionData.datetime).order_by(ProductionData.datetime.desc()).first()
-        
-        if not latest_record:
-            return jsonify({
-                'error': 'No existing records found. Please populate the database first.'
-            }), 400
-            
-        # Find the last complete day (all 24 hours present)
-        latest_date = latest_record[0].date()
-        
-        # Check if the latest day has all 24 hours
-        hours_count = db.session.query(ProductionData).filter(
-            db.func.date(ProductionData.datetime) == latest_date
-        ).count()
-        
-        # If we don't have all 24 hours, start from the beginning of this day
-        if hours_count < 24:
-            start_date = datetime.combine(latest_date, datetime.min.time())
-        else:
-            # Otherwise start from the next day
-            start_date = datetime.combine(latest_date + timedelta(days=1), datetime.min.time())
-        
-        # Get the end date (today)
-        end_date = datetime.now().replace(hour=23, minute=59, second=59, microsecond=999999)
-        
-        # Format dates for API
-        start_date_str = start_date.strftime('%Y-%m-%d')
-        end_date_str = end_date.strftime('%Y-%m-%d')
-        
-        # Check if we need to update (start date should be before end date)
-        if start_date.date() > end_date.date():
-            return jsonify({
-                'message': 'Database is already up to date.',
-                'records_added': 0
-            })
-            
-        # Get TGT token for API authentication
-        tgt_token = get_tgt_token(
-            current_app.config.get('USERNAME'),
-            current_app.config.get('PASSWORD')
-        )
-        
-        # Prepare API request
-        url = "https://seffaflik.epias.com.tr/electricity-service/v1/generation/data/realtime-generation"
-        
-        payload = {
-            "startDate": f"{start_date_str}T00:00:00+03:00",
-            "endDate": f"{end_date_str}T23:59:59+03:00",
-            "region": "TR1",
-        }
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': "application/json",
-            'TGT': tgt_token
-        }
-        
-        # Make API request
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-
-        # Process the data
-        items = response.json().get('items', [])
-        if not items:
-            return jsonify({
-                'message': 'No new data found for the specified date range.',
-                'records_added': 0
-            })
-
-        # Convert to DataFrame for easier processing
-        df = pd.json_normalize(items)
-        df['date'] = pd.to_datetime(df['date'])
-        
-        # Create DateTime column
-        if 'hour' in df.columns:
-            df['DateTime'] = pd.to_datetime(
-                df['date'].dt.date.astype(str) + ' ' + df['hour']
-            )
-            df['DateTime'] = df['DateTime'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Pre-fetch existing datetimes in the range to avoid per-row SELECTs
-        dts_in_df = [datetime.strptime(r['DateTime'], '%Y-%m-%d %H:%M:%S') for _, r in df.iterrows()]
-        existing_dts = {
-            row[0] for row in
-            db.session.query(ProductionData.datetime).filter(
-                ProductionData.datetime.in_(dts_in_df)
-            ).all()
-        }
-
-        records_added = 0
-        for _, row in df.iterrows():
-            dt = datetime.strptime(row['DateTime'], '%Y-%m-%d %H:%M:%S')
-            if dt not in existing_dts:
-                db.session.add(ProductionData(
-                    datetime=dt,
-                    fueloil=row.get('fueloil', 0),
-                    gasoil=0,
-                    blackcoal=row.get('blackCoal', 0),
-                    lignite=row.get('lignite', 0),
-                    geothermal=row.get('geothermal', 0),
-                    naturalgas=row.get('naturalGas', 0),
-                    river=row.get('river', 0),
-                    dammedhydro=row.get('dammedHydro', 0),
-                    lng=row.get('lng', 0),
-                    biomass=row.get('biomass', 0),
-                    naphta=row.get('naphta', 0),
-                    importcoal=row.get('importCoal', 0),
-                    asphaltitecoal=row.get('asphaltiteCoal', 0),
-                    wind=row.get('wind', 0),
-                    nuclear=0,
-                    sun=row.get('sun', 0),
-                    importexport=row.get('importExport', 0),
-                    total=row.get('total', 0),
-                    wasteheat=row.get('wasteheat', 0)
-                ))
-                records_added += 1
-
-        db.session.commit()
-        
-        return jsonify({
-            'message': f'Successfully added {records_added} new records.',
-            'records_added': records_added,
-            'date_range': {
-                'start': start_date_str,
-                'end': end_date_str
-            }
-        })
+        state = request_run('production')
+        return jsonify(_sync_status(state, 'Production'))
         
     except Exception as e:
         db.session.rollback()
@@ -2364,122 +2008,106 @@ def get_demand_data():
         # Get current date to limit the data range
         current_date = datetime.now()
         
-        # Use raw SQL to avoid ORM issues with missing columns
-        query = text("""
-            SELECT id, datetime, consumption 
-            FROM demand_data
-            WHERE (EXTRACT(year FROM datetime) = :current_year AND datetime <= :current_date)
-               OR (EXTRACT(year FROM datetime) = :previous_year)
-            ORDER BY datetime
-        """)
+        previous_year_start = datetime(previous_year, 1, 1)
+        ensure_demand_rollups(previous_year_start, current_date)
         
-        # Execute query
-        result = db.session.execute(
-            query, 
-            {
-                "current_year": current_year, 
-                "current_date": current_date,
-                "previous_year": previous_year
-            }
+        # Weekly averages come from the ISO-week rollup (a few dozen rows per year)
+        weekly_rows = db.session.execute(
+            text("""
+                SELECT iso_year, iso_week, consumption_mean
+                FROM demand_weekly_rollup
+                WHERE iso_year IN (:previous_year, :current_year)
+                ORDER BY iso_year, iso_week
+            """),
+            {"previous_year": previous_year, "current_year": current_year}
         ).fetchall()
         
-        # Process the data for the frontend
-        current_year_data = []
-        previous_year_data = []
+        weekly = {}
+        for row in weekly_rows:
+            weekly.setdefault(int(row.iso_year), {})[int(row.iso_week)] = float(row.consumption_mean)
         
-        for row in result:
-            data_point = {
-                "datetime": row.datetime.strftime("%Y-%m-%d %H:%M:%S"),
-                "consumption": float(row.consumption)
-            }
-            
-            if row.datetime.year == current_year:
-                current_year_data.append(data_point)
-            else:
-                previous_year_data.append(data_point)
-        
-        # Convert to pandas DataFrame for resampling and metrics
-        if current_year_data:
-            df_current = pd.DataFrame(current_year_data)
-            df_current['datetime'] = pd.to_datetime(df_current['datetime'])
-            df_current.set_index('datetime', inplace=True)
-            weekly_avg_current = df_current.resample('w').mean()
-        else:
-            weekly_avg_current = pd.DataFrame()
-            
-        if previous_year_data:
-            df_previous = pd.DataFrame(previous_year_data)
-            df_previous['datetime'] = pd.to_datetime(df_previous['datetime'])
-            df_previous.set_index('datetime', inplace=True)
-            weekly_avg_previous = df_previous.resample('w').mean()
-        else:
-            weekly_avg_previous = pd.DataFrame()
+        # Latest hour actually loaded this year (EPİAŞ lags a few hours behind real time)
+        data_available_until = db.session.execute(
+            text("""
+                SELECT MAX(datetime) FROM demand_data
+                WHERE datetime >= :current_year_start AND datetime <= :current_date
+            """),
+            {"current_year_start": datetime(current_year, 1, 1), "current_date": current_date}
+        ).scalar()
         
-        # Calculate MTD/YTD metrics (average consumption), comparing to same period last year
+        # Calculate MTD/YTD metrics (total consumption), comparing to same period last year
         # IMPORTANT: EPİAŞ has 4-hour data lag, so we must compare like-for-like periods
         metrics = {}
         try:
             now = pd.to_datetime(current_date)
-            # Use the actual last timestamp from database instead of assuming 4-hour lag
-            # This handles cases where data might be delayed more than 4 hours
-            if current_year_data:
-                data_available_until = df_current.index.max()
-            else:
+            if data_available_until is None:
                 # Fallback to 4-hour lag if no current year data
-                data_available_until = now - pd.Timedelta(hours=4)
+                data_available_until = (now - pd.Timedelta(hours=4)).to_pydatetime()
             
-            # Month-to-date masks (both years compare to data_available_until)
-            if current_year_data:
-                mtd_start = data_available_until.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                df_cur_mtd = df_current.loc[(df_current.index >= mtd_start) & (df_current.index <= data_available_until)]
-            else:
-                df_cur_mtd = pd.DataFrame(columns=['consumption'])
-
-            if previous_year_data:
-                # Use same hour-of-day for previous year comparison
-                prev_data_available = data_available_until.replace(year=previous_year)
-                mtd_start_prev = prev_data_available.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                df_prev_mtd = df_previous.loc[(df_previous.index >= mtd_start_prev) & (df_previous.index <= prev_data_available)]
-            else:
-                df_prev_mtd = pd.DataFrame(columns=['consumption'])
-
-            # Year-to-date masks (both years compare to data_available_until at same hour)
-            # IMPORTANT: Handle leap years - if comparing across leap year boundary, skip Feb 29
-            if current_year_data:
-                ytd_start = data_available_until.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-                df_cur_ytd = df_current.loc[(df_current.index >= ytd_start) & (df_current.index <= data_available_until)]
-            else:
-                df_cur_ytd = pd.DataFrame(columns=['consumption'])
-
-            if previous_year_data:
-                # Compare to same hour last year (accounting for 4-hour lag)
-                prev_ytd_end = data_available_until.replace(year=previous_year)
-                ytd_start_prev = prev_ytd_end.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-                df_prev_ytd = df_previous.loc[(df_previous.index >= ytd_start_prev) & (df_previous.index <= prev_ytd_end)]
-                
-                # Handle leap year: if previous year was leap year and current is not (or vice versa),
-                # exclude Feb 29 from the leap year to ensure fair comparison
-                import calendar
-                prev_is_leap = calendar.isleap(previous_year)
-                curr_is_leap = calendar.isleap(current_year)
-                
-                if prev_is_leap and not curr_is_leap:
-                    # Remove Feb 29 from previous year data
-                    feb29_prev = pd.Timestamp(year=previous_year, month=2, day=29)
-                    df_prev_ytd = df_prev_ytd[~((df_prev_ytd.index.month == 2) & (df_prev_ytd.index.day == 29))]
-                elif curr_is_leap and not prev_is_leap and data_available_until.month > 2:
-                    # If we're past Feb 29 in current leap year, remove Feb 29 from current year
-                    df_cur_ytd = df_cur_ytd[~((df_cur_ytd.index.month == 2) & (df_cur_ytd.index.day == 29))]
+            # Same hour last year; Feb 29 maps onto Feb 28 when last year was not a leap year
+            import calendar
+            if data_available_until.month == 2 and data_available_until.day == 29 and not calendar.isleap(previous_year):
+                prev_until = data_available_until.replace(year=previous_year, day=28)
             else:
-                df_prev_ytd = pd.DataFrame(columns=['consumption'])
-
-            def total(series: pd.Series) -> float:
-                return float(series.sum()) if series is not None and not series.empty else 0.0
+                prev_until = data_available_until.replace(year=previous_year)
+            
+            # Handle leap years: if only one of the two years has Feb 29 in its YTD window,
+            # exclude it so both sides cover the same calendar days
+            prev_is_leap = calendar.isleap(previous_year)
+            curr_is_leap = calendar.isleap(current_year)
+            until_day = data_available_until.date()
+            prev_until_day = prev_until.date()
+            
+            # Whole days come from the daily rollup, the partial last day from hourly rows
+            full_days = db.session.execute(
+                text("""
+                    SELECT
+                        COALESCE(SUM(consumption_sum) FILTER (
+                            WHERE day >= :mtd_start AND day < :until_day), 0) AS mtd_cur,
+                        COALESCE(SUM(consumption_sum) FILTER (
+                            WHERE day >= :mtd_start_prev AND day < :prev_until_day), 0) AS mtd_prev,
+                        COALESCE(SUM(consumption_sum) FILTER (
+                            WHERE day >= :ytd_start AND day < :until_day
+                              AND day IS DISTINCT FROM :skip_cur_day), 0) AS ytd_cur,
+                        COALESCE(SUM(consumption_sum) FILTER (
+                            WHERE day >= :ytd_start_prev AND day < :prev_until_day
+                              AND day IS DISTINCT FROM :skip_prev_day), 0) AS ytd_prev
+                    FROM demand_daily_rollup
+                    WHERE day >= :ytd_start_prev AND day < :until_day
+                """),
+                {
+                    "until_day": until_day,
+                    "prev_until_day": prev_until_day,
+                    "mtd_start": until_day.replace(day=1),
+                    "mtd_start_prev": prev_until_day.replace(day=1),
+                    "ytd_start": until_day.replace(month=1, day=1),
+                    "ytd_start_prev": previous_year_start.date(),
+                    "skip_cur_day": datetime(current_year, 2, 29).date() if curr_is_leap and not prev_is_leap and data_available_until.month > 2 else None,
+                    "skip_prev_day": datetime(previous_year, 2, 29).date() if prev_is_leap and not curr_is_leap else None,
+                }
+            ).fetchone()
+            
+            partial_day = db.session.execute(
+                text("""
+                    SELECT
+                        COALESCE(SUM(consumption) FILTER (WHERE datetime >= :until_day), 0) AS cur,
+                        COALESCE(SUM(consumption) FILTER (WHERE datetime < :until_day), 0) AS prev
+                    FROM demand_data
+                    WHERE (datetime >= :until_day AND datetime <= :until)
+                       OR (datetime >= :prev_until_day AND datetime <= :prev_until)
+                """),
+                {
+                    "until_day": datetime.combine(until_day, datetime.min.time()),
+                    "until": data_available_until,
+                    "prev_until_day": datetime.combine(prev_until_day, datetime.min.time()),
+                    "prev_until": prev_until,
+                }
+            ).fetchone()
 
-            mtd_cur = total(df_cur_mtd['consumption'])
-            mtd_prev = total(df_prev_mtd['consumption'])
-            ytd_cur = total(df_cur_ytd['consumption'])
-            ytd_prev = total(df_prev_ytd['consumption'])
+            mtd_cur = float(full_days.mtd_cur) + float(partial_day.cur)
+            mtd_prev = float(full_days.mtd_prev) + float(partial_day.prev)
+            ytd_cur = float(full_days.ytd_cur) + float(partial_day.cur)
+            ytd_prev = float(full_days.ytd_prev) + float(partial_day.prev)
 
             def delta(cur: float, prev: float):
                 diff = cur - prev
@@ -2508,14 +2136,14 @@ def get_demand_data():
             current_app.logger.error("Year-over-year metric calculation failed: %s", e, exc_info=True)
             metrics = {}
 
-        # Format the response as expected by the frontend
+        # Format the response as expected by the frontend: one value per ISO week from
+        # week 1 to the last loaded week, None where a whole week is missing
         result = {'consumption': {}, 'metrics': metrics}
         
-        if not weekly_avg_current.empty:
-            result['consumption'][str(current_year)] = weekly_avg_current['consumption'].tolist()
-            
-        if not weekly_avg_previous.empty:
-            result['consumption'][str(previous_year)] = weekly_avg_previous['consumption'].tolist()
+        for year in (current_year, previous_year):
+            weeks = weekly.get(year)
+            if weeks:
+                result['consumption'][str(year)] = [weeks.get(week) for week in range(1, max(weeks) + 1)]
         
         return jsonify(result)
         
@@ -2533,16 +2161,12 @@ def get_monthly_demand_data():
         # Get current date to limit the data range
         current_date = datetime.now()
         
-        # Use raw SQL to get monthly averages
+        # Monthly averages from the monthly rollup
+        ensure_demand_rollups(datetime(previous_year, 1, 1), current_date)
         query = text("""
-            SELECT 
-                EXTRACT(year FROM datetime) as year,
-                EXTRACT(month FROM datetime) as month,
-                AVG(consumption) as avg_consumption
-            FROM demand_data
-            WHERE (EXTRACT(year FROM datetime) = :current_year AND datetime <= :current_date)
-               OR (EXTRACT(year FROM datetime) = :previous_year)
-            GROUP BY EXTRACT(year FROM datetime), EXTRACT(month FROM datetime)
+            SELECT year, month, consumption_mean AS avg_consumption
+            FROM demand_monthly_rollup
+            WHERE year IN (:previous_year, :current_year)
             ORDER BY year, month
         """)
         
@@ -2550,9 +2174,8 @@ def get_monthly_demand_data():
         result = db.session.execute(
             query, 
             {
-                "current_year": current_year, 
-                "current_date": current_date,
-                "previous_year": previous_year
+                "previous_year": previous_year,
+                "current_year": current_year
             }
         ).fetchall()
         
@@ -2577,95 +2200,10 @@ def get_monthly_demand_data():
 @main.route('/update_demand_data_api')
 @login_required
 def update_demand_data_api():
+    """Queue a demand sync for the scheduler and report the last completed one."""
     try:
-        # Get the latest date in the database
-        latest_record = db.session.query(DemandData.datetime).order_by(DemandData.datetime.desc()).first()
-        
-        # If no data, start from a default date
-        if not latest_record:
-            start_date = datetime(2023, 1, 1)
-        else:
-            # Start from the hour after the latest record
-            start_date = latest_record[0] + timedelta(hours=1)
-        
-        # End date is current hour
-        end_date = datetime.now().replace(minute=0, second=0, microsecond=0)
-        
-        # If already up to date
-        if start_date >= end_date:
-            return jsonify({
-                'message': 'Database is already up to date.',
-                'records_added': 0
-            })
-        
-        # Format dates for API
-        start_date_str = start_date.strftime('%Y-%m-%d')
-        end_date_str = end_date.strftime('%Y-%m-%d')
-        
-        # Get TGT token
-        tgt_token = get_tgt_token(
-            current_app.config.get('USERNAME'),
-            current_app.config.get('PASSWORD')
-        )
-        
-        # Prepare API request
-        url = "https://seffaflik.epias.com.tr/electricity-service/v1/consumption/data/realtime-consumption"
-        
-        payload = {
-            "startDate": f"{start_date_str}T00:00:00+03:00",
-            "endDate": f"{end_date_str}T23:59:59+03:00",
-            "region": "TR1",
-        }
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': "application/json",
-            'TGT': tgt_token
-        }
-        
-        # Make API request
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-
-        # Process the data
-        items = response.json().get('items', [])
-        if not items:
-            return jsonify({
-                'message': 'No new data found for the specified date range.',
-                'records_added': 0
-            })
-
-        # Convert to DataFrame for easier processing
-        df = pd.json_normalize(items)
-        df['date'] = pd.to_datetime(df['date'])
-        
-        batch = [
-            {
-                'datetime': row['date'].to_pydatetime(),
-                'consumption': float(row.get('consumption', 0)),
-                'created_at': datetime.now()
-            }
-            for _, row in df.iterrows()
-        ]
-        result = db.session.execute(
-            text("""
-                INSERT INTO demand_data (datetime, consumption, created_at)
-                VALUES (:datetime, :consumption, :created_at)
-                ON CONFLICT (datetime) DO NOTHING
-            """),
-            batch
-        )
-        db.session.commit()
-        records_added = result.rowcount
-        
-        return jsonify({
-            'message': f'Successfully added {records_added} new records.',
-            'records_added': records_added,
-            'date_range': {
-                'start': start_date.strftime('%Y-%m-%d %H:%M'),
-                'end': end_date.strftime('%Y-%m-%d %H:%M')
-            }
-        })
+        state = request_run('demand')
+        return jsonify(_sync_status(state, 'Demand'))
         
     except Exception as e:
         db.session.rollback()
@@ -2675,125 +2213,30 @@ def update_demand_data_api():
 @main.route('/check_demand_updates')
 @login_required
 def check_demand_updates():
+    """Report the last scheduled demand revision pass (``?force=1`` queues one for the scheduler)."""
     try:
-        # Get the last 15 days of data
-        end_date = datetime.now().replace(tzinfo=None)  # Ensure timezone-naive
-        start_date = end_date - timedelta(days=15)
-        
-        tgt_token = get_tgt_token(
-            current_app.config.get('USERNAME'),
-            current_app.config.get('PASSWORD')
-        )
-
-        # Group dates by month to minimize API calls
-        date_groups = {}
-        current_date = start_date
-        while current_date <= end_date:
-            month_key = current_date.strftime('%Y-%m')
-            if month_key not in date_groups:
-                date_groups[month_key] = []
-            date_groups[month_key].append(current_date)
-            current_date += timedelta(hours=1)
-
-        retries = requests.adapters.Retry(
-            total=5,
-            backoff_factor=0.5,
-            status_forcelist=[500, 502, 503, 504, 429],
-        )
-        success_count = 0
-        updated_count = 0
-
-        with requests.Session() as session:
-            session.mount('https://', requests.adapters.HTTPAdapter(max_retries=retries))
-            for _month, dates in date_groups.items():
-                first_date = min(dates)
-                last_date = max(dates)
-
-                url = "https://seffaflik.epias.com.tr/electricity-service/v1/consumption/data/realtime-consumption"
-                payload = {
-                    "startDate": f"{first_date.strftime('%Y-%m-%d')}T00:00:00+03:00",
-                    "endDate": f"{last_date.strftime('%Y-%m-%d')}T23:59:59+03:00",
-                    "region": "TR1",
-                }
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Accept': "application/json",
-                    'TGT': tgt_token
-                }
-
-                response = session.post(url, headers=headers, json=payload, timeout=30)
-                response.raise_for_status()
-
-                items = response.json().get('items', [])
-                if not items:
-                    continue
-
-                df = pd.json_normalize(items)
-                df['date'] = pd.to_datetime(df['date'])
-
-                existing_records = {}
-                query = text("""
-                    SELECT datetime, consumption
-                    FROM demand_data
-                    WHERE datetime >= :start_date AND datetime <= :end_date
-                """)
-                rows = db.session.execute(query, {
-                    'start_date': first_date,
-                    'end_date': last_date
-                }).fetchall()
-
-                for record in rows:
-                    existing_records[record[0].strftime('%Y-%m-%d %H:%M')] = float(record[1])
-
-                batch_data = []
-                current_time = datetime.now()
-
-                for _, row in df.iterrows():
-                    try:
-                        dt = row['date'].to_pydatetime()
-                        if dt.tzinfo is not None:
-                            dt = dt.replace(tzinfo=None)
-
-                        dt_key = dt.strftime('%Y-%m-%d %H:%M')
-                        consumption = float(row.get('consumption', 0))
-
-                        if dt >= first_date and dt <= last_date:
-                            success_count += 1
-
-                            if dt_key in existing_records:
-                                if abs(existing_records[dt_key] - consumption) > 0.01:
-                                    batch_data.append({
-                                        'datetime': dt,
-                                        'consumption': consumption,
-                                        'created_at': current_time
-                                    })
-                                    updated_count += 1
-                    except Exception as e:
-                        print(f"Error processing item: {e}")
-                        continue
-
-                if batch_data:
-                    try:
-                        insert_stmt = """
-                        INSERT INTO demand_data (datetime, consumption, created_at)
-                        VALUES (:datetime, :consumption, :created_at)
-                        ON CONFLICT (datetime) DO UPDATE
-                        SET consumption = EXCLUDED.consumption,
-                            created_at = EXCLUDED.created_at
-                        """
-                        db.session.execute(text(insert_stmt), batch_data)
-                        db.session.commit()
-                    except Exception as e:
-                        db.session.rollback()
-                        print(f"Error updating batch data: {e}")
+        if request.args.get('force') == '1':
+            state = request_run(DEMAND_REVISIONS_WATERMARK)
+        else:
+            state = get_watermark(DEMAND_REVISIONS_WATERMARK)
+        if state is None or state.last_run_at is None:
+            return jsonify({
+                'message': 'Demand revision check has not run yet.',
+                'updated_records': 0,
+                'date_range': None,
+                'last_run': None
+            })
 
+        result = state.last_result or {}
+        updated_count = result.get('revised', 0)
         return jsonify({
-            'message': f'Successfully checked for updates. Found {updated_count} records with changed values.',
+            'message': f'Last revision check ({state.last_status}) found {updated_count} records with changed values.',
             'updated_records': updated_count,
             'date_range': {
-                'start': start_date.strftime('%Y-%m-%d %H:%M'),
-                'end': end_date.strftime('%Y-%m-%d %H:%M')
-            }
+                'start': result.get('start'),
+                'end': result.get('end')
+            },
+            'last_run': state.to_dict()
         })
         
     except Exception as e:
@@ -3130,592 +2573,48 @@ def lignite_realtime_heatmap_data():
         current_app.logger.error(f"Error in lignite_realtime_heatmap_data: {str(e)}")
         return jsonify({'code': 500, 'message': 'Internal server error'}), 500
 
+@main.route('/update-solar-data')
 @main.route('/update-unlicensed-solar-data')
+@main.route('/update-licensed-solar-data')
 @login_required
-def update_unlicensed_solar_data():
+def update_solar_data():
+    """Queue the combined licensed/unlicensed solar sync (``?force=1`` queues a re-parse of the whole window)."""
     try:
-        # Get current date
-        current_date = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
-        
-        # Look back 30 days for retroactive updates
-        start_date = current_date - timedelta(days=30)
-        end_date = current_date
-        
-        import os
-        import requests
-        import zipfile
-        import tempfile
-        import json
-        from dotenv import load_dotenv
-        from sqlalchemy import text
+        state = request_run(SOLAR_WATERMARK, force=request.args.get('force') == '1')
+        body = _sync_status(state, 'Solar')
+        body['series'] = (state.last_result or {}).get('series', {})
+        return jsonify(body)
         
-        # Load environment variables
-        load_dotenv()
-        
-        # Get credentials from environment
-        username = os.getenv('XTRADERS_USERNAME')
-        password = os.getenv('XTRADERS_PASSWORD')
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in update_solar_data: {str(e)}")
+        return _err("update_solar_data", e)
+
+@main.route('/forecast-performance-data')
+@login_required
+def get_forecast_performance_data():
+    try:
+        # Get period parameter from request
+        period_days = request.args.get('period', 30, type=int)
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        forecast_horizon = request.args.get('horizon', 'd+1')  # Default to D+1, can be 'd+1' or 'd+2'
         
-        if not username or not password:
-            return jsonify({'error': 'Missing API credentials'}), 500
-        
-        # Get authentication token
-        auth_response = requests.post(
-            "https://api-markets.meteologica.com/api/v1/login",
-            json={"user": username, "password": password},
-            timeout=30,
-        )
-        auth_response.raise_for_status()
-        token = auth_response.json().get("token")
-
-        if not token:
-            return jsonify({'error': 'Failed to get authentication token'}), 500
-        
-        records_added = 0
-        records_updated = 0
-        
-        print(f"🔍 RETROACTIVE UPDATE (Unlicensed Solar):")
-        print(f"   Checking date range: {start_date} to {end_date}")
-        
-        # Calculate which months we need to process
-        months_to_process = set()
-        current_check = start_date
-        while current_check <= end_date:
-            months_to_process.add((current_check.year, current_check.month))
-            # Move to next month
-            if current_check.month == 12:
-                current_check = current_check.replace(year=current_check.year + 1, month=1, day=1)
-            else:
-                current_check = current_check.replace(month=current_check.month + 1, day=1)
-        
-        print(f"   Processing months: {sorted(months_to_process)}")
-        
-        # Collect all data first, then select best for each hour
-        hourly_data = {}  # Key: hour datetime (minute=0), Value: list of forecasts for that hour
-        
-        fetch_failures = []
-        for year, month in sorted(months_to_process):
-            try:
-                # Use content ID 1430 for unlicensed solar
-                _url = f"https://api-markets.meteologica.com/api/v1/contents/1430/historical_data/{year}/{month}"
-                response = requests.get(url=_url, params={"token": token}, timeout=60)
-
-                # Re-authenticate once on 401 (token may have expired mid-loop)
-                if response.status_code == 401:
-                    _reauth = requests.post(
-                        "https://api-markets.meteologica.com/api/v1/login",
-                        json={"user": username, "password": password},
-                        timeout=30,
-                    )
-                    _reauth.raise_for_status()
-                    token = _reauth.json().get("token") or token
-                    response = requests.get(url=_url, params={"token": token}, timeout=60)
-
-                if response.status_code != 200:
-                    msg = f"{year}-{month:02d}: HTTP {response.status_code}"
-                    print(f"Failed to fetch data for {msg}")
-                    fetch_failures.append(msg)
-                    continue
-                
-                # Check if response is a zip file
-                if not (response.headers.get('content-type', '').find('zip') != -1 or response.content.startswith(b'PK')):
-                    print(f"Response for {year}-{month} is not a ZIP file")
-                    continue
-                
-                # Process ZIP file
-                with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as temp_zip:
-                    temp_zip.write(response.content)
-                    temp_zip_path = temp_zip.name
-                
-                try:
-                    with zipfile.ZipFile(temp_zip_path, 'r') as zip_ref:
-                        json_files = [f for f in zip_ref.namelist() if f.endswith('.json')]
-                        
-                        print(f"Processing {year}-{month} (Unlicensed): {len(json_files)} files")
-                        
-                        # Process each JSON file (each represents a forecast at some minute)
-                        for json_filename in json_files:
-                            try:
-                                with zip_ref.open(json_filename) as json_file_handle:
-                                    json_content = json.load(json_file_handle)
-                                    
-                                    # Extract datetime from filename (e.g., 1430_202508141513.json)
-                                    if '_' in json_filename and '.json' in json_filename:
-                                        parts = json_filename.split('_')
-                                        if len(parts) >= 2:
-                                            date_part = parts[1].replace('.json', '')
-                                            if len(date_part) >= 12:
-                                                try:
-                                                    # Parse: 202508141513 -> 2025-08-14 15:13
-                                                    file_year = int(date_part[:4])
-                                                    file_month = int(date_part[4:6])
-                                                    day = int(date_part[6:8])
-                                                    hour = int(date_part[8:10])
-                                                    minute = int(date_part[10:12])
-                                                    
-                                                    from_dt = datetime(file_year, file_month, day, hour, minute, tzinfo=timezone.utc)
-                                                    
-                                                    # Check if this record is in our date range
-                                                    if start_date <= from_dt <= end_date:
-                                                        # Extract forecast value from JSON
-                                                        forecast_value = None
-                                                        if 'data' in json_content and isinstance(json_content['data'], list):
-                                                            for data_entry in json_content['data']:
-                                                                if 'forecast' in data_entry:
-                                                                    forecast_value = float(data_entry['forecast'])
-                                                                    break
-                                                        
-                                                        if forecast_value is not None:
-                                                            # Group by hour (set minute to 0 for the key)
-                                                            hour_key = from_dt.replace(minute=0, second=0, microsecond=0)
-                                                            
-                                                            if hour_key not in hourly_data:
-                                                                hourly_data[hour_key] = []
-                                                            
-                                                            hourly_data[hour_key].append({
-                                                                'original_datetime': from_dt,
-                                                                'forecast_value': forecast_value,
-                                                                'minute': minute
-                                                            })
-                                                        
-                                                except (ValueError, TypeError) as e:
-                                                    continue
-                                            
-                            except Exception as e:
-                                continue
-                finally:
-                    # Clean up temporary file
-                    os.unlink(temp_zip_path)
-                                
-            except Exception as e:
-                print(f"Error processing {year}-{month}: {e}")
-                continue
-        
-        print(f"   Collected data for {len(hourly_data)} hours")
-        
-        # Now select the best forecast for each hour and prepare for database
-        all_data_to_process = []
-        minute_stats = {}
-        
-        for hour_datetime, forecasts in hourly_data.items():
-            # Strategy 1: Prefer minute=0, then closest to minute=0, then use average if multiple
-            if len(forecasts) == 1:
-                # Only one forecast for this hour, use it
-                selected_forecast = forecasts[0]
-            else:
-                # Multiple forecasts for this hour
-                # First, try to find minute=0
-                minute_0_forecasts = [f for f in forecasts if f['minute'] == 0]
-                if minute_0_forecasts:
-                    selected_forecast = minute_0_forecasts[0]  # Use minute=0 if available
-                else:
-                    # No minute=0, find the one closest to minute=0
-                    forecasts.sort(key=lambda x: abs(x['minute']))
-                    selected_forecast = forecasts[0]
-                
-                # Track minute statistics for analysis
-                minutes_in_hour = [f['minute'] for f in forecasts]
-                minutes_key = ','.join(map(str, sorted(minutes_in_hour)))
-                minute_stats[minutes_key] = minute_stats.get(minutes_key, 0) + 1
-            
-            all_data_to_process.append({
-                'datetime': hour_datetime,  # Always use minute=0 for storage
-                'unlicensed_solar': selected_forecast['forecast_value'],
-                'created_at': datetime.now(timezone.utc)
-            })
-        
-        # Print minute analysis
-        if minute_stats:
-            print("   Minute patterns found:")
-            for pattern, count in sorted(minute_stats.items(), key=lambda x: x[1], reverse=True)[:10]:
-                print(f"     {pattern}: {count} hours")
-        
-        print(f"   Final data points to process: {len(all_data_to_process)}")
-        
-        # Now batch process the data using upsert operations
-        batch_size = 500  # Process in smaller batches
-        total_batches = (len(all_data_to_process) + batch_size - 1) // batch_size
-        
-        for i in range(0, len(all_data_to_process), batch_size):
-            batch = all_data_to_process[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            
-            try:
-                upsert_sql = """
-                INSERT INTO unlicensed_solar_data (datetime, unlicensed_solar, created_at)
-                VALUES (:datetime, :unlicensed_solar, :created_at)
-                ON CONFLICT (datetime) DO UPDATE SET
-                    unlicensed_solar = EXCLUDED.unlicensed_solar,
-                    created_at = EXCLUDED.created_at
-                """
-                result = db.session.execute(text(upsert_sql), batch)
-                db.session.commit()
-
-                records_added += len(batch)
-                print(f"   Batch {batch_num}/{total_batches}: {len(batch)} rows upserted")
-                
-            except Exception as e:
-                db.session.rollback()
-                print(f"Error processing batch {batch_num}: {e}")
-                continue
-        
-        return jsonify({
-            'message': f'Successfully processed unlicensed solar data: {records_added} new records added, {records_updated} records updated.',
-            'records_added': records_added,
-            'records_updated': records_updated,
-            'fetch_failures': fetch_failures,
-            'date_range': {
-                'start': start_date.strftime('%Y-%m-%d %H:%M'),
-                'end': end_date.strftime('%Y-%m-%d %H:%M')
-            }
-        })
-        
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error in update_unlicensed_solar_data: {str(e)}")
-        return _err("update_unlicensed_solar_data", e)
-
-@main.route('/update-licensed-solar-data')  
-@login_required
-def update_licensed_solar_data():
-    try:
-        # Get current date
-        current_date = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
-        
-        # Look back 30 days for retroactive updates
-        start_date = current_date - timedelta(days=30)
-        end_date = current_date
-        
-        import os
-        import requests
-        import zipfile
-        import tempfile
-        import json
-        from dotenv import load_dotenv
-        from sqlalchemy import text
-        
-        load_dotenv()
-        
-        username = os.getenv('XTRADERS_USERNAME')
-        password = os.getenv('XTRADERS_PASSWORD')
-        
-        if not username or not password:
-            return jsonify({'error': 'Missing API credentials'}), 500
-        
-        # Get authentication token
-        auth_response = requests.post(
-            "https://api-markets.meteologica.com/api/v1/login",
-            json={"user": username, "password": password},
-            timeout=30,
-        )
-        auth_response.raise_for_status()
-        token = auth_response.json().get("token")
-
-        records_added = 0
-        records_updated = 0
-
-        print(f"🔍 RETROACTIVE UPDATE (Licensed Solar):")
-        print(f"   Checking date range: {start_date} to {end_date}")
-        
-        # Calculate which months we need to process
-        months_to_process = set()
-        current_check = start_date
-        while current_check <= end_date:
-            months_to_process.add((current_check.year, current_check.month))
-            # Move to next month
-            if current_check.month == 12:
-                current_check = current_check.replace(year=current_check.year + 1, month=1, day=1)
-            else:
-                current_check = current_check.replace(month=current_check.month + 1, day=1)
-        
-        print(f"   Processing months: {sorted(months_to_process)}")
-        
-        # Collect all data first, then select best for each hour
-        hourly_data = {}  # Key: hour datetime (minute=0), Value: list of forecasts for that hour
-        
-        fetch_failures = []
-        for year, month in sorted(months_to_process):
-            try:
-                # Use content ID 1429 for licensed solar
-                _url = f"https://api-markets.meteologica.com/api/v1/contents/1429/historical_data/{year}/{month}"
-                response = requests.get(url=_url, params={"token": token}, timeout=60)
-
-                # Re-authenticate once on 401 (token may have expired mid-loop)
-                if response.status_code == 401:
-                    _reauth = requests.post(
-                        "https://api-markets.meteologica.com/api/v1/login",
-                        json={"user": username, "password": password},
-                        timeout=30,
-                    )
-                    _reauth.raise_for_status()
-                    token = _reauth.json().get("token") or token
-                    response = requests.get(url=_url, params={"token": token}, timeout=60)
-
-                if response.status_code != 200:
-                    msg = f"{year}-{month:02d}: HTTP {response.status_code}"
-                    print(f"Failed to fetch data for {msg}")
-                    fetch_failures.append(msg)
-                    continue
-                
-                # Check if response is a zip file
-                if not (response.headers.get('content-type', '').find('zip') != -1 or response.content.startswith(b'PK')):
-                    print(f"Response for {year}-{month} is not a ZIP file")
-                    continue
-                
-                # Process ZIP file
-                with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as temp_zip:
-                    temp_zip.write(response.content)
-                    temp_zip_path = temp_zip.name
-                
-                try:
-                    with zipfile.ZipFile(temp_zip_path, 'r') as zip_ref:
-                        json_files = [f for f in zip_ref.namelist() if f.endswith('.json')]
-                        
-                        print(f"Processing {year}-{month} (Licensed): {len(json_files)} files")
-                        
-                        # Process each JSON file (each represents a forecast at some minute)
-                        for json_filename in json_files:
-                            try:
-                                with zip_ref.open(json_filename) as json_file_handle:
-                                    json_content = json.load(json_file_handle)
-                                    
-                                    # Extract datetime from filename (e.g., 1429_202508141513.json)
-                                    if '_' in json_filename and '.json' in json_filename:
-                                        parts = json_filename.split('_')
-                                        if len(parts) >= 2:
-                                            date_part = parts[1].replace('.json', '')
-                                            if len(date_part) >= 12:
-                                                try:
-                                                    # Parse: 202508141513 -> 2025-08-14 15:13
-                                                    file_year = int(date_part[:4])
-                                                    file_month = int(date_part[4:6])
-                                                    day = int(date_part[6:8])
-                                                    hour = int(date_part[8:10])
-                                                    minute = int(date_part[10:12])
-                                                    
-                                                    from_dt = datetime(file_year, file_month, day, hour, minute, tzinfo=timezone.utc)
-                                                    
-                                                    # Check if this record is in our date range
-                                                    if start_date <= from_dt <= end_date:
-                                                        # Extract forecast value from JSON
-                                                        forecast_value = None
-                                                        if 'data' in json_content and isinstance(json_content['data'], list):
-                                                            for data_entry in json_content['data']:
-                                                                if 'forecast' in data_entry:
-                                                                    forecast_value = float(data_entry['forecast'])
-                                                                    break
-                                                        
-                                                        if forecast_value is not None:
-                                                            # Group by hour (set minute to 0 for the key)
-                                                            hour_key = from_dt.replace(minute=0, second=0, microsecond=0)
-                                                            
-                                                            if hour_key not in hourly_data:
-                                                                hourly_data[hour_key] = []
-                                                            
-                                                            hourly_data[hour_key].append({
-                                                                'original_datetime': from_dt,
-                                                                'forecast_value': forecast_value,
-                                                                'minute': minute
-                                                            })
-                                                        
-                                                except (ValueError, TypeError) as e:
-                                                    continue
-                                            
-                            except Exception as e:
-                                continue
-                finally:
-                    # Clean up temporary file
-                    os.unlink(temp_zip_path)
-                                
-            except Exception as e:
-                print(f"Error processing {year}-{month}: {e}")
-                continue
-        
-        print(f"   Collected data for {len(hourly_data)} hours")
-        
-        # Now select the best forecast for each hour and prepare for database
-        all_data_to_process = []
-        minute_stats = {}
-        
-        for hour_datetime, forecasts in hourly_data.items():
-            # Strategy 1: Prefer minute=0, then closest to minute=0, then use average if multiple
-            if len(forecasts) == 1:
-                # Only one forecast for this hour, use it
-                selected_forecast = forecasts[0]
-            else:
-                # Multiple forecasts for this hour
-                # First, try to find minute=0
-                minute_0_forecasts = [f for f in forecasts if f['minute'] == 0]
-                if minute_0_forecasts:
-                    selected_forecast = minute_0_forecasts[0]  # Use minute=0 if available
-                else:
-                    # No minute=0, find the one closest to minute=0
-                    forecasts.sort(key=lambda x: abs(x['minute']))
-                    selected_forecast = forecasts[0]
-                
-                # Track minute statistics for analysis
-                minutes_in_hour = [f['minute'] for f in forecasts]
-                minutes_key = ','.join(map(str, sorted(minutes_in_hour)))
-                minute_stats[minutes_key] = minute_stats.get(minutes_key, 0) + 1
-            
-            all_data_to_process.append({
-                'datetime': hour_datetime,  # Always use minute=0 for storage
-                'licensed_solar': selected_forecast['forecast_value'],
-                'created_at': datetime.now(timezone.utc)
-            })
-        
-        # Print minute analysis
-        if minute_stats:
-            print("   Minute patterns found:")
-            for pattern, count in sorted(minute_stats.items(), key=lambda x: x[1], reverse=True)[:10]:
-                print(f"     {pattern}: {count} hours")
-        
-        print(f"   Final data points to process: {len(all_data_to_process)}")
-        
-        # Now batch process the data using upsert operations
-        batch_size = 500  # Process in smaller batches
-        total_batches = (len(all_data_to_process) + batch_size - 1) // batch_size
-        
-        for i in range(0, len(all_data_to_process), batch_size):
-            batch = all_data_to_process[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            
-            try:
-                # Use PostgreSQL's ON CONFLICT DO UPDATE for upsert
-                upsert_sql = """
-                INSERT INTO licensed_solar_data (datetime, licensed_solar, created_at)
-                VALUES (:datetime, :licensed_solar, :created_at)
-                ON CONFLICT (datetime) DO UPDATE SET
-                    licensed_solar = EXCLUDED.licensed_solar,
-                    created_at = EXCLUDED.created_at
-                """
-                
-                result = db.session.execute(text(upsert_sql), batch)
-                db.session.commit()
-
-                records_added += len(batch)
-                print(f"   Batch {batch_num}/{total_batches}: {len(batch)} rows upserted")
-                
-            except Exception as e:
-                db.session.rollback()
-                print(f"Error processing batch {batch_num}: {e}")
-                continue
-        
-        return jsonify({
-            'message': f'Successfully processed licensed solar data: {records_added} new records added, {records_updated} records updated.',
-            'records_added': records_added,
-            'records_updated': records_updated,
-            'fetch_failures': fetch_failures,
-            'date_range': {
-                'start': start_date.strftime('%Y-%m-%d %H:%M'),
-                'end': end_date.strftime('%Y-%m-%d %H:%M')
-            }
-        })
-        
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error in update_licensed_solar_data: {str(e)}")
-        return _err("update_licensed_solar_data", e)
-
-@main.route('/forecast-performance-data')
-@login_required
-def get_forecast_performance_data():
-    try:
-        # Get period parameter from request
-        period_days = request.args.get('period', '30', type=int)
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        forecast_horizon = request.args.get('horizon', 'd+1')  # Default to D+1, can be 'd+1' or 'd+2'
-        
-        engine = _get_supabase_engine()
-
         # Resolve date range before querying so we can push it into SQL
         if start_date and end_date:
             start_dt = pd.to_datetime(start_date)
             end_dt   = pd.to_datetime(end_date)
             period_info = f"{start_date} to {end_date}"
         else:
-            end_dt   = pd.Timestamp.now()
+            # Hour-aligned so the 30/60/90-day views share one cached range
+            end_dt   = pd.Timestamp.now().floor('h')
             start_dt = end_dt - pd.Timedelta(days=period_days)
             period_info = f"Last {period_days} Days"
 
-        sq = {"start_dt": start_dt, "end_dt": end_dt}
-
-        if forecast_horizon.lower() == 'd+2':
-            met_table   = 'public."meteologica_forecast_d+2"'
-            model_table = 'public.model_forecast_sfc'
-            cemre_table = 'public."cemre_ptf_d+2"'
-        else:
-            met_table   = 'public.meteologica_forecast'
-            model_table = 'public.model_forecast_ptf'
-            cemre_table = 'public."cemre_ptf_d+1"'
-
-        def _parse_dates(df):
-            if not pd.api.types.is_datetime64_any_dtype(df['date']):
-                df['date'] = df['date'].apply(
-                    lambda x: str(x).split('+')[0].replace('T', ' ') if isinstance(x, str) else x
-                )
-            df['date'] = pd.to_datetime(df['date'])
-            return df
-
-        with engine.connect() as conn:
-            ptf_df = pd.read_sql(text(
-                "SELECT date, price AS actual_price FROM epias.ptf"
-                " WHERE date >= :start_dt AND date <= :end_dt"
-            ), con=conn, params=sq)
-
-            if ptf_df.empty:
-                return jsonify({'error': 'No PTF data available'}), 404
-
-            meteologica_forecast = pd.read_sql(text(
-                f"SELECT date, min_price AS meteologica_min,"
-                f" avg_price AS meteologica_avg, max_price AS meteologica_max"
-                f" FROM {met_table}"
-                f" WHERE date::timestamp >= :start_dt AND date::timestamp <= :end_dt"
-            ), con=conn, params=sq)
-
-            try:
-                model_forecast = pd.read_sql(text(
-                    f"SELECT date, best_price FROM {model_table}"
-                    f" WHERE date::timestamp >= :start_dt AND date::timestamp <= :end_dt"
-                ), con=conn, params=sq)
-            except Exception as e:
-                current_app.logger.warning(
-                    "Forecast query SELECT date,best_price failed for %r (%s); falling back to SELECT *",
-                    model_table, e,
-                )
-                conn.rollback()
-                model_forecast = pd.read_sql(text(
-                    f"SELECT * FROM {model_table}"
-                    f" WHERE date::timestamp >= :start_dt AND date::timestamp <= :end_dt"
-                ), con=conn, params=sq)
-                price_cols = [c for c in model_forecast.columns
-                              if 'price' in c.lower() or 'forecast' in c.lower()]
-                if price_cols:
-                    model_forecast = model_forecast[['date', price_cols[0]]].rename(
-                        columns={price_cols[0]: 'best_price'})
-                else:
-                    num_cols = model_forecast.select_dtypes(include=['number']).columns.tolist()
-                    if num_cols:
-                        model_forecast = model_forecast[['date', num_cols[0]]].rename(
-                            columns={num_cols[0]: 'best_price'})
-
-            cemre_forecast = pd.read_sql(text(
-                f"SELECT date, forecasted_price AS cemre_forecast FROM {cemre_table}"
-                f" WHERE date >= :start_dt AND date <= :end_dt"
-            ), con=conn, params=sq)
-
-        ptf_df              = _parse_dates(ptf_df)
-        meteologica_forecast = _parse_dates(meteologica_forecast)
-        model_forecast      = _parse_dates(model_forecast) if not model_forecast.empty else model_forecast
-        cemre_forecast      = _parse_dates(cemre_forecast) if not cemre_forecast.empty else cemre_forecast
-
-        ptf_df['actual_price'] = ptf_df['actual_price'].apply(lambda x: 1 if x <= 0 else x)
-
-        price_df = pd.merge(ptf_df, meteologica_forecast, on='date', how='outer').sort_values(by='date')
-        price_df = pd.merge(price_df, model_forecast, on='date', how='left')
-        if not cemre_forecast.empty:
-            price_df = pd.merge(price_df, cemre_forecast, on='date', how='left')
+        engine = market_engine(*comparison_tables(forecast_horizon), since=start_dt)
+        price_df = comparison_frame(engine, forecast_horizon, start_dt, end_dt)
+        if price_df is None:
+            return jsonify({'error': 'No PTF data available'}), 404
         
         # Remove rows with missing actual prices for evaluation
         evaluation_df = price_df.dropna(subset=['actual_price']).copy()
@@ -3725,33 +2624,6 @@ def get_forecast_performance_data():
                 'error': 'No data available with actual prices for evaluation period'
             }), 404
         
-        # Calculate forecast metrics using numpy only
-        def calculate_darts_metrics(actual_series, forecast_series):
-            try:
-                actual_clean = actual_series.dropna()
-                forecast_clean = forecast_series[actual_clean.index].dropna()
-                if len(forecast_clean) == 0 or len(actual_clean) == 0:
-                    return {'wmape': 0, 'rmse': 0, 'r2': 0}
-                common_indices = actual_clean.index.intersection(forecast_clean.index)
-                if len(common_indices) == 0:
-                    return {'wmape': 0, 'rmse': 0, 'r2': 0}
-                a = actual_clean[common_indices].values.astype(float)
-                f = forecast_clean[common_indices].values.astype(float)
-                denom = np.sum(np.abs(a))
-                wmape_score = float(np.sum(np.abs(a - f)) / denom * 100) if denom != 0 else 0
-                rmse_score  = float(np.sqrt(np.mean((a - f) ** 2)))
-                ss_res = np.sum((a - f) ** 2)
-                ss_tot = np.sum((a - np.mean(a)) ** 2)
-                r2_score_value = float(1 - ss_res / ss_tot) if ss_tot > 0 else 0
-                return {
-                    'wmape': round(wmape_score, 2),
-                    'rmse':  round(rmse_score, 2),
-                    'r2':    round(r2_score_value, 2),
-                }
-            except Exception as e:
-                print(f"Error in calculate_darts_metrics: {e}")
-                return {'wmape': 0, 'rmse': 0, 'r2': 0}
-        
         # Prepare response data
         response_data = {
             'dates': evaluation_df['date'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
@@ -3766,31 +2638,8 @@ def get_forecast_performance_data():
             'forecast_horizon': forecast_horizon
         }
         
-        # Calculate metrics only for series with data
-        metrics = {}
-        actual_series = evaluation_df['actual_price']
-        
-        if not actual_series.dropna().empty:
-            # Define models to evaluate - automatically detect available columns
-            models_to_evaluate = [
-                ('meteologica_min', 'Meteologica Min'),
-                ('meteologica_avg', 'Meteologica Avg'),
-                ('meteologica_max', 'Meteologica Max'),
-                ('best_price', 'Model Forecast'),
-                ('cemre_forecast', 'Cemre Forecast'),
-                # Add new models here - format: ('column_name', 'Display Name')
-                # Example: ('xgboost_price', 'XGBoost Model'),
-                # Example: ('prophet_price', 'Prophet Model'),
-                # Example: ('ensemble_price', 'Ensemble Model'),
-            ]
-            
-            for col, name in models_to_evaluate:
-                if col in evaluation_df.columns and not evaluation_df[col].dropna().empty:
-                    try:
-                        metrics[name] = calculate_darts_metrics(actual_series, evaluation_df[col])
-                    except Exception as e:
-                        print(f"Error calculating metrics for {name}: {e}")
-                        metrics[name] = {'wmape': 0, 'rmse': 0, 'r2': 0}
+        # Whole stored days come from forecast_error_daily, the remaining hours from this frame
+        metrics = window_metrics(forecast_horizon, start_dt, end_dt, evaluation_df)
         
         response_data['metrics'] = metrics
         
@@ -3803,161 +2652,91 @@ def get_forecast_performance_data():
         print(f"Error in get_forecast_performance_data: {str(e)}")
         return _err("get_forecast_performance_data", e)
 
+@main.route('/forecast-performance-trend')
+@login_required
+def get_forecast_performance_trend():
+    """Per-day MAE, bias, WMAPE, RMSE and direction hit rate of each forecast source."""
+    try:
+        period_days = request.args.get('period', 90, type=int)
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        forecast_horizon = request.args.get('horizon', 'd+1')
+
+        if start_date and end_date:
+            first_day = datetime.strptime(start_date, '%Y-%m-%d').date()
+            last_day = datetime.strptime(end_date, '%Y-%m-%d').date()
+        else:
+            last_day = datetime.now().date()
+            first_day = last_day - timedelta(days=period_days)
+
+        trend = metrics_trend(forecast_horizon, first_day, last_day)
+        state = get_watermark(FORECAST_METRICS_WATERMARK)
+        trend.update({
+            'forecast_horizon': forecast_horizon,
+            'period_info': f"{first_day} to {last_day}",
+            'last_run': state.to_dict() if state else None,
+        })
+        return jsonify({'code': 200, 'data': trend})
+
+    except Exception as e:
+        print(f"Error in get_forecast_performance_trend: {str(e)}")
+        return _err("get_forecast_performance_trend", e)
+
 @main.route('/download-forecast-performance-excel')
 @login_required
 def download_forecast_performance_excel():
     """Download forecast performance data as Excel file"""
     try:
-        from io import BytesIO
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-        from openpyxl.utils import get_column_letter
-        
         # Get parameters from request
-        period_days = request.args.get('period', '30', type=int)
+        period_days = request.args.get('period', 30, type=int)
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         forecast_horizon = request.args.get('horizon', 'd+1')
         
-        engine = _get_supabase_engine()
-
         if start_date and end_date:
             start_dt = pd.to_datetime(start_date)
             end_dt   = pd.to_datetime(end_date)
         else:
-            end_dt   = pd.Timestamp.now()
+            end_dt   = pd.Timestamp.now().floor('h')
             start_dt = end_dt - pd.Timedelta(days=period_days)
 
-        sq = {"start_dt": start_dt, "end_dt": end_dt}
-
-        if forecast_horizon.lower() == 'd+2':
-            met_table   = 'public."meteologica_forecast_d+2"'
-            model_table = 'public.model_forecast_sfc'
-            cemre_table = 'public."cemre_ptf_d+2"'
-        else:
-            met_table   = 'public.meteologica_forecast'
-            model_table = 'public.model_forecast_ptf'
-            cemre_table = 'public."cemre_ptf_d+1"'
-
-        def _parse_dates(df):
-            if not df.empty and not pd.api.types.is_datetime64_any_dtype(df['date']):
-                df['date'] = df['date'].apply(
-                    lambda x: str(x).split('+')[0].replace('T', ' ') if isinstance(x, str) else x
-                )
-            if not df.empty:
-                df['date'] = pd.to_datetime(df['date'])
-            return df
-
-        with engine.connect() as conn:
-            ptf_df = pd.read_sql(text(
-                "SELECT date, price AS actual_price FROM epias.ptf"
-                " WHERE date >= :start_dt AND date <= :end_dt"
-            ), con=conn, params=sq)
-
-            if ptf_df.empty:
-                return jsonify({'error': 'No PTF data available'}), 404
-
-            meteologica_forecast = pd.read_sql(text(
-                f"SELECT date, min_price AS meteologica_min,"
-                f" avg_price AS meteologica_avg, max_price AS meteologica_max"
-                f" FROM {met_table} WHERE date::timestamp >= :start_dt AND date::timestamp <= :end_dt"
-            ), con=conn, params=sq)
+        # Same cached frame the performance chart was drawn from
+        engine = market_engine(*comparison_tables(forecast_horizon), since=start_dt)
+        price_df = comparison_frame(engine, forecast_horizon, start_dt, end_dt)
+        if price_df is None:
+            return jsonify({'error': 'No PTF data available'}), 404
+
+        evaluation_df = price_df[price_df['actual_price'].notna()]
+        columns = ['actual_price', 'meteologica_min', 'meteologica_avg', 'meteologica_max',
+                   'best_price', 'cemre_forecast']
+        sheet = pd.DataFrame({
+            'Date': evaluation_df['date'].dt.strftime('%Y-%m-%d %H:%M:%S'),
+            **{
+                col: evaluation_df[col].round(2).fillna(0) if col in evaluation_df.columns else 0
+                for col in columns
+            },
+        })
+        sheet.columns = ['Date', 'Realized Price (TL/MWh)', 'Meteologica Min', 'Meteologica Avg',
+                         'Meteologica Max', 'Model Forecast', 'Cemre Forecast']
+
+        def write(workbook):
+            ws = workbook.add_worksheet("Forecast Performance")
+            header_format = workbook.add_format({
+                'bold': True, 'font_color': '#FFFFFF', 'font_size': 11, 'bg_color': '#366092',
+                'align': 'center', 'valign': 'vcenter', 'border': 1,
+            })
+            ws.set_column(0, len(sheet.columns) - 1, 20)
+            write_frame(ws, sheet, header_format=header_format, cell_format=workbook.add_format({'border': 1}))
 
-            try:
-                model_forecast = pd.read_sql(text(
-                    f"SELECT date, best_price FROM {model_table}"
-                    f" WHERE date::timestamp >= :start_dt AND date::timestamp <= :end_dt"
-                ), con=conn, params=sq)
-            except Exception as e:
-                current_app.logger.warning(
-                    "Forecast query SELECT date,best_price failed for %r (%s); falling back to SELECT *",
-                    model_table, e,
-                )
-                conn.rollback()
-                model_forecast = pd.read_sql(text(
-                    f"SELECT * FROM {model_table}"
-                    f" WHERE date::timestamp >= :start_dt AND date::timestamp <= :end_dt"
-                ), con=conn, params=sq)
-                price_cols = [c for c in model_forecast.columns
-                              if 'price' in c.lower() or 'forecast' in c.lower()]
-                if price_cols:
-                    model_forecast = model_forecast[['date', price_cols[0]]].rename(
-                        columns={price_cols[0]: 'best_price'})
-
-            cemre_forecast = pd.read_sql(text(
-                f"SELECT date, forecasted_price AS cemre_forecast FROM {cemre_table}"
-                f" WHERE date >= :start_dt AND date <= :end_dt"
-            ), con=conn, params=sq)
-
-        ptf_df              = _parse_dates(ptf_df)
-        meteologica_forecast = _parse_dates(meteologica_forecast)
-        model_forecast      = _parse_dates(model_forecast)
-        cemre_forecast      = _parse_dates(cemre_forecast)
-
-        ptf_df['actual_price'] = ptf_df['actual_price'].apply(lambda x: 1 if x <= 0 else x)
-
-        price_df = pd.merge(ptf_df, meteologica_forecast, on='date', how='outer').sort_values(by='date')
-        price_df = pd.merge(price_df, model_forecast, on='date', how='left')
-        if not cemre_forecast.empty:
-            price_df = pd.merge(price_df, cemre_forecast, on='date', how='left')
-
-        # Prepare data for Excel
-        evaluation_df = price_df.dropna(subset=['actual_price']).copy()
-        
-        # Create Excel workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Forecast Performance"
-        
-        # Define styles
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Write headers
-        headers = ['Date', 'Realized Price (TL/MWh)', 'Meteologica Min', 'Meteologica Avg', 
-                   'Meteologica Max', 'Model Forecast', 'Cemre Forecast']
-        
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = border
-        
-        # Write data
-        for row_num, row_data in enumerate(evaluation_df.itertuples(index=False), 2):
-            ws.cell(row=row_num, column=1, value=row_data.date.strftime('%Y-%m-%d %H:%M:%S')).border = border
-            ws.cell(row=row_num, column=2, value=round(row_data.actual_price, 2) if pd.notna(row_data.actual_price) else 0).border = border
-            ws.cell(row=row_num, column=3, value=round(row_data.meteologica_min, 2) if pd.notna(row_data.meteologica_min) else 0).border = border
-            ws.cell(row=row_num, column=4, value=round(row_data.meteologica_avg, 2) if pd.notna(row_data.meteologica_avg) else 0).border = border
-            ws.cell(row=row_num, column=5, value=round(row_data.meteologica_max, 2) if pd.notna(row_data.meteologica_max) else 0).border = border
-            ws.cell(row=row_num, column=6, value=round(row_data.best_price, 2) if 'best_price' in evaluation_df.columns and pd.notna(row_data.best_price) else 0).border = border
-            ws.cell(row=row_num, column=7, value=round(row_data.cemre_forecast, 2) if 'cemre_forecast' in evaluation_df.columns and pd.notna(row_data.cemre_forecast) else 0).border = border
-        
-        # Auto-adjust column widths
-        for col_num in range(1, len(headers) + 1):
-            ws.column_dimensions[get_column_letter(col_num)].width = 20
-        
-        # Save to BytesIO
-        excel_file = BytesIO()
-        wb.save(excel_file)
-        excel_file.seek(0)
+        workbook_file, size = build_workbook(write)
         
         # Generate filename
         filename = f"forecast_performance_{forecast_horizon}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         
-        return send_file(
-            excel_file,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
+        return Response(
+            iter_file(workbook_file),
+            mimetype=XLSX_MIMETYPE,
+            headers={'Content-Disposition': f'attachment; filename={filename}', 'Content-Length': str(size)}
         )
         
     except Exception as e:
@@ -3965,43 +2744,8 @@ def download_forecast_performance_excel():
         return _err("download_forecast_performance_excel", e)
 
 
-def _calculate_merit_order_price(supply_demand_df, capacity_deltas):
-    """Calculate merit order prices by shifting supply/demand intersection by capacity deltas.
-    
-    Args:
-        supply_demand_df: DataFrame with columns [date, hour, price, supply, demand, capacity(Δ)]
-        capacity_deltas: list of capacity delta values, one per hour
-    
-    Returns:
-        list of forecast price points
-    """
-    forecast_data = []
-    hours_unique = supply_demand_df['hour'].unique()
-    
-    for hour_code, hour_idx in zip(hours_unique, range(len(hours_unique))):
-        if hour_idx >= len(capacity_deltas):
-            break
-            
-        hourly_data = supply_demand_df[supply_demand_df['hour'] == hour_code].sort_values(by='price')
-        
-        if hourly_data.empty:
-            continue
-        
-        trade_capacity = hourly_data.loc[hourly_data['capacity(Δ)'].abs().idxmin(), 'capacity(Δ)']
-        required_capacity = capacity_deltas[hour_idx]
-        
-        try:
-            if (trade_capacity - required_capacity) < hourly_data['capacity(Δ)'].min():
-                new_price_point = hourly_data[hourly_data['capacity(Δ)'] >= (trade_capacity - required_capacity)].iloc[-1]
-            else:
-                new_price_point = hourly_data[hourly_data['capacity(Δ)'] <= (trade_capacity - required_capacity)].iloc[0]
-            
-            forecast_data.append(new_price_point)
-        except (IndexError, KeyError):
-            # If no matching price point found, use the closest one
-            forecast_data.append(hourly_data.iloc[hourly_data['capacity(Δ)'].sub(trade_capacity - required_capacity).abs().idxmin()])
-    
-    return forecast_data
+def _aic_token():
+    return get_tgt_token(current_app.config.get('USERNAME'), current_app.config.get('PASSWORD'))
 
 
 @main.route('/merit-order-data')
@@ -4021,90 +2765,23 @@ def get_merit_order_data():
         except ValueError:
             return jsonify({'code': 400, 'message': 'Dates must be in YYYY-MM-DD format'}), 400
 
-        engine = _get_supabase_engine()
-
-        # Reference query — historical forecast data
-        ref_query = text("""
-        SELECT
-            hf.date AS date,
-            DATE(hf.date) AS day,
-            TO_CHAR(hf.date, 'HH24:MI') AS hour,
-            ptf.price AS mcp_ref,
-            hf.demand_forecast AS demand,
-            hf.wind_forecast AS wind,
-            hf.licensed_solar_forecast + hf.unlicensed_solar_forecast AS solar,
-            hf.runofriver_forecast AS river
-        FROM meteologica.historical_forecast hf
-        JOIN epias.ptf ptf ON ptf.date = hf.date
-        WHERE DATE(hf.date) = :gen_date
-        ORDER BY hf.date
-        """)
-
-        # Prediction query — current forecast data
-        pred_query = text("""
-        SELECT
-            CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP) AS date,
-            DATE(CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP)) AS day,
-            TO_CHAR(CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP), 'HH24:MI') AS hour,
-            p.price_forecast AS mcp_pred,
-            d.demand_forecast AS demand,
-            w.wind_forecast AS wind,
-            ls.licensed_forecast + us.unlicensed_forecast AS solar,
-            ror.runofriver_forecast AS river
-        FROM meteologica.demand d
-        JOIN meteologica.price p ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(p."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        JOIN meteologica.wind w ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(w."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        JOIN meteologica.licensed_solar ls ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(ls."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        JOIN meteologica.unlicensed_solar us ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(us."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        JOIN meteologica.runofriver_hydro ror ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(ror."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        WHERE DATE(CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP)) = :pred_date
-        ORDER BY date
-        """)
-
-        # Supply/demand curve for reference date (for merit order price calculation)
-        supply_demand_query = text("""
-        SELECT date, TO_CHAR(date, 'HH24:MI') AS hour, price, supply, demand
-        FROM epias.supply_demand
-        WHERE DATE(date) = :gen_date
-        ORDER BY date, price
-        """)
-
-        with engine.connect() as conn:
-            ref_df = pd.read_sql(ref_query, con=conn, params={"gen_date": gen_date_parsed})
-            pred_df = pd.read_sql(pred_query, con=conn, params={"pred_date": pred_date_parsed})
-            pred_df['day'] = pd.to_datetime(pred_df['day'])
-            pred_df['mcp_pred'] = pred_df['mcp_pred'].round(2)
-            supply_demand_df = pd.read_sql(supply_demand_query, con=conn, params={"gen_date": gen_date_parsed})
+        engine = market_engine(*MERIT_ORDER_TABLES, since=min(gen_date_parsed, pred_date_parsed))
+        frames = merit_order_comparison(engine, gen_date_parsed, pred_date_parsed)
+        df_diff = frames['diff']
 
-        if ref_df.empty:
+        if frames['ref'].empty:
             return jsonify({'code': 404, 'message': f'No reference data found for {gen_date}'}), 404
 
-        if pred_df.empty:
+        if frames['pred'].empty:
             return jsonify({'code': 404, 'message': f'No prediction data found for {pred_date}'}), 404
-
-        # Merge on hour
-        cols = ['demand', 'river', 'wind', 'solar']
-        df_diff = pd.merge(ref_df, pred_df, on='hour', suffixes=('_ref', '_pred'))
-        
-        # Calculate deltas
-        for col in cols:
-            df_diff[f'{col}_delta'] = df_diff[f'{col}_pred'] - df_diff[f'{col}_ref']
-        
-        # Calculate capacity delta
-        df_diff['capacity_delta'] = (df_diff['demand_delta'] 
-                                     - df_diff['river_delta'] - df_diff['wind_delta'] 
-                                     - df_diff['solar_delta'])
         
         # Calculate merit order price from supply/demand curves
+        curves = frames['curves']
         mcp_merit_values = []
-        if not supply_demand_df.empty:
-            supply_demand_df['capacity(Δ)'] = supply_demand_df['demand'] + supply_demand_df['supply']
-            capacity_deltas = df_diff['capacity_delta'].tolist()
-            forecast_points = _calculate_merit_order_price(supply_demand_df, capacity_deltas)
-            
-            if len(forecast_points) == len(df_diff):
-                forecast_prices_df = pd.concat(forecast_points, axis=1).T
-                mcp_merit_values = forecast_prices_df['price'].tolist()
+        if curves is not None:
+            merit_prices = curves.prices(df_diff['capacity_delta'].to_numpy())
+            if len(merit_prices) == len(df_diff):
+                mcp_merit_values = merit_prices.tolist()
             
         # Build result rows
         result_rows = []
@@ -4113,7 +2790,7 @@ def get_merit_order_data():
                 'date_ref': str(row['date_ref']),
                 'date_pred': str(row['date_pred']),
                 'mcp_ref': float(row['mcp_ref']) if pd.notna(row.get('mcp_ref')) else None,
-                'mcp_merit': float(mcp_merit_values[idx]) if idx < len(mcp_merit_values) else None,
+                'mcp_merit': float(mcp_merit_values[idx]) if idx < len(mcp_merit_values) and pd.notna(mcp_merit_values[idx]) else None,
                 'mcp_pred': float(row['mcp_pred']) if pd.notna(row.get('mcp_pred')) else None,
                 'capacity_delta': float(row['capacity_delta']) if pd.notna(row['capacity_delta']) else None,
                 'demand_ref': float(row['demand_ref']) if pd.notna(row['demand_ref']) else None,
@@ -4142,12 +2819,12 @@ def get_merit_order_data():
         
         # Build supply/demand curve data for client-side MCP recalculation
         supply_demand_curves = {}
-        if not supply_demand_df.empty:
-            for hour_code in supply_demand_df['hour'].unique():
-                hourly = supply_demand_df[supply_demand_df['hour'] == hour_code].sort_values(by='price')
+        if curves is not None:
+            for hour_code in curves.hours:
+                prices, capacities = curves.curve(hour_code)
                 supply_demand_curves[hour_code] = {
-                    'prices': hourly['price'].tolist(),
-                    'capacities': hourly['capacity(Δ)'].tolist()
+                    'prices': prices.tolist(),
+                    'capacities': capacities.tolist()
                 }
 
         # Base capacity deltas (before any AIC adjustments)
@@ -4191,58 +2868,12 @@ def get_merit_order_power_plant_results():
         except ValueError:
             return jsonify({'code': 400, 'message': 'Dates must be in YYYY-MM-DD format'}), 400
 
-        engine = _get_supabase_engine()
-
-        # Reference query
-        ref_query = text("""
-        SELECT
-            hf.date AS date,
-            DATE(hf.date) AS day,
-            TO_CHAR(hf.date, 'HH24:MI') AS hour,
-            p.price_forecast AS mcp_ref,
-            hf.demand_forecast AS demand,
-            hf.wind_forecast AS wind,
-            hf.licensed_solar_forecast + hf.unlicensed_solar_forecast AS solar,
-            hf.runofriver_forecast AS river
-        FROM meteologica.historical_forecast hf
-        JOIN meteologica.price p ON TO_TIMESTAMP(p."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI:SI') = hf.date
-        WHERE DATE(hf.date) = :gen_date
-        ORDER BY hf.date
-        """)
-
-        # Prediction query
-        pred_query = text("""
-        SELECT
-            CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP) AS date,
-            DATE(CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP)) AS day,
-            TO_CHAR(CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP), 'HH24:MI') AS hour,
-            p.price_forecast AS mcp_pred,
-            d.demand_forecast AS demand,
-            w.wind_forecast AS wind,
-            ls.licensed_forecast + us.unlicensed_forecast AS solar,
-            ror.runofriver_forecast AS river
-        FROM meteologica.demand d
-        JOIN meteologica.price p ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(p."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        JOIN meteologica.wind w ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(w."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        JOIN meteologica.licensed_solar ls ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(ls."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        JOIN meteologica.unlicensed_solar us ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(us."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        JOIN meteologica.runofriver_hydro ror ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(ror."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        WHERE DATE(CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP)) = :pred_date
-        ORDER BY date
-        """)
-
-        supply_demand_query = text("""
-        SELECT date, TO_CHAR(date, 'HH24:MI') AS hour, price, supply, demand
-        FROM epias.supply_demand
-        WHERE DATE(date) = :gen_date
-        ORDER BY date, price
-        """)
+        engine = market_engine(*MERIT_ORDER_TABLES, since=min(gen_date_parsed, pred_date_parsed))
 
+        ref_df = load_forecast_reference(engine, gen_date_parsed)
         with engine.connect() as conn:
-            ref_df = pd.read_sql(ref_query, con=conn, params={"gen_date": gen_date_parsed})
-            pred_df = pd.read_sql(pred_query, con=conn, params={"pred_date": pred_date_parsed})
-            pred_df['mcp_pred'] = pred_df['mcp_pred'].round(2)
-            supply_demand_df = pd.read_sql(supply_demand_query, con=conn, params={"gen_date": gen_date_parsed})
+            supply_demand_df = pd.read_sql(SUPPLY_DEMAND_QUERY, con=conn, params={"gen_date": gen_date_parsed})
+        pred_df = load_prediction(engine, pred_date_parsed)
 
         if ref_df.empty or pred_df.empty or supply_demand_df.empty:
             return jsonify({'code': 404, 'message': 'Insufficient data for calculation'}), 404
@@ -4260,67 +2891,19 @@ def get_merit_order_power_plant_results():
         
         supply_demand_df['capacity(Δ)'] = supply_demand_df['demand'] + supply_demand_df['supply']
         
-        # First calculate base mcp_merit (without plant removal)
+        # Curves grouped once for both the base and the adjusted prices
+        curves = MeritOrderCurves(supply_demand_df)
         base_capacity_deltas = df_diff['capacity_delta'].tolist()
-        base_forecast_points = _calculate_merit_order_price(supply_demand_df, base_capacity_deltas)
         
         # Get AIC data for the selected plant
         uevcb_path = os.path.join(current_app.static_folder, 'data', 'uevcb.xlsx')
         if not os.path.exists(uevcb_path):
             return jsonify({'code': 404, 'error': 'UEVCB plant list file not found'}), 404
         
-        uevcb = pd.read_excel(uevcb_path, sheet_name='Sheet2')
-        tgt_token = get_tgt_token(current_app.config.get('USERNAME'), current_app.config.get('PASSWORD'))
-        
-        tz = pytz.timezone('Europe/Istanbul')
-        today_start = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        retries_api = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504])
-        all_aic = []
-        aic_url = 'https://seffaflik.epias.com.tr/electricity-service/v1/generation/data/aic'
-
-        with Session() as session_api:
-            session_api.mount('https://', HTTPAdapter(max_retries=retries_api))
-            for _, row in uevcb.iterrows():
-                try:
-                    aic_response = session_api.post(
-                        aic_url,
-                        json={
-                            "startDate": today_start.isoformat(),
-                            "endDate": today_start.isoformat(),
-                            "region": "TR1",
-                            "organizationId": int(row['organizationId']),
-                            "uevcbId": int(row['id'])
-                        },
-                        headers={
-                            "Accept-Language": "en",
-                            "Accept": "application/json",
-                            "Content-Type": "application/json",
-                            "TGT": tgt_token
-                        },
-                        timeout=15
-                    )
-
-                    if aic_response.status_code == 200:
-                        response_data = aic_response.json()
-                        for item in response_data.get("items", []):
-                            item["uevcbId"] = int(row['id'])
-                        all_aic.extend(response_data.get("items", []))
-                except Exception as e:
-                    print(f"AIC fetch error for {row['name']}: {str(e)}")
-                    continue
-        
-        if not all_aic:
+        pivot_df, _failures = today_aic(uevcb_path, _aic_token)
+        if pivot_df.empty:
             return jsonify({'code': 404, 'message': 'No AIC data available to subtract'}), 404
         
-        # Build pivot table
-        eak_df = pd.DataFrame.from_records(all_aic)
-        eak_df = eak_df[['date', 'uevcbId', 'toplam']].copy()
-        eak_df = eak_df.merge(uevcb[["id", "name"]], left_on="uevcbId", right_on="id", how="left").drop(columns=['id', 'uevcbId'])
-        eak_df['date'] = pd.to_datetime(eak_df['date'])
-        eak_df['hour'] = eak_df['date'].dt.strftime('%H:%M')
-        pivot_df = eak_df.pivot(index="name", columns="hour", values="toplam").fillna(0)
-        
         if plant_name not in pivot_df.index:
             return jsonify({'code': 404, 'message': f'Power plant "{plant_name}" not found in AIC data'}), 404
         
@@ -4337,14 +2920,14 @@ def get_merit_order_power_plant_results():
         
         adjusted_capacity_deltas = pp_results['capacity_delta'].tolist()
         
-        # Recalculate merit order price with adjusted capacity
-        adjusted_forecast_points = _calculate_merit_order_price(supply_demand_df, adjusted_capacity_deltas)
+        # Merit order price without (base) and with the plant removed
+        base_prices, adjusted_prices = curves.price_matrix([base_capacity_deltas, adjusted_capacity_deltas])
         
         # Build response with adjusted results
         result_rows = []
         for idx, (_, row) in enumerate(df_diff.iterrows()):
-            base_mcp_merit = float(base_forecast_points[idx]['price']) if idx < len(base_forecast_points) else None
-            adjusted_mcp_merit = float(adjusted_forecast_points[idx]['price']) if idx < len(adjusted_forecast_points) else None
+            base_mcp_merit = float(base_prices[idx]) if idx < len(base_prices) and pd.notna(base_prices[idx]) else None
+            adjusted_mcp_merit = float(adjusted_prices[idx]) if idx < len(adjusted_prices) and pd.notna(adjusted_prices[idx]) else None
             
             result_rows.append({
                 'date_ref': str(row['date_ref']),
@@ -4410,92 +2993,11 @@ def get_merit_order_aic_data():
         if not os.path.exists(uevcb_path):
             return jsonify({'code': 404, 'error': 'UEVCB plant list file not found'}), 404
         
-        uevcb = pd.read_excel(uevcb_path, sheet_name='Sheet2')
-        
-        # Get TGT token
-        tgt_token = get_tgt_token(current_app.config.get('USERNAME'), current_app.config.get('PASSWORD'))
-        
-        # Use today's date for AIC
-        tz = pytz.timezone('Europe/Istanbul')
-        today_start = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504])
-        all_response = []
-        aic_fetch_failures = 0
-        aic_url = 'https://seffaflik.epias.com.tr/electricity-service/v1/generation/data/aic'
-
-        with Session() as session:
-            session.mount('https://', HTTPAdapter(max_retries=retries))
-
-            org_response = session.post(
-                'https://seffaflik.epias.com.tr/electricity-service/v1/generation/data/organization-list',
-                json={
-                    "startDate": today_start.isoformat(),
-                    "endDate": today_start.isoformat()
-                },
-                headers={
-                    "Accept-Language": "en",
-                    "Accept": "application/json",
-                    "Content-Type": "application/json",
-                    "TGT": tgt_token
-                },
-                timeout=30
-            )
-
-            if org_response.status_code == 200:
-                org_df = pd.DataFrame.from_records(org_response.json().get('items', []))
-                if not org_df.empty:
-                    uevcb = uevcb.merge(
-                        org_df[['organizationId', 'organizationName']],
-                        left_on="organizationId", right_on="organizationId", how="left"
-                    )
-
-            for _, row in uevcb.iterrows():
-                try:
-                    aic_response = session.post(
-                        aic_url,
-                        json={
-                            "startDate": today_start.isoformat(),
-                            "endDate": today_start.isoformat(),
-                            "region": "TR1",
-                            "organizationId": int(row['organizationId']),
-                            "uevcbId": int(row['id'])
-                        },
-                        headers={
-                            "Accept-Language": "en",
-                            "Accept": "application/json",
-                            "Content-Type": "application/json",
-                            "TGT": tgt_token
-                        },
-                        timeout=15
-                    )
-
-                    if aic_response.status_code == 200:
-                        response_data = aic_response.json()
-                        for item in response_data.get("items", []):
-                            item["uevcbId"] = int(row['id'])
-                        all_response.extend(response_data.get("items", []))
-                    else:
-                        aic_fetch_failures += 1
-                except Exception as e:
-                    print(f"Error fetching AIC for {row['name']}: {str(e)}")
-                    aic_fetch_failures += 1
-                    continue
-
-        if not all_response:
+        pivot_df, aic_fetch_failures = today_aic(uevcb_path, _aic_token)
+        if pivot_df.empty:
             return jsonify({'code': 404, 'message': 'No AIC data available'}), 404
 
-        # Process AIC data into pivot table
-        eak_df = pd.DataFrame.from_records(all_response)
-        eak_df = eak_df[['date', 'uevcbId', 'toplam']].copy()
-        eak_df = eak_df.merge(uevcb[["id", "name"]], left_on="uevcbId", right_on="id", how="left").drop(columns=['id', 'uevcbId'])
-
-        eak_df['date'] = pd.to_datetime(eak_df['date'])
-        eak_df['hour'] = eak_df['date'].dt.strftime('%H:%M')
-        pivot_df = eak_df.pivot(index="name", columns="hour", values="toplam")
-        pivot_df = pivot_df.fillna(0)
-
-        base_date = today_start.strftime('%Y-%m-%d')
+        base_date = datetime.now(pytz.timezone('Europe/Istanbul')).strftime('%Y-%m-%d')
 
         return jsonify({
             'code': 200,
@@ -4518,31 +3020,7 @@ def get_merit_order_aic_data():
 def get_merit_order_failure_data():
     """Get current power plant failure data from market messages"""
     try:
-        engine = _get_supabase_engine()
-
-        failure_query = """
-        SELECT 
-            "uevcbName", 
-            "caseStartDate", 
-            "caseEndDate", 
-            "operatorPower", 
-            "capacityAtCaseTime",
-            ROUND("operatorPower" - "capacityAtCaseTime") AS "failureAmount"
-        FROM (
-            SELECT *,
-                   ROW_NUMBER() OVER (
-                       PARTITION BY "uevcbName"
-                       ORDER BY "caseEndDate" ASC
-                   ) as row_num
-            FROM epias.market_messages
-            WHERE "caseEndDate" >= (CURRENT_TIMESTAMP + INTERVAL '3' HOUR)
-        ) t
-        WHERE t.row_num = 1
-        ORDER BY "failureAmount" DESC
-        """
-        
-        with engine.connect() as conn:
-            failure_df = pd.read_sql(text(failure_query), con=conn)
+        failure_df = current_outages(get_supabase_engine())
         
         if failure_df.empty:
             return jsonify({'code': 200, 'data': {'rows': []}})
@@ -4571,6 +3049,82 @@ def get_merit_order_failure_data():
         return _err("get_merit_order_failure_data", e)
 
 
+@main.route('/merit-order-scenarios', methods=['POST'])
+@login_required
+def get_merit_order_scenarios():
+    """Merit order prices of many capacity scenarios (plant AIC removals, custom hourly deltas) in one call.
+    JSON body {gen_date, pred_date, scenarios: [{name, remove_plants: [...], capacity_deltas: {hour: delta}}]}.
+    """
+    try:
+        body = request.get_json(force=True) or {}
+        gen_date = body.get('gen_date')
+        pred_date = body.get('pred_date')
+        scenarios = body.get('scenarios')
+
+        if not gen_date or not pred_date:
+            return jsonify({'code': 400, 'message': 'Both gen_date and pred_date are required'}), 400
+        if not isinstance(scenarios, list) or not scenarios or not all(isinstance(s, dict) for s in scenarios):
+            return jsonify({'code': 400, 'message': 'scenarios must be a non-empty list of objects'}), 400
+        if len(scenarios) > MAX_SCENARIOS:
+            return jsonify({'code': 400, 'message': f'At most {MAX_SCENARIOS} scenarios per request'}), 400
+        for idx, scenario in enumerate(scenarios):
+            error = scenario_error(scenario)
+            if error:
+                return jsonify({'code': 400, 'message': f'Scenario {idx + 1}: {error}'}), 400
+
+        try:
+            gen_date_parsed = datetime.strptime(gen_date, '%Y-%m-%d').date()
+            pred_date_parsed = datetime.strptime(pred_date, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'code': 400, 'message': 'Dates must be in YYYY-MM-DD format'}), 400
+
+        engine = market_engine(*MERIT_ORDER_TABLES, since=min(gen_date_parsed, pred_date_parsed))
+        frames = merit_order_comparison(engine, gen_date_parsed, pred_date_parsed)
+        if frames['ref'].empty or frames['pred'].empty or frames['curves'] is None:
+            return jsonify({'code': 404, 'message': 'Insufficient data for calculation'}), 404
+
+        # AIC is only fetched when a scenario removes plants
+        aic = None
+        if any(s.get('remove_plants') for s in scenarios):
+            uevcb_path = os.path.join(current_app.static_folder, 'data', 'uevcb.xlsx')
+            if not os.path.exists(uevcb_path):
+                return jsonify({'code': 404, 'message': 'UEVCB plant list file not found'}), 404
+            aic, _failures = today_aic(uevcb_path, _aic_token)
+            # Without AIC every plant would come back unknown and the scenarios would price as the base
+            if aic.empty:
+                return jsonify({'code': 404, 'message': 'No AIC data available'}), 404
+
+        result = evaluate_scenarios(frames['diff'], frames['curves'], scenarios, aic)
+
+        def values(array):
+            return [float(v) if pd.notna(v) else None for v in array]
+
+        return jsonify({
+            'code': 200,
+            'data': {
+                'gen_date': gen_date,
+                'pred_date': pred_date,
+                'hours': result['hours'],
+                'base_capacity_deltas': values(frames['diff']['capacity_delta'][:len(result['hours'])]),
+                'base_prices': values(result['base']),
+                'scenarios': [
+                    {
+                        'name': scenario.get('name', f'Scenario {idx + 1}'),
+                        'capacity_deltas': values(result['deltas'][idx]),
+                        'unknown_plants': result['unknown_plants'][idx],
+                    }
+                    for idx, scenario in enumerate(scenarios)
+                ],
+                # scenarios x hours, in the order of `scenarios` and `hours`
+                'prices': [values(row) for row in result['prices']],
+            }
+        })
+
+    except Exception as e:
+        print(f"Error in get_merit_order_scenarios: {str(e)}")
+        return _err("get_merit_order_scenarios", e)
+
+
 @main.route('/download-merit-order-excel', methods=['GET', 'POST'])
 @login_required
 def download_merit_order_excel():
@@ -4578,8 +3132,6 @@ def download_merit_order_excel():
     Accepts GET (no custom deltas) or POST with JSON body {gen_date, pred_date, capacity_deltas}.
     """
     try:
-        from io import BytesIO
-
         if request.method == 'POST':
             body = request.get_json(force=True) or {}
             gen_date = body.get('gen_date')
@@ -4599,83 +3151,29 @@ def download_merit_order_excel():
         except ValueError:
             return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
 
-        engine = _get_supabase_engine()
+        # Same cached frames the merit-order page was built from
+        engine = market_engine(*MERIT_ORDER_TABLES, since=min(gen_date_parsed, pred_date_parsed))
+        frames = merit_order_comparison(engine, gen_date_parsed, pred_date_parsed)
+        if frames['ref'].empty or frames['pred'].empty:
+            return jsonify({'error': 'No merit order data for the selected dates'}), 404
 
         # --- Sheet 1: Results ---
-        ref_query = text("""
-        SELECT
-            hf.date AS date,
-            DATE(hf.date) AS day,
-            TO_CHAR(hf.date, 'HH24:MI') AS hour,
-            p.price_forecast AS mcp_ref,
-            hf.demand_forecast AS demand,
-            hf.wind_forecast AS wind,
-            hf.licensed_solar_forecast + hf.unlicensed_solar_forecast AS solar,
-            hf.runofriver_forecast AS river
-        FROM meteologica.historical_forecast hf
-        JOIN meteologica.price p ON TO_TIMESTAMP(p."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI:SI') = hf.date
-        WHERE DATE(hf.date) = :gen_date
-        ORDER BY hf.date
-        """)
-
-        pred_query = text("""
-        SELECT
-            CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP) AS date,
-            DATE(CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP)) AS day,
-            TO_CHAR(CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP), 'HH24:MI') AS hour,
-            p.price_forecast AS mcp_pred,
-            d.demand_forecast AS demand,
-            w.wind_forecast AS wind,
-            ls.licensed_forecast + us.unlicensed_forecast AS solar,
-            ror.runofriver_forecast AS river
-        FROM meteologica.demand d
-        JOIN meteologica.price p ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(p."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        JOIN meteologica.wind w ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(w."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        JOIN meteologica.licensed_solar ls ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(ls."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        JOIN meteologica.unlicensed_solar us ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(us."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        JOIN meteologica.runofriver_hydro ror ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(ror."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
-        WHERE DATE(CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP)) = :pred_date
-        ORDER BY date
-        """)
-
-        supply_demand_query = text("""
-        SELECT date, TO_CHAR(date, 'HH24:MI') AS hour, price, supply, demand
-        FROM epias.supply_demand
-        WHERE DATE(date) = :gen_date
-        ORDER BY date, price
-        """)
-
-        with engine.connect() as conn:
-            ref_df = pd.read_sql(ref_query, con=conn, params={"gen_date": gen_date_parsed})
-            pred_df = pd.read_sql(pred_query, con=conn, params={"pred_date": pred_date_parsed})
-            pred_df['mcp_pred'] = pred_df['mcp_pred'].round(2)
-            supply_demand_df = pd.read_sql(supply_demand_query, con=conn, params={"gen_date": gen_date_parsed})
-
-        # Merge and calculate deltas
         cols = ['demand', 'river', 'wind', 'solar']
-        df_diff = pd.merge(ref_df, pred_df, on='hour', suffixes=('_ref', '_pred'))
-        
-        for col in cols:
-            df_diff[f'{col}(Δ)'] = df_diff[f'{col}_pred'] - df_diff[f'{col}_ref']
+        df_diff = frames['diff'].rename(columns={f'{col}_delta': f'{col}(Δ)' for col in cols})
         
         if custom_capacity_deltas:
             df_diff['capacity(Δ)'] = df_diff['hour'].map(
                 lambda h: float(custom_capacity_deltas.get(h, 0))
             )
         else:
-            df_diff['capacity(Δ)'] = (df_diff['demand(Δ)']
-                                       - df_diff['river(Δ)'] - df_diff['wind(Δ)']
-                                       - df_diff['solar(Δ)'])
+            df_diff['capacity(Δ)'] = df_diff['capacity_delta']
 
         # Calculate merit order price
         mcp_merit_values = [None] * len(df_diff)
-        if not supply_demand_df.empty:
-            supply_demand_df['capacity(Δ)'] = supply_demand_df['demand'] + supply_demand_df['supply']
-            capacity_deltas = df_diff['capacity(Δ)'].tolist()
-            forecast_points = _calculate_merit_order_price(supply_demand_df, capacity_deltas)
-            if len(forecast_points) == len(df_diff):
-                forecast_prices_df = pd.concat(forecast_points, axis=1).T
-                mcp_merit_values = forecast_prices_df['price'].tolist()
+        if frames['curves'] is not None:
+            merit_prices = frames['curves'].prices(df_diff['capacity(Δ)'].to_numpy())
+            if len(merit_prices) == len(df_diff):
+                mcp_merit_values = merit_prices.tolist()
         
         df_diff['mcp_merit'] = mcp_merit_values
         
@@ -4683,166 +3181,64 @@ def download_merit_order_excel():
         new_order = ['date_ref', 'date_pred', 'mcp_ref', 'mcp_merit', 'mcp_pred', 'capacity(Δ)']
         for col in cols:
             new_order.extend([f'{col}_ref', f'{col}_pred', f'{col}(Δ)'])
-        
-        df_diff.drop(columns=['hour', 'day_ref', 'day_pred'], inplace=True, errors='ignore')
         df_diff = df_diff[new_order]
         
-        # Add totals row (exclude mcp columns from sum)
-        total_row = df_diff.drop(columns=['mcp_ref', 'mcp_merit', 'mcp_pred']).sum(numeric_only=True)
-        df_diff.loc[len(df_diff)] = total_row
-        df_diff.set_index(['date_ref', 'date_pred', 'mcp_ref', 'mcp_merit', 'mcp_pred'], inplace=True)
-        
-        # --- Sheet 3: Failure ---
-        failure_query = """
-        SELECT 
-            "uevcbName", 
-            "caseStartDate", 
-            "caseEndDate", 
-            "operatorPower", 
-            "capacityAtCaseTime",
-            ROUND("operatorPower" - "capacityAtCaseTime") AS "outageAmount"
-        FROM (
-            SELECT *,
-                   ROW_NUMBER() OVER (
-                       PARTITION BY "uevcbName"
-                       ORDER BY "caseEndDate" ASC
-                   ) as row_num
-            FROM epias.market_messages
-            WHERE "caseEndDate" >= (CURRENT_TIMESTAMP + INTERVAL '3' HOUR)
-        ) t
-        WHERE t.row_num = 1
-        ORDER BY "outageAmount" DESC
-        """
-        
-        with engine.connect() as conn:
-            failure_df = pd.read_sql(text(failure_query), con=conn)
-        
-        if not failure_df.empty:
-            failure_df.set_index('uevcbName', inplace=True)
+        # Totals row (mcp columns are not summed)
+        total_row = df_diff.drop(columns=['date_ref', 'date_pred', 'mcp_ref', 'mcp_merit', 'mcp_pred']).sum(numeric_only=True)
         
         # --- Sheet 2: AIC ---
         uevcb_path = os.path.join(current_app.static_folder, 'data', 'uevcb.xlsx')
         aic_pivot_df = pd.DataFrame()
-        
         if os.path.exists(uevcb_path):
             try:
-                uevcb = pd.read_excel(uevcb_path, sheet_name='Sheet2')
-                tgt_token = get_tgt_token(current_app.config.get('USERNAME'), current_app.config.get('PASSWORD'))
-                
-                tz = pytz.timezone('Europe/Istanbul')
-                today_start = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
-                
-                retries_api = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504])
-                all_aic = []
-                aic_url = 'https://seffaflik.epias.com.tr/electricity-service/v1/generation/data/aic'
-
-                with Session() as session_api:
-                    session_api.mount('https://', HTTPAdapter(max_retries=retries_api))
-                    for _, row in uevcb.iterrows():
-                        try:
-                            aic_response = session_api.post(
-                                aic_url,
-                                json={
-                                    "startDate": today_start.isoformat(),
-                                    "endDate": today_start.isoformat(),
-                                    "region": "TR1",
-                                    "organizationId": int(row['organizationId']),
-                                    "uevcbId": int(row['id'])
-                                },
-                                headers={
-                                    "Accept-Language": "en",
-                                    "Accept": "application/json",
-                                    "Content-Type": "application/json",
-                                    "TGT": tgt_token
-                                },
-                                timeout=15
-                            )
-
-                            if aic_response.status_code == 200:
-                                response_data = aic_response.json()
-                                for item in response_data.get("items", []):
-                                    item["uevcbId"] = int(row['id'])
-                                all_aic.extend(response_data.get("items", []))
-                        except Exception as e:
-                            print(f"AIC fetch error for {row['name']}: {str(e)}")
-                            continue
-                
-                if all_aic:
-                    eak_df = pd.DataFrame.from_records(all_aic)
-                    eak_df = eak_df[['date', 'uevcbId', 'toplam']].copy()
-                    eak_df = eak_df.merge(uevcb[["id", "name"]], left_on="uevcbId", right_on="id", how="left").drop(columns=['id', 'uevcbId'])
-                    eak_df['date'] = pd.to_datetime(eak_df['date'])
-                    eak_df['hour'] = eak_df['date'].dt.strftime('%H:%M')
-                    aic_pivot_df = eak_df.pivot(index="name", columns="hour", values="toplam").fillna(0)
+                aic_pivot_df, _failures = today_aic(uevcb_path, _aic_token)
             except Exception as e:
                 print(f"AIC processing error: {str(e)}")
         
-        # --- Write Excel ---
-        output = BytesIO()
-
-        writer = pd.ExcelWriter(output, engine='xlsxwriter')
-        df_diff.to_excel(writer, sheet_name='Results')
-        workbook = writer.book
-        worksheet = writer.sheets['Results']
-        bold_format = workbook.add_format({'bold': True})
-        
-        num_idx_cols = len(df_diff.index.names)  # 5: date_ref, date_pred, mcp_ref, mcp_merit, mcp_pred
-        num_rows = len(df_diff) - 1
+        # --- Sheet 3: Outages ---
+        failure_df = current_outages(get_supabase_engine()).rename(columns={'failureAmount': 'outageAmount'})
         
-        if 'capacity(Δ)' in df_diff.columns:
-            capacity_col_idx = df_diff.columns.get_loc('capacity(Δ)') + num_idx_cols
-            col_letter = chr(64 + capacity_col_idx + 1)
+        # --- Write Excel ---
+        def write(workbook):
+            bold_format = workbook.add_format({'bold': True})
+            worksheet = workbook.add_worksheet('Results')
             
-            worksheet.conditional_format(f'{col_letter}2:{col_letter}{num_rows + 1}', {
+            num_rows = len(df_diff)
+            capacity_col_idx = df_diff.columns.get_loc('capacity(Δ)')
+            worksheet.conditional_format(1, capacity_col_idx, num_rows, capacity_col_idx, {
                 'type': '3_color_scale',
                 'min_color': "#F8696B",
                 'mid_color': "#FFEB84",
                 'max_color': "#63BE7B"
             })
+            worksheet.set_column(0, 1, 20)
+            for i, col in enumerate(df_diff.columns[2:], 2):
+                max_len = max(df_diff[col].astype(str).map(len).max(), len(str(total_row.get(col, ''))), len(str(col))) + 3
+                worksheet.set_column(i, i, max_len)
+            
+            next_row = write_frame(worksheet, df_diff, header_format=bold_format)
+            worksheet.write_row(next_row, 0, [None if col not in total_row else float(total_row[col])
+                                              for col in df_diff.columns], bold_format)
+            
+            if not aic_pivot_df.empty:
+                aic_worksheet = workbook.add_worksheet('AIC')
+                aic_worksheet.set_column(0, 0, 40)
+                write_frame(aic_worksheet, aic_pivot_df, header_format=bold_format, index=True)
+            
+            if not failure_df.empty:
+                failure_worksheet = workbook.add_worksheet('Outages')
+                for col_num, width in enumerate([55, 18, 18, 13, 17, 12.5]):
+                    failure_worksheet.set_column(col_num, col_num, width)
+                write_frame(failure_worksheet, failure_df, header_format=bold_format)
         
-        worksheet.set_row(num_rows + 1, None, bold_format)
-        
-        for i, col in enumerate(df_diff.columns):
-            max_len = max(df_diff[col].astype(str).map(len).max(), len(str(col))) + 3
-            worksheet.set_column(i + num_idx_cols, i + num_idx_cols, max_len)
-        
-        num_cols = len(df_diff.columns)
-        for col_num in range(num_idx_cols, num_cols + num_idx_cols):
-            cell_value = df_diff.iloc[-1, col_num - num_idx_cols]
-            worksheet.write(num_rows + 1, col_num, cell_value, bold_format)
-        
-        worksheet.set_column(0, 1, 20)
-        
-        # Reorder sheets: Results first
-        workbook.worksheets_objs.sort(key=lambda x: x.name != 'Results')
-        
-        # Sheet 2: AIC
-        if not aic_pivot_df.empty:
-            aic_pivot_df.to_excel(writer, sheet_name='AIC')
-            aic_worksheet = writer.sheets['AIC']
-            aic_worksheet.set_column(0, 0, 40)
-        
-        # Sheet 3: Outages
-        if not failure_df.empty:
-            failure_df.to_excel(writer, sheet_name='Outages')
-            failure_worksheet = writer.sheets['Outages']
-            failure_worksheet.set_column(0, 0, 55)
-            failure_worksheet.set_column(1, 1, 18)
-            failure_worksheet.set_column(2, 2, 18)
-            failure_worksheet.set_column(3, 3, 13)
-            failure_worksheet.set_column(4, 4, 17)
-            failure_worksheet.set_column(5, 5, 12.5)
-        
-        writer.close()
-        output.seek(0)
+        workbook_file, size = build_workbook(write)
         
         filename = f"merit_order_{gen_date}_vs_{pred_date}.xlsx"
         
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
+        return Response(
+            iter_file(workbook_file),
+            mimetype=XLSX_MIMETYPE,
+            headers={'Content-Disposition': f'attachment; filename={filename}', 'Content-Length': str(size)}
         )
         
     except Exception as e:
@@ -4865,7 +3261,9 @@ def get_supply_demand_price():
         except ValueError:
             return jsonify({'error': 'Date must be in YYYY-MM-DD format'}), 400
 
-        engine_sb = _get_supabase_engine()
+        # The first price step's LAG reaches into the previous day
+        engine_sb = market_engine(('epias', 'supply_demand'), ('epias', 'ptf'),
+                                  since=selected_date_parsed - timedelta(days=1))
 
         query = text(
             """
@@ -0,0 +1,19 @@
+from ..database.config import db
+from datetime import datetime, timezone
+
+class CombinedSolarHourly(db.Model):
+    """Licensed + unlicensed solar aligned per stored hour, with a flag for each
+    source that had a value, so solar charts read one series instead of joining both tables."""
+    __tablename__ = 'combined_solar_hourly'
+
+    id = db.Column(db.Integer, primary_key=True)
+    datetime = db.Column(db.DateTime, nullable=False, unique=True)
+    unlicensed_solar = db.Column(db.Float)
+    licensed_solar = db.Column(db.Float)
+    solar_combined = db.Column(db.Float, nullable=False)
+    has_unlicensed = db.Column(db.Boolean, nullable=False, default=False)
+    has_licensed = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<CombinedSolarHourly {self.datetime}: {self.solar_combined}>'
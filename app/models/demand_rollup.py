@@ -0,0 +1,51 @@
+from ..database.config import db
+from datetime import datetime, timezone
+
+class DemandDailyRollup(db.Model):
+    __tablename__ = 'demand_daily_rollup'
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, unique=True)
+    consumption_sum = db.Column(db.Float, nullable=False)
+    consumption_mean = db.Column(db.Float, nullable=False)
+    consumption_peak = db.Column(db.Float, nullable=False)
+    hours_present = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<DemandDailyRollup {self.day}: {self.consumption_sum}>'
+
+
+class DemandWeeklyRollup(db.Model):
+    __tablename__ = 'demand_weekly_rollup'
+    __table_args__ = (db.UniqueConstraint('iso_year', 'iso_week', name='uq_demand_weekly_rollup_iso_week'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    iso_year = db.Column(db.Integer, nullable=False)
+    iso_week = db.Column(db.Integer, nullable=False)
+    week_start = db.Column(db.Date, nullable=False)
+    consumption_sum = db.Column(db.Float, nullable=False)
+    consumption_mean = db.Column(db.Float, nullable=False)
+    consumption_peak = db.Column(db.Float, nullable=False)
+    hours_present = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<DemandWeeklyRollup {self.iso_year}-W{self.iso_week:02d}: {self.consumption_mean}>'
+
+
+class DemandMonthlyRollup(db.Model):
+    __tablename__ = 'demand_monthly_rollup'
+    __table_args__ = (db.UniqueConstraint('year', 'month', name='uq_demand_monthly_rollup_year_month'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    consumption_sum = db.Column(db.Float, nullable=False)
+    consumption_mean = db.Column(db.Float, nullable=False)
+    consumption_peak = db.Column(db.Float, nullable=False)
+    hours_present = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<DemandMonthlyRollup {self.year}-{self.month:02d}: {self.consumption_mean}>'
@@ -0,0 +1,40 @@
+from ..database.config import db
+from datetime import datetime, timezone
+
+class ChronosFeatureHourly(db.Model):
+    """One hour of the Chronos feature frame of one model variant, as build_chronos_features
+    derives it from the database (system direction before the uploaded Excel tail)."""
+    __tablename__ = 'chronos_feature_hourly'
+    __table_args__ = (db.UniqueConstraint('model_variant', 'date', name='uq_chronos_feature_hourly_variant_date'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    model_variant = db.Column(db.String(16), nullable=False)
+    date = db.Column(db.DateTime, nullable=False, index=True)
+    demand = db.Column(db.Float)
+    wind = db.Column(db.Float)
+    hydro = db.Column(db.Float)
+    solar = db.Column(db.Float)
+    ptf = db.Column(db.Float)
+    system_direction = db.Column(db.Float)
+    is_holiday = db.Column(db.Float)
+    is_ramadan = db.Column(db.Float)
+    hour = db.Column(db.Float)
+    is_peak_off_peak1 = db.Column(db.Float)
+    is_peak_off_peak2 = db.Column(db.Float)
+    is_peak_peak = db.Column(db.Float)
+    week_part_Saturday = db.Column(db.Float)
+    week_part_Sunday = db.Column(db.Float)
+    week_part_Weekday = db.Column(db.Float)
+    demand_renewable_diff = db.Column(db.Float)
+    demand_diff24 = db.Column(db.Float)
+    smf_lag24 = db.Column(db.Float)
+    smf_lag168 = db.Column(db.Float)
+    smf_ptf_diff_lag24 = db.Column(db.Float)
+    system_direction_lag1 = db.Column(db.Float)
+    system_direction_ma3 = db.Column(db.Float)
+    system_direction_ma6 = db.Column(db.Float)
+    system_direction_ma12 = db.Column(db.Float)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<ChronosFeatureHourly {self.model_variant} {self.date}>'
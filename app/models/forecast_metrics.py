@@ -0,0 +1,26 @@
+from ..database.config import db
+from datetime import datetime, timezone
+
+class ForecastErrorDaily(db.Model):
+    """Per-day error sums of one forecast source against realized PTF, so the
+    metrics of any window are a sum over its days instead of a pass over hourly rows."""
+    __tablename__ = 'forecast_error_daily'
+    __table_args__ = (db.UniqueConstraint('day', 'horizon', 'source', name='uq_forecast_error_daily_day_horizon_source'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    horizon = db.Column(db.String(8), nullable=False)
+    source = db.Column(db.String(32), nullable=False)
+    hours = db.Column(db.Integer, nullable=False, default=0)
+    sum_abs_error = db.Column(db.Float, nullable=False, default=0)
+    sum_sq_error = db.Column(db.Float, nullable=False, default=0)
+    sum_error = db.Column(db.Float, nullable=False, default=0)
+    sum_actual = db.Column(db.Float, nullable=False, default=0)
+    sum_abs_actual = db.Column(db.Float, nullable=False, default=0)
+    sum_sq_actual = db.Column(db.Float, nullable=False, default=0)
+    direction_hits = db.Column(db.Integer, nullable=False, default=0)
+    direction_hours = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<ForecastErrorDaily {self.day} {self.horizon} {self.source}: {self.hours}h>'
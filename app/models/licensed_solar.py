@@ -7,6 +7,7 @@ class LicensedSolarData(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     datetime = db.Column(db.DateTime, nullable=False, unique=True)
     licensed_solar = db.Column(db.Float, nullable=False)
+    update_id = db.Column(db.String(50))  # Meteologica issue (YYYYMMDDHHMM) the value was taken from
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
     def __repr__(self):
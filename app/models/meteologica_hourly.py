@@ -0,0 +1,20 @@
+from ..database.config import db
+from datetime import datetime, timezone
+
+class MeteologicaHourly(db.Model):
+    """Every Meteologica forecast series of one hour side by side, keyed by a real timestamp,
+    so readers select a date range instead of joining the text-stamped series tables."""
+    __tablename__ = 'meteologica_hourly'
+
+    date = db.Column(db.DateTime, primary_key=True)
+    demand = db.Column(db.Float)
+    price = db.Column(db.Float)
+    wind = db.Column(db.Float)
+    licensed_solar = db.Column(db.Float)
+    unlicensed_solar = db.Column(db.Float)
+    runofriver_hydro = db.Column(db.Float)
+    dam_hydro = db.Column(db.Float)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<MeteologicaHourly {self.date}>'
@@ -0,0 +1,21 @@
+from ..database.config import db
+from datetime import datetime, timezone
+
+class RollingDailyState(db.Model):
+    """One row per (series, complete day): the daily average and the trailing
+    7-complete-day window it closes, so the rolling charts are read, not recomputed."""
+    __tablename__ = 'rolling_daily_state'
+    __table_args__ = (db.UniqueConstraint('series', 'day', name='uq_rolling_daily_state_series_day'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    series = db.Column(db.String(32), nullable=False)
+    day = db.Column(db.Date, nullable=False, index=True)
+    daily_avg = db.Column(db.Float)
+    hours = db.Column(db.Integer, nullable=False, default=0)
+    window_sum = db.Column(db.Float)
+    window_count = db.Column(db.Integer, nullable=False, default=0)
+    rolling_avg = db.Column(db.Float)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<RollingDailyState {self.series} {self.day}: {self.rolling_avg}>'
@@ -0,0 +1,41 @@
+from ..database.config import db
+from datetime import datetime, timezone
+
+class SyncWatermark(db.Model):
+    """Progress marker for a background sync (one row per series/job)"""
+    __tablename__ = 'sync_watermark'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False, unique=True)
+    watermark = db.Column(db.DateTime)
+    last_run_at = db.Column(db.DateTime)
+    last_status = db.Column(db.String(16))
+    last_result = db.Column(db.JSON)
+    requested_at = db.Column(db.DateTime)
+    force_requested = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<SyncWatermark {self.name}: {self.watermark}>'
+
+    @property
+    def pending(self):
+        """True while a requested run has not been picked up by the scheduler yet.
+
+        A forced request stays pending until the scheduler runs it, even when a
+        routine run of the same sync finishes first.
+        """
+        if self.force_requested:
+            return True
+        return self.requested_at is not None and (self.last_run_at is None or self.requested_at > self.last_run_at)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'watermark': self.watermark.strftime('%Y-%m-%d %H:%M') if self.watermark else None,
+            'last_run_at': self.last_run_at.strftime('%Y-%m-%d %H:%M:%S') if self.last_run_at else None,
+            'last_status': self.last_status,
+            'last_result': self.last_result or {},
+            'pending': self.pending,
+            'force_requested': bool(self.force_requested)
+        }
@@ -13,8 +13,9 @@ from ..forecasting.utils import (
     get_database_connection,
     fetch_generation_data,
     fetch_dgp_data,
-    process_excel_data,
+    merge_excel_tail,
     build_chronos_features,
+    stored_chronos_features,
     CONTEXT_LENGTHS,
 )
 from ..forecasting.model_testing import compute_confusion_matrix
@@ -67,18 +68,11 @@ def _covariate_drop_cols(model_name, lagged_hour_selection=1):
 
 def _build_system_direction_series(engine, excel_data):
     """Fetch system direction + generation data for the Recent Data tab only."""
-    dgp_df = fetch_dgp_data(engine)
-
-    if excel_data is not None:
-        today_df = process_excel_data(excel_data)
-        if not today_df.empty:
-            dgp_df = (
-                pd.concat([dgp_df, today_df])
-                .drop_duplicates(subset=['date'], keep='last')
-                .sort_values('date')
-                .reset_index(drop=True)
-            )
+    stored = stored_chronos_features(excel_data, 'Model 1')
+    if stored is not None:
+        return stored[0]
 
+    dgp_df = merge_excel_tail(fetch_dgp_data(engine), excel_data)
     generation_df = fetch_generation_data(engine)
     merged = pd.merge(generation_df, dgp_df, on='date', how='right')
     merged = merged.sort_values('date').reset_index(drop=True)
@@ -0,0 +1,36 @@
+import os
+import sys
+import argparse
+from datetime import datetime
+
+# Add the parent directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.append(parent_dir)
+
+from app.factory import create_app
+from app.services.combined_solar import refresh_combined_solar
+from app.services.rolling import refresh_rolling_state
+
+def backfill_rolling_state(years):
+    """Rebuild the combined solar hours and rolling_daily_state rows for each year from the hourly tables"""
+    app = create_app()
+    with app.app_context():
+        for year in years:
+            # A day either side so the chart-time shift at the year's edges is covered
+            hours = refresh_combined_solar(datetime(year - 1, 12, 31), datetime(year + 1, 1, 1, 23))
+            print(f"Combined solar for {year}: {hours} hours changed")
+            print(f"Rebuilding rolling state for {year}...")
+            rows = refresh_rolling_state(year=year)
+            print(f"✅ {year}: {rows} rows written")
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the 7-day rolling state used by the rolling charts')
+    parser.add_argument('--year', type=int, action='append', default=None,
+                      help='Year to rebuild (repeatable, defaults to the current year)')
+
+    args = parser.parse_args()
+    backfill_rolling_state(args.year or [datetime.now().year])
+
+if __name__ == "__main__":
+    main()
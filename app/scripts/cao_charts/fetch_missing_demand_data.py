@@ -2,12 +2,8 @@ import os
 import sys
 import argparse
 from datetime import datetime, timedelta
-import time
-import requests
-import pytz
 import json
 from sqlalchemy import text, create_engine
-import pandas as pd
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -20,181 +16,33 @@ sys.path.append(parent_dir)
 
 from app import create_app
 from app.database.config import db
-from app.models.demand import DemandData
-from app.functions import get_tgt_token
+from app.services.gap_repair import repair_gaps, find_missing_hours, DEFAULT_WORKERS
 
-def setup_session():
-    """Set up a requests session with retry logic"""
-    session = requests.Session()
-    retries = requests.adapters.Retry(
-        total=5,
-        backoff_factor=0.5,
-        status_forcelist=[500, 502, 503, 504, 429],
-    )
-    session.mount('https://', requests.adapters.HTTPAdapter(max_retries=retries))
-    return session
-
-def fetch_demand_data(start_date, end_date, session, tgt_token):
-    """Fetch demand data for a specific date range"""
-    url = "https://seffaflik.epias.com.tr/electricity-service/v1/consumption/data/realtime-consumption"
-    
-    payload = {
-        "startDate": f"{start_date.strftime('%Y-%m-%d')}T00:00:00+03:00",
-        "endDate": f"{end_date.strftime('%Y-%m-%d')}T23:59:59+03:00",
-        "region": "TR1",
-    }
-    
-    headers = {
-        'Content-Type': 'application/json',
-        'Accept': "application/json",
-        'TGT': tgt_token
-    }
-    
-    response = session.post(url, headers=headers, json=payload, timeout=30)
-    response.raise_for_status()
-    
-    return response.json().get('items', [])
-
-def fetch_missing_dates(missing_dates, check_updates=False):
-    """Fetch missing demand data for specific dates and check for updates"""
+def fetch_missing_dates(missing_dates, check_updates=False, workers=DEFAULT_WORKERS):
+    """Fetch missing demand hours (and re-check recent ones for updates) through the gap-repair engine"""
     print(f"\nFetching {len(missing_dates)} missing data points")
     
-    # Group dates by month to minimize API calls
-    date_groups = {}
-    for date_str in missing_dates:
-        dt = datetime.strptime(date_str, '%Y-%m-%d %H:%M')
-        month_key = dt.strftime('%Y-%m')
-        if month_key not in date_groups:
-            date_groups[month_key] = []
-        date_groups[month_key].append(dt)
+    app = create_app()
+    with app.app_context():
+        report = repair_gaps('demand', missing_dates, workers=workers)
     
-    print(f"Grouped into {len(date_groups)} months")
+    print(f"\nSummary:")
+    print(f"Repaired {report['repaired']} missing data points")
+    if check_updates:
+        print(f"Updated {report['revised']} records with new values")
+    if report['failed_months']:
+        print(f"Months that could not be fetched: {', '.join(report['failed_months'])}")
+    print(f"Still missing {len(report['still_missing'])} data points")
     
-    # Create app context and session
-    app = create_app()
-    session = setup_session()
+    failed_dates = report['still_missing']
+    if failed_dates:
+        # Save failed dates to file for later retry
+        output_file = f"failed_demand_dates_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(output_file, 'w') as f:
+            json.dump({'failed_dates': failed_dates}, f)
+        print(f"Saved {len(failed_dates)} failed dates to {output_file}")
     
-    with app.app_context():
-        # Get TGT token
-        tgt_token = get_tgt_token(
-            app.config.get('USERNAME'),
-            app.config.get('PASSWORD')
-        )
-        
-        # Process each month
-        success_count = 0
-        failure_count = 0
-        failed_dates = []
-        updated_count = 0
-        
-        for month, dates in date_groups.items():
-            print(f"\nProcessing {month} with {len(dates)} missing hours")
-            
-            # Get first and last day of the month
-            first_date = min(dates)
-            last_date = max(dates)
-            
-            # Set start and end dates for the API call
-            start_date = first_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            if last_date.month == 12:
-                end_date = datetime(last_date.year + 1, 1, 1) - timedelta(days=1)
-            else:
-                end_date = datetime(last_date.year, last_date.month + 1, 1) - timedelta(days=1)
-            end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-            
-            try:
-                # Fetch data for the entire month
-                print(f"Fetching data from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
-                items = fetch_demand_data(start_date, end_date, session, tgt_token)
-                
-                if not items:
-                    print(f"No data returned for {month}")
-                    failed_dates.extend([d.strftime('%Y-%m-%d %H:%M') for d in dates])
-                    failure_count += len(dates)
-                    continue
-                
-                # Convert to DataFrame for easier processing
-                df = pd.json_normalize(items)
-                df['date'] = pd.to_datetime(df['date'])
-                
-                # Process items in batches
-                batch_data = []
-                current_time = datetime.now()  # Get current time once for all records
-                for _, row in df.iterrows():
-                    try:
-                        dt = row['date'].to_pydatetime()
-                        
-                        # Check if this datetime is in our missing dates
-                        if any(d.date() == dt.date() and d.hour == dt.hour for d in dates):
-                            record_data = {
-                                'datetime': dt,
-                                'consumption': float(row.get('consumption', 0)),
-                                'created_at': current_time  # Add created_at timestamp
-                            }
-                            batch_data.append(record_data)
-                    except Exception as e:
-                        print(f"Error processing item: {e}")
-                        continue
-                
-                # Insert batch data
-                if batch_data:
-                    try:
-                        # Use bulk insert with ON CONFLICT DO UPDATE
-                        insert_stmt = """
-                        INSERT INTO demand_data (datetime, consumption, created_at)
-                        VALUES (:datetime, :consumption, :created_at)
-                        ON CONFLICT (datetime) DO UPDATE
-                        SET consumption = EXCLUDED.consumption,
-                            created_at = EXCLUDED.created_at
-                        """
-                        
-                        db.session.execute(text(insert_stmt), batch_data)
-                        db.session.commit()
-                        
-                        success_count += len(batch_data)
-                        print(f"Successfully inserted/updated {len(batch_data)} records for {month}")
-                        
-                        # If we're checking for updates, count how many were actually updated
-                        if check_updates:
-                            # Get the original values for comparison
-                            dt_list = [record['datetime'] for record in batch_data]
-                            original_records = DemandData.query.filter(DemandData.datetime.in_(dt_list)).all()
-                            original_dict = {record.datetime.strftime('%Y-%m-%d %H:%M'): record.consumption for record in original_records}
-                            
-                            # Count updated records
-                            for record in batch_data:
-                                dt_key = record['datetime'].strftime('%Y-%m-%d %H:%M')
-                                if dt_key in original_dict and abs(original_dict[dt_key] - record['consumption']) > 0.01:
-                                    updated_count += 1
-                            
-                            print(f"Updated {updated_count} records with new values")
-                        
-                    except Exception as e:
-                        print(f"Error inserting batch data: {e}")
-                        failed_dates.extend([d.strftime('%Y-%m-%d %H:%M') for d in dates])
-                        failure_count += len(dates)
-                else:
-                    print(f"No matching data found for {month}")
-                    failed_dates.extend([d.strftime('%Y-%m-%d %H:%M') for d in dates])
-                    failure_count += len(dates)
-            
-            except Exception as e:
-                print(f"Error processing {month}: {e}")
-                failed_dates.extend([d.strftime('%Y-%m-%d %H:%M') for d in dates])
-                failure_count += len(dates)
-        
-        print(f"\nSummary:")
-        print(f"Successfully processed {success_count} data points")
-        if check_updates:
-            print(f"Updated {updated_count} records with new values")
-        print(f"Failed to process {failure_count} data points")
-        
-        if failed_dates:
-            # Save failed dates to file for later retry
-            output_file = f"failed_demand_dates_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(output_file, 'w') as f:
-                json.dump({'failed_dates': failed_dates}, f)
-            print(f"Saved {len(failed_dates)} failed dates to {output_file}")
+    return report
 
 def sync_to_production():
     """Sync demand data to production database"""
@@ -397,6 +245,8 @@ def main():
                       help='Check for updated values in existing records')
     parser.add_argument('--days', type=int, default=15,
                       help='Number of days to check for updates (default: 15)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                      help=f'Months fetched concurrently (default: {DEFAULT_WORKERS})')
     
     args = parser.parse_args()
     
@@ -407,24 +257,7 @@ def main():
         app = create_app()
         with app.app_context():
             # Find gaps in data
-            query = text("""
-                WITH dates AS (
-                    SELECT generate_series(
-                        date_trunc('hour', min(datetime)),
-                        date_trunc('hour', max(datetime)),
-                        '1 hour'::interval
-                    ) as expected_datetime
-                    FROM demand_data
-                )
-                SELECT expected_datetime::timestamp
-                FROM dates
-                LEFT JOIN demand_data ON dates.expected_datetime = date_trunc('hour', demand_data.datetime)
-                WHERE demand_data.id IS NULL
-                ORDER BY expected_datetime;
-            """)
-            
-            result = db.session.execute(query).fetchall()
-            missing_dates = [d[0].strftime('%Y-%m-%d %H:%M') for d in result]
+            missing_dates = [ts.strftime('%Y-%m-%d %H:%M') for ts in find_missing_hours('demand')]
             
             print(f"Found {len(missing_dates)} missing data points")
     
@@ -467,7 +300,7 @@ def main():
             print(f"Added {len(missing_dates)} recent dates to check for updates")
     
     if missing_dates:
-        fetch_missing_dates(missing_dates, check_updates=args.check_updates)
+        fetch_missing_dates(missing_dates, check_updates=args.check_updates, workers=args.workers)
     else:
         print("No missing dates to fetch")
 
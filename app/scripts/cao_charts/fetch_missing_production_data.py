@@ -2,14 +2,7 @@ import os
 import sys
 import argparse
 from datetime import datetime, timedelta
-import time
-import requests
-import pytz
 import json
-from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy import text
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from sqlalchemy import create_engine
 
 # Add the parent directory to Python path
@@ -19,246 +12,31 @@ sys.path.append(parent_dir)
 
 from app.factory import create_app
 from app.database.config import db
-from app.models.production import ProductionData
-from app.functions import get_tgt_token
-from app.scripts.cao_charts.populate_production_data import parse_datetime
+from app.services.gap_repair import repair_gaps, find_missing_hours, DEFAULT_WORKERS
 
-def setup_session():
-    """Set up a requests session with retry logic"""
-    session = requests.Session()
-    retries = Retry(
-        total=5,
-        backoff_factor=0.5,
-        status_forcelist=[500, 502, 503, 504, 429],
-    )
-    session.mount('https://', HTTPAdapter(max_retries=retries))
-    return session
-
-def parse_datetime_improved(date_str, hour_str):
-    """Enhanced datetime parsing with better timezone handling"""
-    try:
-        # First try to parse the date string
-        if 'T' in date_str:
-            date = datetime.strptime(date_str.split('T')[0], '%Y-%m-%d').date()
-        else:
-            date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        
-        # Parse hour from the hour string (format: "HH:00")
-        hour = int(hour_str.split(':')[0])
-        
-        # Create datetime without timezone first
-        dt = datetime.combine(date, datetime.min.time().replace(hour=hour))
-        
-        # Handle timezone
-        tz = pytz.timezone('Europe/Istanbul')
-        try:
-            # Try to localize the datetime
-            localized_dt = tz.localize(dt, is_dst=None)
-            return [localized_dt]
-        except pytz.exceptions.AmbiguousTimeError:
-            # During DST transitions, return both possible interpretations
-            return [
-                tz.localize(dt, is_dst=True),
-                tz.localize(dt, is_dst=False)
-            ]
-        except pytz.exceptions.NonExistentTimeError:
-            # For skipped hours during DST transitions
-            # Return the same time in the next UTC offset
-            return [tz.localize(dt + timedelta(hours=1))]
-            
-    except Exception as e:
-        print(f"Error parsing datetime: {date_str}, {hour_str} - {str(e)}")
-        return None
-
-def try_alternative_endpoints(date, session, tgt_token, app_config):
-    """Try different API endpoints to get the data"""
-    endpoints = [
-        (app_config['REALTIME_URL'], "realtime"),
-        ('https://seffaflik.epias.com.tr/electricity-service/v1/generation/data/dpp', "dpp"),
-        ('https://seffaflik.epias.com.tr/electricity-service/v1/generation/data/aic', "aic")
-    ]
-    
-    for url, endpoint_type in endpoints:
-        try:
-            request_data = {
-                "startDate": f"{date.strftime('%Y-%m-%d')}T00:00:00+03:00",
-                "endDate": f"{date.strftime('%Y-%m-%d')}T23:59:59+03:00"
-            }
-            
-            if endpoint_type in ["dpp", "aic"]:
-                request_data["region"] = "TR1"
-            
-            response = session.post(
-                url,
-                json=request_data,
-                headers={'TGT': tgt_token},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json().get('items', []), endpoint_type
-                
-        except Exception as e:
-            print(f"Error with {endpoint_type} endpoint: {e}")
-            continue
-    
-    return None, None
-
-def fetch_missing_dates(missing_dates, local_db=True):
+def fetch_missing_dates(missing_dates, workers=DEFAULT_WORKERS):
     """
-    Fetch missing production data for specific dates with improved error handling
+    Fetch missing production hours through the gap-repair engine (months fetched concurrently)
     """
     print(f"\nFetching {len(missing_dates)} missing data points")
     
-    # Group dates by day to minimize API calls
-    date_groups = {}
-    for date_str in missing_dates:
-        dt = datetime.strptime(date_str, '%Y-%m-%d %H:%M')
-        day_key = dt.strftime('%Y-%m-%d')
-        if day_key not in date_groups:
-            date_groups[day_key] = []
-        date_groups[day_key].append(dt)
-    
-    print(f"Grouped into {len(date_groups)} days")
-    
-    # Create app context and session
     app = create_app()
-    session = setup_session()
-    
     with app.app_context():
-        # Get TGT token
-        tgt_token = get_tgt_token(
-            app.config.get('USERNAME'),
-            app.config.get('PASSWORD')
-        )
-        
-        # Process each day
-        success_count = 0
-        failure_count = 0
-        failed_dates = []
-        
-        for day, dates in date_groups.items():
-            print(f"\nProcessing {day} with {len(dates)} missing hours")
-            day_date = datetime.strptime(day, '%Y-%m-%d').date()
-            
-            try:
-                # Try different endpoints
-                items, endpoint_type = try_alternative_endpoints(day_date, session, tgt_token, app.config)
-                
-                if not items:
-                    print(f"No data found for {day} from any endpoint")
-                    failure_count += len(dates)
-                    failed_dates.extend([dt.strftime('%Y-%m-%d %H:%M') for dt in dates])
-                    continue
-                
-                print(f"Got data from {endpoint_type} endpoint")
-                
-                # Process items
-                batch_data = []
-                for item in items:
-                    try:
-                        date_str = item.get('date', '')
-                        hour_str = item.get('hour', '00:00')
-                        
-                        # Get possible datetime interpretations
-                        dts = parse_datetime_improved(date_str, hour_str)
-                        if not dts:
-                            continue
-                        
-                        # Try each possible datetime
-                        for dt in dts:
-                            if dt.hour in [d.hour for d in dates]:
-                                record_data = {
-                                    'datetime': dt,
-                                    'fueloil': float(item.get('fueloil', 0)),
-                                    'gasoil': float(item.get('gasoil', 0)),
-                                    'blackcoal': float(item.get('blackCoal', 0)),
-                                    'lignite': float(item.get('lignite', 0)),
-                                    'geothermal': float(item.get('geothermal', 0)),
-                                    'naturalgas': float(item.get('naturalGas', 0)),
-                                    'river': float(item.get('river', 0)),
-                                    'dammedhydro': float(item.get('dammedHydro', 0)),
-                                    'lng': float(item.get('lng', 0)),
-                                    'biomass': float(item.get('biomass', 0)),
-                                    'naphta': float(item.get('naphta', 0)),
-                                    'importcoal': float(item.get('importCoal', 0)),
-                                    'asphaltitecoal': float(item.get('asphaltiteCoal', 0)),
-                                    'wind': float(item.get('wind', 0)),
-                                    'nuclear': float(item.get('nuclear', 0)),
-                                    'sun': float(item.get('sun', 0)),
-                                    'importexport': float(item.get('importExport', 0)),
-                                    'total': float(item.get('total', 0)),
-                                    'wasteheat': float(item.get('wasteheat', 0))
-                                }
-                                batch_data.append(record_data)
-                                break
-                    except Exception as e:
-                        print(f"Error processing item: {e}")
-                        continue
-                
-                # Insert batch data using upsert
-                if batch_data:
-                    try:
-                        stmt = insert(ProductionData).values(batch_data)
-                        stmt = stmt.on_conflict_do_update(
-                            constraint='production_data_datetime_key',
-                            set_={
-                                'fueloil': stmt.excluded.fueloil,
-                                'gasoil': stmt.excluded.gasoil,
-                                'blackcoal': stmt.excluded.blackcoal,
-                                'lignite': stmt.excluded.lignite,
-                                'geothermal': stmt.excluded.geothermal,
-                                'naturalgas': stmt.excluded.naturalgas,
-                                'river': stmt.excluded.river,
-                                'dammedhydro': stmt.excluded.dammedhydro,
-                                'lng': stmt.excluded.lng,
-                                'biomass': stmt.excluded.biomass,
-                                'naphta': stmt.excluded.naphta,
-                                'importcoal': stmt.excluded.importcoal,
-                                'asphaltitecoal': stmt.excluded.asphaltitecoal,
-                                'wind': stmt.excluded.wind,
-                                'nuclear': stmt.excluded.nuclear,
-                                'sun': stmt.excluded.sun,
-                                'importexport': stmt.excluded.importexport,
-                                'total': stmt.excluded.total,
-                                'wasteheat': stmt.excluded.wasteheat
-                            }
-                        )
-                        
-                        db.session.execute(stmt)
-                        db.session.commit()
-                        
-                        print(f"Successfully stored {len(batch_data)} records for {day}")
-                        success_count += len(batch_data)
-                    except Exception as e:
-                        db.session.rollback()
-                        print(f"Error committing data: {e}")
-                        failure_count += len(dates)
-                        failed_dates.extend([dt.strftime('%Y-%m-%d %H:%M') for dt in dates])
-                else:
-                    print(f"No matching data found for {day}")
-                    failure_count += len(dates)
-                    failed_dates.extend([dt.strftime('%Y-%m-%d %H:%M') for dt in dates])
-            
-            except Exception as e:
-                print(f"Error processing {day}: {e}")
-                failure_count += len(dates)
-                failed_dates.extend([dt.strftime('%Y-%m-%d %H:%M') for dt in dates])
-            
-            time.sleep(1)  # Wait between requests
-        
-        print(f"\nSummary:")
-        print(f"Successfully fetched {success_count} records")
-        print(f"Failed to fetch {failure_count} records")
-        if failed_dates:
-            print("\nFailed dates:")
-            for date in failed_dates:
-                print(date)
-            
-            # Save failed dates to file
-            with open('failed_dates.json', 'w') as f:
-                json.dump({'failed_dates': failed_dates}, f)
-            print("\nFailed dates have been saved to failed_dates.json")
+        report = repair_gaps('production', missing_dates, workers=workers)
+    
+    print(f"\nSummary:")
+    print(f"Successfully fetched {report['repaired']} records")
+    if report['failed_months']:
+        print(f"Months that could not be fetched: {', '.join(report['failed_months'])}")
+    failed_dates = report['still_missing']
+    print(f"Failed to fetch {len(failed_dates)} records")
+    if failed_dates:
+        # Save failed dates to file
+        with open('failed_dates.json', 'w') as f:
+            json.dump({'failed_dates': failed_dates}, f)
+        print("\nFailed dates have been saved to failed_dates.json")
+    
+    return report
 
 def sync_to_production():
     """Sync the local database to production after filling missing data"""
@@ -355,6 +133,8 @@ def main():
                       help='Check for missing dates before fetching')
     parser.add_argument('--sync-to-production', action='store_true',
                       help='Sync the local database to production after fetching')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                      help=f'Months fetched concurrently (default: {DEFAULT_WORKERS})')
     
     args = parser.parse_args()
     
@@ -364,27 +144,8 @@ def main():
         # Create app context to check for missing dates
         app = create_app()
         with app.app_context():
-            from sqlalchemy import text
-            
             # Find gaps in data
-            query = text("""
-                WITH dates AS (
-                    SELECT generate_series(
-                        date_trunc('hour', min(datetime)),
-                        date_trunc('hour', max(datetime)),
-                        '1 hour'::interval
-                    ) as expected_datetime
-                    FROM production_data
-                )
-                SELECT expected_datetime::timestamp
-                FROM dates
-                LEFT JOIN production_data ON dates.expected_datetime = date_trunc('hour', production_data.datetime)
-                WHERE production_data.id IS NULL
-                ORDER BY expected_datetime;
-            """)
-            
-            result = db.session.execute(query).fetchall()
-            missing_dates = [d[0].strftime('%Y-%m-%d %H:%M') for d in result]
+            missing_dates = [ts.strftime('%Y-%m-%d %H:%M') for ts in find_missing_hours('production')]
             
             print(f"Found {len(missing_dates)} missing data points")
     
@@ -393,39 +154,20 @@ def main():
         try:
             with open(args.input_file, 'r') as f:
                 data = json.load(f)
-                missing_dates = data.get('missing_dates', [])
+                missing_dates = data.get('missing_dates') or data.get('failed_dates', [])
                 
                 # If we only have a sample, get the full list
                 if data.get('total_missing_dates', 0) > len(missing_dates):
                     app = create_app()
                     with app.app_context():
-                        from sqlalchemy import text
-                        
                         # Find gaps in data
-                        query = text("""
-                            WITH dates AS (
-                                SELECT generate_series(
-                                    date_trunc('hour', min(datetime)),
-                                    date_trunc('hour', max(datetime)),
-                                    '1 hour'::interval
-                                ) as expected_datetime
-                                FROM production_data
-                            )
-                            SELECT expected_datetime::timestamp
-                            FROM dates
-                            LEFT JOIN production_data ON dates.expected_datetime = date_trunc('hour', production_data.datetime)
-                            WHERE production_data.id IS NULL
-                            ORDER BY expected_datetime;
-                        """)
-                        
-                        result = db.session.execute(query).fetchall()
-                        missing_dates = [d[0].strftime('%Y-%m-%d %H:%M') for d in result]
+                        missing_dates = [ts.strftime('%Y-%m-%d %H:%M') for ts in find_missing_hours('production')]
         except Exception as e:
             print(f"Error reading input file: {e}")
             sys.exit(1)
     
     if missing_dates:
-        fetch_missing_dates(missing_dates)
+        fetch_missing_dates(missing_dates, workers=args.workers)
     else:
         print("No missing dates to fetch")
 
@@ -19,8 +19,8 @@ sys.path.append(parent_dir)
 from app.factory import create_app
 from app.database.config import db
 from app.models.production import ProductionData
-from app.models.unlicensed_solar import UnlicensedSolarData
-from app.models.licensed_solar import LicensedSolarData
+from app.models.combined_solar import CombinedSolarHourly
+from app.services.combined_solar import ensure_combined_solar
 
 def generate_combined_historical_averages():
     """Generate historical averages with combined solar data (2020-2025)"""
@@ -44,25 +44,17 @@ def generate_combined_historical_averages():
         ).order_by(ProductionData.datetime)
         production_data = production_query.all()
         
-        # Query unlicensed solar data
-        print("Loading unlicensed solar data...")
-        unlicensed_query = db.session.query(UnlicensedSolarData).filter(
-            UnlicensedSolarData.datetime >= start_date,
-            UnlicensedSolarData.datetime <= end_date
-        ).order_by(UnlicensedSolarData.datetime)
-        unlicensed_data = unlicensed_query.all()
-        
-        # Query licensed solar data
-        print("Loading licensed solar data...")
-        licensed_query = db.session.query(LicensedSolarData).filter(
-            LicensedSolarData.datetime >= start_date,
-            LicensedSolarData.datetime <= end_date
-        ).order_by(LicensedSolarData.datetime)
-        licensed_data = licensed_query.all()
+        # Query combined solar data (licensed + unlicensed aligned per hour)
+        print("Loading combined solar data...")
+        ensure_combined_solar(start_date, end_date)
+        solar_query = db.session.query(CombinedSolarHourly).filter(
+            CombinedSolarHourly.datetime >= start_date,
+            CombinedSolarHourly.datetime <= end_date
+        ).order_by(CombinedSolarHourly.datetime)
+        solar_data = solar_query.all()
         
         print(f"Found {len(production_data)} production records")
-        print(f"Found {len(unlicensed_data)} unlicensed solar records")
-        print(f"Found {len(licensed_data)} licensed solar records")
+        print(f"Found {len(solar_data)} combined solar hours")
         
         if not production_data:
             print("No production data found for the specified period!")
@@ -100,52 +92,29 @@ def generate_combined_historical_averages():
         istanbul_tz = pytz.timezone('Europe/Istanbul')
         df_production.index = df_production.index.tz_convert(istanbul_tz)
         
-        # Process unlicensed solar data
-        if unlicensed_data:
-            df_unlicensed = pd.DataFrame([{
-                'datetime': d.datetime.astimezone(pytz.UTC),
-                'unlicensed_solar': d.unlicensed_solar
-            } for d in unlicensed_data])
-            
-            df_unlicensed['datetime'] = pd.to_datetime(df_unlicensed['datetime'], utc=True)
-            df_unlicensed = df_unlicensed.set_index('datetime')
-            df_unlicensed.index = df_unlicensed.index.tz_convert(istanbul_tz)
-        else:
-            df_unlicensed = pd.DataFrame()
-        
-        # Process licensed solar data
-        if licensed_data:
-            df_licensed = pd.DataFrame([{
+        # Process combined solar data
+        if solar_data:
+            df_solar = pd.DataFrame([{
                 'datetime': d.datetime.astimezone(pytz.UTC),
-                'licensed_solar': d.licensed_solar
-            } for d in licensed_data])
+                'unlicensed_solar': d.unlicensed_solar,
+                'licensed_solar': d.licensed_solar,
+                'solar_combined': d.solar_combined
+            } for d in solar_data])
             
-            df_licensed['datetime'] = pd.to_datetime(df_licensed['datetime'], utc=True)
-            df_licensed = df_licensed.set_index('datetime')
-            df_licensed.index = df_licensed.index.tz_convert(istanbul_tz)
+            df_solar['datetime'] = pd.to_datetime(df_solar['datetime'], utc=True)
+            df_solar = df_solar.set_index('datetime')
+            df_solar.index = df_solar.index.tz_convert(istanbul_tz)
         else:
-            df_licensed = pd.DataFrame()
+            df_solar = pd.DataFrame()
         
         # Resample all DataFrames to hourly frequency
         df_hourly = df_production.resample('H', closed='left', label='left').mean()
         
         # Merge solar data
-        if not df_unlicensed.empty:
-            unlicensed_hourly = df_unlicensed.resample('H', closed='left', label='left').mean()
-            df_hourly = df_hourly.join(unlicensed_hourly, how='outer')
-            df_hourly['unlicensed_solar'] = df_hourly['unlicensed_solar'].fillna(0)
-        else:
-            df_hourly['unlicensed_solar'] = 0
-        
-        if not df_licensed.empty:
-            licensed_hourly = df_licensed.resample('H', closed='left', label='left').mean()
-            df_hourly = df_hourly.join(licensed_hourly, how='outer')
-            df_hourly['licensed_solar'] = df_hourly['licensed_solar'].fillna(0)
-        else:
-            df_hourly['licensed_solar'] = 0
-        
-        # Calculate combined solar
-        df_hourly['solar_combined'] = df_hourly['unlicensed_solar'] + df_hourly['licensed_solar']
+        if not df_solar.empty:
+            df_hourly = df_hourly.join(df_solar.resample('H', closed='left', label='left').mean(), how='outer')
+        for column in ('unlicensed_solar', 'licensed_solar', 'solar_combined'):
+            df_hourly[column] = df_hourly[column].fillna(0) if column in df_hourly else 0
         
         # Filter out any rows with missing production data (this removes the zero-filled periods)
         df_hourly = df_hourly.dropna(subset=['naturalgas', 'wind', 'total'])
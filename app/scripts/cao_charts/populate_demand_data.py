@@ -14,6 +14,7 @@ from app import create_app
 from app.database.config import db
 from app.models.demand import DemandData
 from app.functions import get_tgt_token
+from app.services.demand_rollups import refresh_demand_rollups
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Populate demand data from EPIAS API')
@@ -163,6 +164,11 @@ def main():
             total_records_added += records_added
         
         print(f"\nTotal records added: {total_records_added}")
+        
+        # Bring the daily/weekly/monthly rollups in line with what was written
+        if total_records_added or args.force:
+            refresh_demand_rollups(start_date, end_date)
+            print("Demand rollups refreshed")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
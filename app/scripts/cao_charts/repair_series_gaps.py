@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Find and repair missing hours of demand, production or the solar series
+
+    python app/scripts/cao_charts/repair_series_gaps.py --series unlicensed_solar
+    python app/scripts/cao_charts/repair_series_gaps.py --series production --start 2025-01-01 --end 2025-03-31
+"""
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+
+# Add the parent directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.append(parent_dir)
+
+from app.factory import create_app
+from app.services.gap_repair import GAP_SERIES, DEFAULT_WORKERS, DEFAULT_REQUESTS_PER_SECOND, find_missing_hours, repair_gaps
+
+def main():
+    parser = argparse.ArgumentParser(description='Repair missing hours of an hourly series')
+    parser.add_argument('--series', choices=sorted(GAP_SERIES), action='append', required=True,
+                      help='Series to repair (repeatable)')
+    parser.add_argument('--start', type=lambda s: datetime.strptime(s, '%Y-%m-%d'), default=None,
+                      help='First day to check (default: first stored hour)')
+    parser.add_argument('--end', type=lambda s: datetime.strptime(s, '%Y-%m-%d').replace(hour=23), default=None,
+                      help='Last day to check (default: last stored hour)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                      help=f'Months fetched concurrently (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--rate', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                      help=f'Requests started per second (default: {DEFAULT_REQUESTS_PER_SECOND})')
+    parser.add_argument('--dry-run', action='store_true',
+                      help='Only report the missing hours')
+
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        for series in args.series:
+            missing = find_missing_hours(series, args.start, args.end)
+            print(f"{series}: {len(missing)} missing hours")
+            if args.dry_run or missing.empty:
+                continue
+
+            report = repair_gaps(series, missing, workers=args.workers, requests_per_second=args.rate)
+            print(f"{series}: repaired {report['repaired']}, still missing {len(report['still_missing'])}")
+            if report['failed_months']:
+                print(f"{series}: months that could not be fetched: {', '.join(report['failed_months'])}")
+            if report['still_missing']:
+                output_file = f"missing_{series}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+                with open(output_file, 'w') as f:
+                    json.dump({'failed_dates': report['still_missing']}, f)
+                print(f"{series}: saved still-missing hours to {output_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Replicate time-series tables between databases with streaming COPY and upserts
+
+Rows are read from the source with ``COPY (SELECT ...) TO STDOUT`` one chunk of
+the watermark column at a time, spooled (to disk past a few MB), loaded into a
+temp table with ``COPY FROM STDIN`` and upserted on the table's natural key.
+The target table is never dropped or truncated.
+
+Incremental (default): only rows whose watermark column is at or after the
+source high-water mark of the previous run minus ``--overlap-hours`` are copied.
+The mark is the source's own maximum, stored on the target in ``sync_watermark``
+per source database and table (the target's rows are written by its own
+scheduler too, so their maximum says nothing about what was copied).  A table
+that was never replicated from that source is copied whole.
+Full (``--full``): every row is copied; unchanged rows are left alone.
+
+    python app/scripts/replicate_tables.py --production demand_data production_data
+    python app/scripts/replicate_tables.py --source-url ... --target-url ... --all --full
+"""
+import os
+import sys
+import argparse
+import hashlib
+import json
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+
+import psycopg2
+from psycopg2 import sql
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the parent directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(parent_dir)
+
+# Replicated tables: natural key used for the upsert and the column that marks new/changed rows.
+# created_at is rewritten by every upsert in the ingest paths, so it doubles as a change marker.
+TABLES = {
+    'demand_data': {'key': ['datetime'], 'watermark': 'created_at'},
+    'production_data': {'key': ['datetime'], 'watermark': 'created_at'},
+    'unlicensed_solar_data': {'key': ['datetime'], 'watermark': 'created_at'},
+    'licensed_solar_data': {'key': ['datetime'], 'watermark': 'created_at'},
+    'combined_solar_hourly': {'key': ['datetime'], 'watermark': 'updated_at'},
+    'hydro_heatmap_data': {'key': ['date', 'hour', 'plant_name', 'version'], 'watermark': 'created_at'},
+    'natural_gas_heatmap_data': {'key': ['date', 'hour', 'plant_name', 'version'], 'watermark': 'created_at'},
+    'imported_coal_heatmap_data': {'key': ['date', 'hour', 'plant_name', 'version'], 'watermark': 'created_at'},
+    'lignite_heatmap_data': {'key': ['date', 'hour', 'plant_name', 'version'], 'watermark': 'created_at'},
+    'hydro_realtime_data': {'key': ['date', 'hour', 'plant_name'], 'watermark': 'date'},
+    'natural_gas_realtime_data': {'key': ['date', 'hour', 'plant_name'], 'watermark': 'date'},
+    'lignite_realtime_data': {'key': ['date', 'hour', 'plant_name'], 'watermark': 'date'},
+}
+
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+def _libpq_url(url):
+    """SQLAlchemy-style URLs (postgresql+psycopg2://) -> what psycopg2.connect accepts"""
+    return url.replace('postgresql+psycopg2://', 'postgresql://', 1)
+
+def _columns(cursor, table):
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = 'public' AND table_name = %s ORDER BY ordinal_position",
+        (table,)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+def _bounds(cursor, table, column):
+    cursor.execute(sql.SQL("SELECT MIN({c}), MAX({c}) FROM {t}").format(
+        c=sql.Identifier(column), t=sql.Identifier(table)))
+    return cursor.fetchone()
+
+def _chunks(low, high, step):
+    """[low, high] split into half-open [start, end) windows of ``step`` (the last one closed)"""
+    start = low
+    while start <= high:
+        end = start + step
+        yield start, end, end > high
+        start = end
+
+def _upsert_sql(table, columns, key):
+    values = [c for c in columns if c not in key]
+    changed = sql.SQL(' OR ').join(
+        sql.SQL("{t}.{c} IS DISTINCT FROM EXCLUDED.{c}").format(t=sql.Identifier(table), c=sql.Identifier(c))
+        for c in values
+    )
+    return sql.SQL("""
+        INSERT INTO {t} ({cols}) SELECT {cols} FROM replicate_stage
+        ON CONFLICT ({key}) DO UPDATE SET {sets} WHERE {changed}
+        RETURNING (xmax = 0), {first_key}
+    """).format(
+        t=sql.Identifier(table),
+        cols=sql.SQL(', ').join(map(sql.Identifier, columns)),
+        key=sql.SQL(', ').join(map(sql.Identifier, key)),
+        first_key=sql.Identifier(table, key[0]),
+        sets=sql.SQL(', ').join(sql.SQL("{c} = EXCLUDED.{c}").format(c=sql.Identifier(c)) for c in values),
+        changed=changed,
+    )
+
+def _comparable(value, reference):
+    """Make a stored watermark comparable with the source's (naive timestamps are UTC)"""
+    if isinstance(value, datetime) and isinstance(reference, datetime):
+        if value.tzinfo is not None and reference.tzinfo is None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        if value.tzinfo is None and reference.tzinfo is not None:
+            return value.replace(tzinfo=timezone.utc)
+    if isinstance(value, datetime) and isinstance(reference, date) and not isinstance(reference, datetime):
+        return value.date()
+    return value
+
+def _mark_name(source, table):
+    """sync_watermark row of ``table`` replicated from the ``source`` database (host, port and name)"""
+    params = source.get_dsn_parameters()
+    origin = f"{params.get('host')}:{params.get('port')}/{params.get('dbname')}"
+    return f"replicate:{table}:{hashlib.sha1(origin.encode()).hexdigest()[:12]}", origin
+
+def _stored_mark(dst, name):
+    dst.execute("SELECT watermark FROM sync_watermark WHERE name = %s", (name,))
+    row = dst.fetchone()
+    return row[0] if row else None
+
+def _store_mark(dst, name, high, result):
+    """Record the source maximum copied in this run as the next run's starting point"""
+    if isinstance(high, datetime) and high.tzinfo is not None:
+        high = high.astimezone(timezone.utc).replace(tzinfo=None)
+    elif isinstance(high, date) and not isinstance(high, datetime):
+        high = datetime.combine(high, datetime.min.time())
+    dst.execute("""
+        INSERT INTO sync_watermark (name, watermark, last_run_at, last_status, last_result, updated_at)
+        VALUES (%(name)s, %(high)s, NOW(), 'ok', %(result)s, NOW())
+        ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark, last_run_at = EXCLUDED.last_run_at,
+            last_status = EXCLUDED.last_status, last_result = EXCLUDED.last_result, updated_at = EXCLUDED.updated_at
+    """, {'name': name, 'high': high, 'result': json.dumps(result)})
+
+def replicate_table(source, target, table, target_url, full=False, overlap_hours=24, chunk_days=31):
+    """Copy new/changed rows of ``table`` from ``source`` to ``target`` (psycopg2 connections)"""
+    spec = TABLES[table]
+    key, watermark = spec['key'], spec['watermark']
+
+    with source.cursor() as src, target.cursor() as dst:
+        source_columns = _columns(src, table)
+        target_columns = _columns(dst, table)
+        if not target_columns:
+            raise ValueError(f"{table} does not exist on the target; run the migrations there first")
+        columns = [c for c in source_columns if c in target_columns and c != 'id']
+
+        low, high = _bounds(src, table, watermark)
+        if high is None:
+            print(f"{table}: source is empty")
+            return {'inserted': 0, 'updated': 0}
+        mark_name, origin = _mark_name(source, table)
+        if not full:
+            copied_high = _comparable(_stored_mark(dst, mark_name), low)
+            if isinstance(copied_high, datetime):
+                low = max(low, copied_high - timedelta(hours=overlap_hours))
+            elif copied_high is not None:
+                low = max(low, copied_high - timedelta(days=max(1, -(-overlap_hours // 24))))
+
+        dst.execute(sql.SQL("CREATE TEMP TABLE replicate_stage AS SELECT {cols} FROM {t} WITH NO DATA").format(
+            cols=sql.SQL(', ').join(map(sql.Identifier, columns)), t=sql.Identifier(table)))
+        upsert = _upsert_sql(table, columns, key)
+        column_list = sql.SQL(', ').join(map(sql.Identifier, columns))
+
+        totals = {'inserted': 0, 'updated': 0}
+        changed_keys = []
+        print(f"{table}: copying {watermark} {low} .. {high}")
+        for start, end, last in _chunks(low, high, timedelta(days=chunk_days)):
+            select = sql.SQL("SELECT {cols} FROM {t} WHERE ({w} >= {start} AND {w} {op} {end}){nulls}").format(
+                cols=column_list, t=sql.Identifier(table), w=sql.Identifier(watermark),
+                start=sql.Literal(start), op=sql.SQL('<=' if last else '<'), end=sql.Literal(high if last else end),
+                # Rows from before the watermark column was filled only travel with a full copy
+                nulls=sql.SQL(" OR {} IS NULL").format(sql.Identifier(watermark)) if full and start == low else sql.SQL(''),
+            )
+            # CSV rather than binary so column types may differ slightly between the two databases
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode='w+b') as buffer:
+                src.copy_expert(sql.SQL("COPY ({}) TO STDOUT WITH (FORMAT csv)").format(select).as_string(src), buffer)
+                buffer.seek(0)
+                dst.execute("TRUNCATE replicate_stage")
+                dst.copy_expert(sql.SQL("COPY replicate_stage ({}) FROM STDIN WITH (FORMAT csv)").format(column_list).as_string(dst), buffer)
+
+            dst.execute(upsert)
+            rows = dst.fetchall()
+            target.commit()
+            inserted = sum(1 for row in rows if row[0])
+            totals['inserted'] += inserted
+            totals['updated'] += len(rows) - inserted
+            changed_keys.extend(row[1] for row in rows)
+            if rows:
+                print(f"{table}: {start} .. {end}: {inserted} inserted, {len(rows) - inserted} updated")
+
+        dst.execute("DROP TABLE replicate_stage")
+        _store_mark(dst, mark_name, high, dict(totals, source=origin))
+        target.commit()
+
+    if table == 'demand_data' and changed_keys:
+        refresh_target_demand_rollups(target_url, min(changed_keys), max(changed_keys))
+
+    print(f"{table}: done, {totals['inserted']} inserted, {totals['updated']} updated")
+    return totals
+
+def refresh_target_demand_rollups(target_url, first, last):
+    """Rebuild the demand rollups on the target for the replicated hours"""
+    from sqlalchemy import create_engine
+    from app.services.demand_rollups import upsert_rollups
+
+    engine = create_engine('postgresql+psycopg2://', creator=lambda: psycopg2.connect(_libpq_url(target_url)))
+    with engine.begin() as conn:
+        upsert_rollups(conn, first, last)
+    engine.dispose()
+    print(f"demand rollups refreshed for {first} .. {last}")
+
+def replicate(source_url, target_url, tables, full=False, overlap_hours=24, chunk_days=31):
+    source = psycopg2.connect(_libpq_url(source_url))
+    target = psycopg2.connect(_libpq_url(target_url))
+    # Long COPY reads run in one repeatable-read snapshot so chunks are consistent
+    source.set_session(readonly=True, isolation_level='REPEATABLE READ')
+    try:
+        return {table: replicate_table(source, target, table, target_url, full, overlap_hours, chunk_days)
+                for table in tables}
+    finally:
+        source.close()
+        target.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Replicate time-series tables between databases')
+    parser.add_argument('tables', nargs='*', metavar='TABLE',
+                        help=f"Tables to replicate: {', '.join(sorted(TABLES))}")
+    parser.add_argument('--all', action='store_true', help='Replicate every known table')
+    parser.add_argument('--source-url', help='Source database URL')
+    parser.add_argument('--target-url', help='Target database URL')
+    parser.add_argument('--production', action='store_true',
+                        help='Copy from DATABASE_URL (local) to PRODUCTION_DATABASE_URL')
+    parser.add_argument('--full', action='store_true', help='Copy every row instead of only new/changed ones')
+    parser.add_argument('--overlap-hours', type=int, default=24,
+                        help='Re-copy this much before the previous run\'s source watermark (default: 24)')
+    parser.add_argument('--chunk-days', type=int, default=31,
+                        help='Watermark range copied per COPY round trip (default: 31)')
+
+    args = parser.parse_args()
+
+    source_url, target_url = args.source_url, args.target_url
+    if args.production:
+        source_url = os.environ.get('DATABASE_URL')
+        target_url = os.environ.get('PRODUCTION_DATABASE_URL')
+    if not source_url or not target_url:
+        print("Error: source and target database URLs are required (--source-url/--target-url or --production)")
+        sys.exit(1)
+
+    tables = sorted(TABLES) if args.all else args.tables
+    if not tables:
+        print("Error: name at least one table or pass --all")
+        sys.exit(1)
+    unknown = [t for t in tables if t not in TABLES]
+    if unknown:
+        print(f"Error: unknown table(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    replicate(source_url, target_url, tables, args.full, args.overlap_hours, args.chunk_days)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Hourly combined solar (licensed + unlicensed) maintained from the two solar tables
+"""
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from ..database.config import db
+
+logger = logging.getLogger(__name__)
+
+# Hours with a value in only one source still get a row: the missing side counts as 0
+# in solar_combined and its has_* flag is false
+COMBINED_UPSERT = text("""
+    INSERT INTO combined_solar_hourly
+        (datetime, unlicensed_solar, licensed_solar, solar_combined, has_unlicensed, has_licensed, updated_at)
+    SELECT hour_start,
+           u.value,
+           l.value,
+           COALESCE(u.value, 0) + COALESCE(l.value, 0),
+           u.value IS NOT NULL,
+           l.value IS NOT NULL,
+           NOW()
+    FROM (
+        SELECT date_trunc('hour', datetime) AS hour_start, AVG(unlicensed_solar) AS value
+        FROM unlicensed_solar_data
+        WHERE datetime >= :start AND datetime < :end
+        GROUP BY 1
+    ) u
+    FULL OUTER JOIN (
+        SELECT date_trunc('hour', datetime) AS hour_start, AVG(licensed_solar) AS value
+        FROM licensed_solar_data
+        WHERE datetime >= :start AND datetime < :end
+        GROUP BY 1
+    ) l USING (hour_start)
+    ON CONFLICT (datetime) DO UPDATE SET
+        unlicensed_solar = EXCLUDED.unlicensed_solar,
+        licensed_solar = EXCLUDED.licensed_solar,
+        solar_combined = EXCLUDED.solar_combined,
+        has_unlicensed = EXCLUDED.has_unlicensed,
+        has_licensed = EXCLUDED.has_licensed,
+        updated_at = EXCLUDED.updated_at
+    WHERE combined_solar_hourly.solar_combined IS DISTINCT FROM EXCLUDED.solar_combined
+       OR combined_solar_hourly.has_unlicensed IS DISTINCT FROM EXCLUDED.has_unlicensed
+       OR combined_solar_hourly.has_licensed IS DISTINCT FROM EXCLUDED.has_licensed
+""")
+
+
+def _hour_floor(value):
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def upsert_combined_solar(conn, start, end):
+    """Recompute the combined hours in [start, end] on ``conn``; the caller commits."""
+    hour_start = _hour_floor(start)
+    hour_end = _hour_floor(end) + timedelta(hours=1)
+    result = conn.execute(COMBINED_UPSERT, {'start': hour_start, 'end': hour_end})
+    return result.rowcount
+
+
+def refresh_combined_solar(start, end, commit=True):
+    """Refresh the combined hours touched by solar rows written in [start, end]."""
+    rows = upsert_combined_solar(db.session, start, end)
+    if commit:
+        db.session.commit()
+    logger.info("Combined solar refreshed for %s .. %s (%d hours changed)", start, end, rows)
+    return rows
+
+
+def rebuild_combined_solar(start=None, end=None):
+    """Rebuild [start, end], defaulting to everything in either solar table."""
+    if start is None or end is None:
+        bounds = db.session.execute(text("""
+            SELECT LEAST(u.lo, l.lo), GREATEST(u.hi, l.hi)
+            FROM (SELECT MIN(datetime) AS lo, MAX(datetime) AS hi FROM unlicensed_solar_data) u,
+                 (SELECT MIN(datetime) AS lo, MAX(datetime) AS hi FROM licensed_solar_data) l
+        """)).fetchone()
+        if bounds[0] is None:
+            return 0
+        start = start or bounds[0]
+        end = end or bounds[1]
+    return refresh_combined_solar(start, end)
+
+
+def ensure_combined_solar(start, end):
+    """Build [start, end] once if the combined table has nothing there yet."""
+    present = db.session.execute(
+        text("SELECT 1 FROM combined_solar_hourly WHERE datetime >= :start AND datetime <= :end LIMIT 1"),
+        {'start': start, 'end': end}
+    ).first()
+    if present is None:
+        refresh_combined_solar(start, end)
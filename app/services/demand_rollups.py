@@ -0,0 +1,124 @@
+"""
+Daily / ISO-weekly / monthly demand rollups maintained from demand_data
+"""
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from ..database.config import db
+
+logger = logging.getLogger(__name__)
+
+_AGGREGATES = """
+    SUM(consumption) AS consumption_sum,
+    AVG(consumption) AS consumption_mean,
+    MAX(consumption) AS consumption_peak,
+    COUNT(*) AS hours_present,
+    NOW() AS updated_at
+"""
+
+_AGGREGATE_UPDATE = """
+    consumption_sum = EXCLUDED.consumption_sum,
+    consumption_mean = EXCLUDED.consumption_mean,
+    consumption_peak = EXCLUDED.consumption_peak,
+    hours_present = EXCLUDED.hours_present,
+    updated_at = EXCLUDED.updated_at
+"""
+
+DAILY_UPSERT = text(f"""
+    INSERT INTO demand_daily_rollup (day, consumption_sum, consumption_mean, consumption_peak, hours_present, updated_at)
+    SELECT datetime::date AS day, {_AGGREGATES}
+    FROM demand_data
+    WHERE datetime >= :start AND datetime < :end
+    GROUP BY 1
+    ON CONFLICT (day) DO UPDATE SET {_AGGREGATE_UPDATE}
+""")
+
+WEEKLY_UPSERT = text(f"""
+    INSERT INTO demand_weekly_rollup (iso_year, iso_week, week_start, consumption_sum, consumption_mean, consumption_peak, hours_present, updated_at)
+    SELECT EXTRACT(isoyear FROM datetime)::int AS iso_year,
+           EXTRACT(week FROM datetime)::int AS iso_week,
+           MIN(date_trunc('week', datetime))::date AS week_start,
+           {_AGGREGATES}
+    FROM demand_data
+    WHERE datetime >= :start AND datetime < :end
+    GROUP BY 1, 2
+    ON CONFLICT (iso_year, iso_week) DO UPDATE SET week_start = EXCLUDED.week_start, {_AGGREGATE_UPDATE}
+""")
+
+MONTHLY_UPSERT = text(f"""
+    INSERT INTO demand_monthly_rollup (year, month, consumption_sum, consumption_mean, consumption_peak, hours_present, updated_at)
+    SELECT EXTRACT(year FROM datetime)::int AS year,
+           EXTRACT(month FROM datetime)::int AS month,
+           {_AGGREGATES}
+    FROM demand_data
+    WHERE datetime >= :start AND datetime < :end
+    GROUP BY 1, 2
+    ON CONFLICT (year, month) DO UPDATE SET {_AGGREGATE_UPDATE}
+""")
+
+
+def _day_floor(value):
+    return datetime.combine(value.date() if isinstance(value, datetime) else value, datetime.min.time())
+
+
+def upsert_rollups(conn, start, end):
+    """Recompute every day, ISO week and month that overlaps [start, end] on ``conn``.
+
+    Each period is rebuilt from demand_data over its full extent, so the rollups
+    are correct no matter which hours inside it were inserted or revised.  ``conn``
+    may be ``db.session`` or any SQLAlchemy connection (scripts writing to another
+    database); the caller commits.
+    """
+    day_start = _day_floor(start)
+    day_end = _day_floor(end) + timedelta(days=1)
+    week_start = day_start - timedelta(days=day_start.weekday())
+    week_end = day_end + timedelta(days=(7 - day_end.weekday()) % 7)
+    month_start = day_start.replace(day=1)
+    month_end = (day_end - timedelta(days=1)).replace(day=1)
+    month_end = (month_end + timedelta(days=32)).replace(day=1)
+
+    conn.execute(DAILY_UPSERT, {'start': day_start, 'end': day_end})
+    conn.execute(WEEKLY_UPSERT, {'start': week_start, 'end': week_end})
+    conn.execute(MONTHLY_UPSERT, {'start': month_start, 'end': month_end})
+    return day_start, day_end
+
+
+def refresh_demand_rollups(start, end, commit=True):
+    """Refresh the rollups touched by demand hours written in [start, end]."""
+    day_start, day_end = upsert_rollups(db.session, start, end)
+    if commit:
+        db.session.commit()
+    logger.info("Demand rollups refreshed for %s .. %s", day_start.date(), (day_end - timedelta(days=1)).date())
+
+
+def rebuild_demand_rollups(start=None, end=None):
+    """Rebuild the rollups for [start, end], defaulting to everything in demand_data."""
+    if start is None or end is None:
+        bounds = db.session.execute(text("SELECT MIN(datetime), MAX(datetime) FROM demand_data")).fetchone()
+        if bounds[0] is None:
+            return
+        start = start or bounds[0]
+        end = end or bounds[1]
+    refresh_demand_rollups(start, end)
+
+
+def ensure_demand_rollups(start, end):
+    """Build the rollups for [start, end] once if the daily table does not reach back to demand_data's first day there.
+
+    Ingest only refreshes the days it writes, so a table holding just the
+    recent days would otherwise pass for built.
+    """
+    params = {'start': _day_floor(start), 'end': _day_floor(end) + timedelta(days=1)}
+    stored_from, data_from = db.session.execute(
+        text("""
+            SELECT (SELECT MIN(day) FROM demand_daily_rollup WHERE day >= :start AND day < :end),
+                   (SELECT MIN(datetime) FROM demand_data WHERE datetime >= :start AND datetime < :end)
+        """),
+        params
+    ).fetchone()
+    if data_from is None:
+        return
+    if stored_from is None or stored_from > _day_floor(data_from).date():
+        refresh_demand_rollups(start, end)
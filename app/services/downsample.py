@@ -0,0 +1,57 @@
+"""
+Server-side downsampling for long time-series chart payloads
+"""
+import numpy as np
+
+
+def parse_max_points(value, minimum=3):
+    """Return ``value`` as a positive int point budget, or None when absent/invalid."""
+    try:
+        max_points = int(value)
+    except (TypeError, ValueError):
+        return None
+    return max_points if max_points >= minimum else None
+
+
+def lttb_indices(y, max_points, x=None):
+    """Largest-Triangle-Three-Buckets: indices of at most ``max_points`` shape-preserving samples.
+
+    First and last points are always kept.  Missing values count as 0, which is how
+    the charts render them.  Returns all indices when the series is already small.
+    """
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    n = len(y)
+    if not max_points or max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+
+    # n-2 interior points split into max_points-2 buckets; edges[-1] == n-1 (the last point)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    selected = np.empty(max_points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def downsample_records(records, value_key, max_points):
+    """Thin a list of dict records to ``max_points`` using LTTB on ``value_key``."""
+    if not max_points or len(records) <= max_points:
+        return records
+    values = [record.get(value_key) for record in records]
+    values = [v if isinstance(v, (int, float)) else np.nan for v in values]
+    return [records[i] for i in lttb_indices(values, max_points)]
@@ -0,0 +1,178 @@
+"""
+Streaming CSV/NDJSON export of the hourly series tables, and spooled xlsx workbooks
+"""
+import csv
+import io
+import json
+import logging
+import tempfile
+import zlib
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+from sqlalchemy import select
+
+from ..database.config import db
+from ..models.demand import DemandData
+from ..models.licensed_solar import LicensedSolarData
+from ..models.production import ProductionData
+from ..models.unlicensed_solar import UnlicensedSolarData
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 5000
+
+# series name -> (model, [(column, exported field name), ...]); production keeps the
+# same field names as ProductionData.to_dict() so exports match /production_data
+EXPORT_SERIES = {
+    'production': (ProductionData, [
+        ('fueloil', 'FuelOil'), ('gasoil', 'GasOil'), ('blackcoal', 'BlackCoal'),
+        ('lignite', 'Lignite'), ('geothermal', 'Geothermal'), ('naturalgas', 'NaturalGas'),
+        ('river', 'Run-of-River'), ('dammedhydro', 'Dam'), ('lng', 'LNG'),
+        ('biomass', 'Biomass'), ('naphta', 'Naphta'), ('importcoal', 'HardCoal'),
+        ('asphaltitecoal', 'Asphaltite'), ('wind', 'Wind'), ('nuclear', 'Nuclear'),
+        ('sun', 'Solar'), ('importexport', 'ImportExport'), ('total', 'Total'),
+        ('wasteheat', 'WasteHeat'),
+    ]),
+    'demand': (DemandData, [('consumption', 'consumption')]),
+    'unlicensed_solar': (UnlicensedSolarData, [('unlicensed_solar', 'unlicensed_solar')]),
+    'licensed_solar': (LicensedSolarData, [('licensed_solar', 'licensed_solar')]),
+}
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Finished workbooks up to this size stay in memory; larger ones roll over to a temp file
+XLSX_SPOOL_BYTES = 4 * 1024 * 1024
+XLSX_STREAM_CHUNK = 64 * 1024
+
+
+def _iter_rows(model, columns, start, end, chunk_size):
+    """Yield row chunks from a server-side cursor so memory stays flat for any range."""
+    table = model.__table__
+    stmt = (
+        select(table.c.datetime, *[table.c[col] for col, _ in columns])
+        .where(table.c.datetime >= start, table.c.datetime < end)
+        .order_by(table.c.datetime)
+    )
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(stmt)
+        for chunk in result.partitions(chunk_size):
+            yield chunk
+
+
+def _iter_text(series, start, end, fmt, chunk_size):
+    model, columns = EXPORT_SERIES[series]
+    fields = ['datetime'] + [label for _, label in columns]
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        yield buffer.getvalue()
+
+    rows_written = 0
+    for chunk in _iter_rows(model, columns, start, end, chunk_size):
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in chunk:
+                writer.writerow([row[0].strftime('%Y-%m-%d %H:%M:%S'), *row[1:]])
+            yield buffer.getvalue()
+        else:
+            yield ''.join(
+                json.dumps(dict(zip(fields, [row[0].strftime('%Y-%m-%d %H:%M:%S'), *row[1:]]))) + '\n'
+                for row in chunk
+            )
+        rows_written += len(chunk)
+
+    logger.info("Exported %d %s rows (%s)", rows_written, series, fmt)
+
+
+def stream_series(series, start, end, fmt='ndjson', compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield encoded bytes for ``series`` between ``start`` (inclusive) and ``end`` (exclusive).
+
+    With ``compress`` the output is a single gzip stream built incrementally.
+    """
+    if series not in EXPORT_SERIES:
+        raise ValueError(f"Unknown series '{series}'")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'")
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    for piece in _iter_text(series, start, end, fmt, chunk_size):
+        data = piece.encode('utf-8')
+        if compressor is None:
+            yield data
+        else:
+            out = compressor.compress(data)
+            if out:
+                yield out
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def build_workbook(write):
+    """Run ``write(workbook)`` on a constant-memory xlsxwriter workbook.
+
+    Each worksheet only holds its current row and flushes the rest to a temp
+    file, so ``write`` must fill rows top to bottom (use write_frame).  The
+    finished file is spooled to disk past XLSX_SPOOL_BYTES; returns the rewound
+    file and its size.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_BYTES, suffix='.xlsx')
+    try:
+        workbook = xlsxwriter.Workbook(spool, {
+            'constant_memory': True,
+            'remove_timezone': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        })
+        write(workbook)
+        workbook.close()
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0, io.SEEK_END)
+    size = spool.tell()
+    spool.seek(0)
+    return spool, size
+
+
+def iter_file(fileobj, chunk_size=XLSX_STREAM_CHUNK):
+    """Yield ``fileobj`` in chunks and close it once sent (or abandoned)."""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def _cell(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def write_frame(worksheet, frame, row=0, header_format=None, cell_format=None, index=False):
+    """Write ``frame`` (header first) row by row from ``row``; returns the next free row.
+
+    Missing values are left blank.  With ``index`` the index levels are written
+    as the leading columns, as DataFrame.to_excel does.
+    """
+    if index:
+        frame = frame.reset_index()
+    worksheet.write_row(row, 0, [str(col) for col in frame.columns], header_format)
+    row += 1
+    for values in frame.itertuples(index=False, name=None):
+        worksheet.write_row(row, 0, [_cell(value) for value in values], cell_format)
+        row += 1
+    return row
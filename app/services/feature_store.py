@@ -0,0 +1,146 @@
+"""
+Stored hourly Chronos feature frames per model variant, appended to by the scheduler
+"""
+import logging
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytz
+
+from ..database.config import db
+from ..forecasting.utils import (
+    CONTEXT_LENGTHS,
+    FEATURE_WINDOW_DAYS,
+    SYSTEM_DIRECTION_FEATURES,
+    WARMUP_HOURS,
+    add_system_direction_features,
+    engineer_features,
+    fetch_generation_data,
+    fetch_ramadan_data,
+    fetch_smf_ptf_data,
+    fetch_system_direction,
+)
+from ..models.feature_store import ChronosFeatureHourly
+from .watermarks import get_watermark, record_run
+
+logger = logging.getLogger(__name__)
+
+FEATURE_STORE_WATERMARK = 'chronos_features'
+
+# Frame columns in engineer_features order; the stored column drops the dash
+BASE_FEATURES = [
+    'demand', 'wind', 'hydro', 'solar', 'ptf', 'system_direction', 'is_holiday', 'is_ramadan', 'hour',
+    'is_peak_off-peak1', 'is_peak_off-peak2', 'is_peak_peak',
+    'week_part_Saturday', 'week_part_Sunday', 'week_part_Weekday',
+    'demand_renewable_diff', 'demand_diff24', 'smf_lag24', 'smf_lag168', 'smf_ptf_diff_lag24',
+]
+
+# Hours before the newest stored one (or now, for forecasts that run ahead) rebuilt every run:
+# yal is published late and Meteologica revises its forecasts
+FEATURE_STORE_OVERLAP_HOURS = 72
+# Extra history loaded in front of the rebuilt hours so every lag and moving average is defined
+FEATURE_STORE_WARMUP_DAYS = 8
+# Stored hours older than this are deleted
+FEATURE_STORE_RETENTION_DAYS = FEATURE_WINDOW_DAYS + 1
+# Requests build the frame from the source tables when the last good run is older than this
+FEATURE_STORE_MAX_AGE_MINUTES = 90
+
+
+def feature_columns(model_name):
+    """Feature columns stored for (and served to) ``model_name``."""
+    if model_name == 'Model 1':
+        return list(BASE_FEATURES)
+    return BASE_FEATURES + SYSTEM_DIRECTION_FEATURES
+
+
+def _stored_column(feature):
+    return feature.replace('-', '_')
+
+
+def _now_tr():
+    # The feature dates are Turkey wall-clock hours
+    return datetime.now(pytz.timezone('Europe/Istanbul')).replace(tzinfo=None)
+
+
+def sync_feature_store(engine, now=None):
+    """Rebuild the stored hours from the overlap window on and append the new ones, for every variant."""
+    now = now or _now_tr()
+    state = get_watermark(FEATURE_STORE_WATERMARK)
+    if state and state.watermark:
+        since = min(state.watermark, now) - timedelta(hours=FEATURE_STORE_OVERLAP_HOURS)
+    else:
+        since = now - timedelta(days=FEATURE_STORE_RETENTION_DAYS)
+    load_from = since - timedelta(days=FEATURE_STORE_WARMUP_DAYS)
+
+    base = engineer_features(
+        fetch_generation_data(engine, since=load_from),
+        fetch_smf_ptf_data(engine, since=load_from),
+        fetch_system_direction(engine, load_from),
+        fetch_ramadan_data(engine),
+    )
+    if base.empty:
+        return {'written': 0, 'since': since.isoformat()}
+
+    written = 0
+    updated_at = datetime.now()
+    for model_name in CONTEXT_LENGTHS:
+        frame = add_system_direction_features(base.copy(), model_name)
+        frame = frame[frame.index >= since].reindex(columns=feature_columns(model_name))
+        records = [
+            {'model_variant': model_name, 'date': date.to_pydatetime(), 'updated_at': updated_at,
+             **{_stored_column(name): (None if pd.isna(value) else float(value)) for name, value in row.items()}}
+            for date, row in frame.iterrows()
+        ]
+        ChronosFeatureHourly.query.filter(
+            ChronosFeatureHourly.model_variant == model_name,
+            ChronosFeatureHourly.date >= since,
+        ).delete(synchronize_session=False)
+        if records:
+            db.session.execute(ChronosFeatureHourly.__table__.insert(), records)
+            written += len(records)
+
+    ChronosFeatureHourly.query.filter(
+        ChronosFeatureHourly.date < now - timedelta(days=FEATURE_STORE_RETENTION_DAYS)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+    newest = base.index.max().to_pydatetime()
+    result = {'written': written, 'since': since.isoformat(), 'newest': newest.isoformat()}
+    record_run(FEATURE_STORE_WATERMARK, watermark=newest, result=result)
+    logger.info("Feature store rebuilt %d rows from %s", written, since)
+    return result
+
+
+def feature_store_is_fresh():
+    """True when the last store run succeeded within FEATURE_STORE_MAX_AGE_MINUTES."""
+    state = get_watermark(FEATURE_STORE_WATERMARK)
+    return (state is not None and state.last_status == 'ok' and state.last_run_at is not None
+            and state.last_run_at >= datetime.now() - timedelta(minutes=FEATURE_STORE_MAX_AGE_MINUTES))
+
+
+def stored_features(model_name, now=None):
+    """Date-indexed stored feature frame of ``model_name`` over the feature window, warm-up rows included.
+
+    None when the store is stale or does not reach back far enough, so the
+    caller builds the frame from the source tables instead.
+    """
+    try:
+        if not feature_store_is_fresh():
+            return None
+        columns = feature_columns(model_name)
+        query = db.session.query(
+            ChronosFeatureHourly.date, *[getattr(ChronosFeatureHourly, _stored_column(c)) for c in columns]
+        ).filter(
+            ChronosFeatureHourly.model_variant == model_name,
+            ChronosFeatureHourly.date >= (now or _now_tr()) - timedelta(days=FEATURE_WINDOW_DAYS),
+        ).order_by(ChronosFeatureHourly.date)
+        frame = pd.read_sql(query.statement, con=db.session.connection())
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Feature store unavailable, building features from the source tables: %s", e)
+        return None
+    if len(frame) <= WARMUP_HOURS:
+        return None
+    frame.columns = ['date'] + columns
+    frame['date'] = pd.to_datetime(frame['date'])
+    return frame.set_index('date').astype(float)
@@ -0,0 +1,218 @@
+"""
+Daily forecast-error sums per source and horizon, behind the forecast-performance metrics
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+
+from ..database.config import db
+from ..models.forecast_metrics import ForecastErrorDaily
+from .forecast_performance import HORIZON_TABLES, latest_ptf, load_comparison, normalize_horizon
+from .watermarks import get_watermark, record_run
+
+logger = logging.getLogger(__name__)
+
+# Frame column -> display name, in the order the performance page lists them
+SOURCES = [
+    ('meteologica_min', 'Meteologica Min'),
+    ('meteologica_avg', 'Meteologica Avg'),
+    ('meteologica_max', 'Meteologica Max'),
+    ('best_price', 'Model Forecast'),
+    ('cemre_forecast', 'Cemre Forecast'),
+]
+SUM_COLUMNS = [
+    'hours', 'sum_abs_error', 'sum_sq_error', 'sum_error', 'sum_actual', 'sum_abs_actual',
+    'sum_sq_actual', 'direction_hits', 'direction_hours',
+]
+
+FORECAST_METRICS_WATERMARK = 'forecast_metrics'
+# Days before the last stored one that every run recomputes (late forecasts, PTF corrections)
+FORECAST_METRICS_LOOKBACK_DAYS = 3
+# How far back the first run fills the table
+FORECAST_METRICS_BACKFILL_DAYS = 365
+# Days loaded from Supabase per round trip
+_CHUNK_DAYS = 31
+
+
+def _local_dates(dates):
+    if dates.dt.tz is not None:
+        return dates.dt.tz_convert('Europe/Istanbul').dt.tz_localize(None)
+    return dates
+
+
+def hourly_contributions(frame):
+    """One row per (hour, source) with that hour's share of every daily sum.
+
+    Hours without a realized price or without the source's forecast are left
+    out.  A direction hit is an hour whose forecast moved the same way as PTF
+    from the previous hour.
+    """
+    frame = frame.dropna(subset=['actual_price']).sort_values('date')
+    dates = _local_dates(frame['date'])
+    actual = frame['actual_price'].astype(float)
+    actual_step = actual.diff()
+    consecutive = dates.diff() == pd.Timedelta(hours=1)
+
+    parts = []
+    for column, _name in SOURCES:
+        if column not in frame.columns:
+            continue
+        forecast = pd.to_numeric(frame[column], errors='coerce')
+        present = forecast.notna()
+        if not present.any():
+            continue
+        error = forecast - actual
+        forecast_step = forecast.diff()
+        directional = present & consecutive & forecast_step.notna() & actual_step.notna()
+        part = pd.DataFrame({
+            'date': dates,
+            'day': dates.dt.date,
+            'source': column,
+            'hours': 1,
+            'sum_abs_error': error.abs(),
+            'sum_sq_error': error ** 2,
+            'sum_error': error,
+            'sum_actual': actual,
+            'sum_abs_actual': actual.abs(),
+            'sum_sq_actual': actual ** 2,
+            'direction_hits': (directional & (np.sign(forecast_step) == np.sign(actual_step))).astype(int),
+            'direction_hours': directional.astype(int),
+        })
+        parts.append(part[present])
+    if not parts:
+        return pd.DataFrame(columns=['date', 'day', 'source'] + SUM_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+def metrics_from_sums(sums):
+    """wmape / rmse / r2 (as the page always showed them) plus mae, bias and hit rate."""
+    n = int(sums.get('hours') or 0)
+    if n == 0:
+        return {'wmape': 0, 'rmse': 0, 'r2': 0, 'mae': 0, 'bias': 0, 'hit_rate': None, 'hours': 0}
+    sums = {key: float(sums[key]) for key in SUM_COLUMNS}
+    ss_tot = sums['sum_sq_actual'] - sums['sum_actual'] ** 2 / n
+    return {
+        'wmape': round(sums['sum_abs_error'] / sums['sum_abs_actual'] * 100, 2) if sums['sum_abs_actual'] else 0,
+        'rmse': round((sums['sum_sq_error'] / n) ** 0.5, 2),
+        'r2': round(1 - sums['sum_sq_error'] / ss_tot, 2) if ss_tot > 0 else 0,
+        'mae': round(sums['sum_abs_error'] / n, 2),
+        'bias': round(sums['sum_error'] / n, 2),
+        'hit_rate': round(sums['direction_hits'] / sums['direction_hours'] * 100, 2) if sums['direction_hours'] else None,
+        'hours': n,
+    }
+
+
+def refresh_forecast_metrics(engine, start_day, end_day, horizons=None):
+    """Recompute the daily rows of [start_day, end_day] from Supabase; returns rows written."""
+    written = 0
+    for horizon in horizons or list(HORIZON_TABLES):
+        chunk_start = start_day
+        while chunk_start <= end_day:
+            chunk_end = min(end_day, chunk_start + timedelta(days=_CHUNK_DAYS - 1))
+            # One hour earlier so the first hour has a previous one for its direction
+            frame = load_comparison(engine, horizon,
+                                    pd.Timestamp(datetime.combine(chunk_start, time.min)) - pd.Timedelta(hours=1),
+                                    pd.Timestamp(datetime.combine(chunk_end, time(23, 59, 59))))
+            rows = pd.DataFrame()
+            if frame is not None:
+                hourly = hourly_contributions(frame)
+                hourly = hourly[(hourly['day'] >= chunk_start) & (hourly['day'] <= chunk_end)]
+                rows = hourly.groupby(['day', 'source'])[SUM_COLUMNS].sum().reset_index()
+
+            ForecastErrorDaily.query.filter(
+                ForecastErrorDaily.horizon == horizon,
+                ForecastErrorDaily.day >= chunk_start,
+                ForecastErrorDaily.day <= chunk_end,
+            ).delete(synchronize_session=False)
+            if not rows.empty:
+                now = datetime.now()
+                records = [dict(row, horizon=horizon, updated_at=now) for row in rows.to_dict('records')]
+                db.session.execute(ForecastErrorDaily.__table__.insert(), records)
+                written += len(records)
+            db.session.commit()
+            chunk_start = chunk_end + timedelta(days=1)
+    return written
+
+
+def sync_forecast_metrics(engine, now=None):
+    """Bring the daily rows up to the newest PTF day, recomputing the recent tail."""
+    now = now or datetime.now()
+    newest = latest_ptf(engine)
+    if newest is None:
+        return {'written': 0}
+    newest = pd.Timestamp(newest)
+    if newest.tzinfo is not None:
+        newest = newest.tz_convert('Europe/Istanbul').tz_localize(None)
+    last_day = newest.date()
+
+    state = get_watermark(FORECAST_METRICS_WATERMARK)
+    if state and state.watermark:
+        start_day = state.watermark.date() - timedelta(days=FORECAST_METRICS_LOOKBACK_DAYS)
+    else:
+        start_day = now.date() - timedelta(days=FORECAST_METRICS_BACKFILL_DAYS)
+
+    written = refresh_forecast_metrics(engine, start_day, last_day)
+    result = {'written': written, 'start': start_day.isoformat(), 'end': last_day.isoformat()}
+    record_run(FORECAST_METRICS_WATERMARK, watermark=datetime.combine(last_day, time.min), result=result)
+    logger.info("Forecast metrics refreshed for %s .. %s (%d rows)", start_day, last_day, written)
+    return result
+
+
+def _stored_sums(horizon, first_day, last_day):
+    return pd.read_sql(
+        db.session.query(ForecastErrorDaily).filter(
+            ForecastErrorDaily.horizon == horizon,
+            ForecastErrorDaily.day >= first_day,
+            ForecastErrorDaily.day <= last_day,
+        ).statement,
+        con=db.session.connection(),
+    )
+
+
+def window_metrics(horizon, start_dt, end_dt, frame):
+    """Metrics per source for [start_dt, end_dt], keyed by display name.
+
+    Whole days already in forecast_error_daily are summed from it; the hours of
+    partial or not yet stored days come from ``frame`` (the comparison frame the
+    caller already loaded), so the result matches a pass over every hour.
+    """
+    horizon = normalize_horizon(horizon)
+    start_dt, end_dt = pd.Timestamp(start_dt), pd.Timestamp(end_dt)
+    first_day = (start_dt.ceil('D')).date()
+    last_day = ((end_dt + pd.Timedelta(hours=1)).floor('D') - pd.Timedelta(days=1)).date()
+
+    stored = _stored_sums(horizon, first_day, last_day) if first_day <= last_day else pd.DataFrame()
+    stored_days = set(stored['day']) if not stored.empty else set()
+
+    hourly = hourly_contributions(frame)
+    hourly = hourly[(hourly['date'] >= start_dt) & (hourly['date'] <= end_dt) & ~hourly['day'].isin(stored_days)]
+
+    combined = pd.concat([stored[['source'] + SUM_COLUMNS] if not stored.empty else None,
+                          hourly[['source'] + SUM_COLUMNS]], ignore_index=True)
+    totals = combined.groupby('source')[SUM_COLUMNS].sum()
+
+    metrics = {}
+    for column, name in SOURCES:
+        if column in totals.index and totals.loc[column, 'hours'] > 0:
+            metrics[name] = metrics_from_sums(totals.loc[column])
+    return metrics
+
+
+def metrics_trend(horizon, first_day, last_day):
+    """Per-day metrics of every source from the stored rows."""
+    horizon = normalize_horizon(horizon)
+    stored = _stored_sums(horizon, first_day, last_day)
+    days = sorted(set(stored['day'])) if not stored.empty else []
+    series = {}
+    for column, name in SOURCES:
+        rows = stored[stored['source'] == column].set_index('day') if not stored.empty else pd.DataFrame()
+        if rows.empty:
+            continue
+        daily = [metrics_from_sums(rows.loc[day]) if day in rows.index else None for day in days]
+        series[name] = {
+            key: [m[key] if m else None for m in daily]
+            for key in ('mae', 'bias', 'wmape', 'rmse', 'hit_rate', 'hours')
+        }
+    return {'days': [d.isoformat() for d in days], 'series': series}
@@ -0,0 +1,222 @@
+"""
+Supabase PTF vs forecast comparison frames behind /forecast-performance-data, cached per range
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from sqlalchemy import DateTime, bindparam, text
+
+logger = logging.getLogger(__name__)
+
+# horizon -> (schema, table) of the Meteologica, model and Cemre forecasts
+HORIZON_TABLES = {
+    'd+1': {
+        'meteologica': ('public', 'meteologica_forecast'),
+        'model': ('public', 'model_forecast_ptf'),
+        'cemre': ('public', 'cemre_ptf_d+1'),
+    },
+    'd+2': {
+        'meteologica': ('public', 'meteologica_forecast_d+2'),
+        'model': ('public', 'model_forecast_sfc'),
+        'cemre': ('public', 'cemre_ptf_d+2'),
+    },
+}
+PTF_TABLE = ('epias', 'ptf')
+
+# Column types a plain ``date >= :start_dt`` can use an index on
+_DATETIME_TYPES = {'timestamp without time zone', 'timestamp with time zone', 'date'}
+
+# Column types a model's price column may have
+_NUMERIC_TYPES = {'double precision', 'real', 'numeric', 'integer', 'bigint', 'smallint'}
+
+CACHE_SIZE = 16
+# How often (at most) MAX(epias.ptf.date) is read to notice newly published prices
+PTF_CHECK_SECONDS = 300
+
+_lock = threading.Lock()
+_frames = OrderedDict()       # (horizon, start, end) -> merged frame
+_columns = {}                 # (schema, table) -> {column: data_type}
+_predicates = {}              # (schema, table) -> WHERE clause on date
+_ptf_state = {'marker': None, 'checked_at': 0.0}
+
+
+def _quoted(table):
+    return '.'.join('"{}"'.format(part.replace('"', '""')) for part in table)
+
+
+def _table_columns(conn, table):
+    """Column name -> data type of ``table``, read once per process."""
+    if table not in _columns:
+        rows = conn.execute(text(
+            "SELECT column_name, data_type FROM information_schema.columns"
+            " WHERE table_schema = :schema AND table_name = :name ORDER BY ordinal_position"
+        ), {'schema': table[0], 'name': table[1]}).fetchall()
+        _columns[table] = {name: data_type for name, data_type in rows}
+    return _columns[table]
+
+
+def _range_predicate(conn, table):
+    """``date`` in [start_dt, end_dt] without casting the column when its type allows."""
+    if table not in _predicates:
+        data_type = _table_columns(conn, table).get('date')
+        if data_type in _DATETIME_TYPES:
+            _predicates[table] = "date >= :start_dt AND date <= :end_dt"
+        else:
+            logger.warning("%s.date is %s; its range filter cannot use an index", _quoted(table), data_type)
+            _predicates[table] = "date::timestamp >= :start_dt AND date::timestamp <= :end_dt"
+    return _predicates[table]
+
+
+def _model_price_column(conn, table):
+    """best_price, or the column the model table renamed it to."""
+    columns = _table_columns(conn, table)
+    if 'best_price' in columns:
+        return 'best_price'
+    # Only numeric columns qualify, so a name like forecast_date is never taken for the price
+    numeric = [c for c, t in columns.items() if t in _NUMERIC_TYPES]
+    named = [c for c in numeric if 'price' in c.lower() or 'forecast' in c.lower()]
+    if named:
+        return named[0]
+    return numeric[0] if numeric else None
+
+
+def _read(conn, table, select, params):
+    query = text(f"SELECT {select} FROM {_quoted(table)} WHERE {_range_predicate(conn, table)}").bindparams(
+        bindparam('start_dt', type_=DateTime()), bindparam('end_dt', type_=DateTime()))
+    try:
+        return pd.read_sql(query, con=conn, params=params)
+    except Exception:
+        # The table changed under us; rediscover its columns on the next request
+        _columns.pop(table, None)
+        _predicates.pop(table, None)
+        raise
+
+
+def _parse_dates(df):
+    if not df.empty and not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = df['date'].apply(
+            lambda x: str(x).split('+')[0].replace('T', ' ') if isinstance(x, str) else x
+        )
+    if not df.empty:
+        df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def load_comparison(engine, horizon, start_dt, end_dt):
+    """Uncached PTF vs forecasts frame for [start_dt, end_dt] (None without PTF data)."""
+    tables = HORIZON_TABLES[horizon]
+    params = {'start_dt': start_dt.to_pydatetime(), 'end_dt': end_dt.to_pydatetime()}
+
+    with engine.connect() as conn:
+        ptf_df = _read(conn, PTF_TABLE, "date, price AS actual_price", params)
+        if ptf_df.empty:
+            return None
+
+        meteologica_forecast = _read(
+            conn, tables['meteologica'],
+            "date, min_price AS meteologica_min, avg_price AS meteologica_avg, max_price AS meteologica_max",
+            params)
+
+        price_column = _model_price_column(conn, tables['model'])
+        if price_column:
+            model_forecast = _read(conn, tables['model'], f'date, "{price_column}" AS best_price', params)
+        else:
+            logger.warning("%s has no price column", _quoted(tables['model']))
+            model_forecast = pd.DataFrame(columns=['date'])
+
+        cemre_forecast = _read(conn, tables['cemre'], "date, forecasted_price AS cemre_forecast", params)
+
+    ptf_df = _parse_dates(ptf_df)
+    meteologica_forecast = _parse_dates(meteologica_forecast)
+    model_forecast = _parse_dates(model_forecast)
+    cemre_forecast = _parse_dates(cemre_forecast)
+
+    ptf_df['actual_price'] = ptf_df['actual_price'].apply(lambda x: 1 if x <= 0 else x)
+
+    if meteologica_forecast.empty:
+        price_df = ptf_df.assign(meteologica_min=float('nan'), meteologica_avg=float('nan'),
+                                 meteologica_max=float('nan')).sort_values(by='date')
+    else:
+        price_df = pd.merge(ptf_df, meteologica_forecast, on='date', how='outer').sort_values(by='date')
+    if not model_forecast.empty:
+        price_df = pd.merge(price_df, model_forecast, on='date', how='left')
+    if not cemre_forecast.empty:
+        price_df = pd.merge(price_df, cemre_forecast, on='date', how='left')
+    return price_df.reset_index(drop=True)
+
+
+def normalize_horizon(horizon):
+    """'D+2' / 'd+2' -> 'd+2'; anything unknown falls back to 'd+1' as the page always did."""
+    horizon = (horizon or '').lower()
+    return horizon if horizon in HORIZON_TABLES else 'd+1'
+
+
+def comparison_tables(horizon):
+    """Every table a comparison frame of ``horizon`` reads."""
+    return [PTF_TABLE, *HORIZON_TABLES[normalize_horizon(horizon)].values()]
+
+
+def latest_ptf(engine):
+    """Newest hour in epias.ptf (None when empty)."""
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT MAX(date) FROM {_quoted(PTF_TABLE)}")).scalar()
+
+
+def _check_ptf(engine):
+    """Drop every cached frame once epias.ptf has a newer hour than when they were built."""
+    now = time.monotonic()
+    if now - _ptf_state['checked_at'] < PTF_CHECK_SECONDS:
+        return
+    marker = latest_ptf(engine)
+    with _lock:
+        if marker != _ptf_state['marker']:
+            if _frames:
+                logger.info("New PTF data (%s); clearing %d cached comparison frames", marker, len(_frames))
+            _frames.clear()
+            _ptf_state['marker'] = marker
+        _ptf_state['checked_at'] = now
+
+
+def _cached(horizon, start_dt, end_dt):
+    """A cached frame for [start_dt, end_dt], sliced from any cached range that covers it."""
+    with _lock:
+        for key, frame in reversed(_frames.items()):
+            if key[0] == horizon and key[1] <= start_dt and key[2] >= end_dt:
+                _frames.move_to_end(key)
+                if key[1:] == (start_dt, end_dt):
+                    return frame
+                lo, hi = start_dt, end_dt
+                if frame['date'].dt.tz is not None:
+                    # timestamptz columns come back in UTC; naive bounds were compared as UTC by the database
+                    lo, hi = lo.tz_localize('UTC'), hi.tz_localize('UTC')
+                return frame[(frame['date'] >= lo) & (frame['date'] <= hi)].reset_index(drop=True)
+    return None
+
+
+def comparison_frame(engine, horizon, start_dt, end_dt):
+    """PTF merged with the Meteologica, model and Cemre forecasts of ``horizon`` for [start_dt, end_dt].
+
+    Frames are cached per (horizon, start, end); a request inside an already
+    cached range is sliced from it, so switching between the 30/60/90-day views
+    does not query Supabase again.  New PTF hours clear the cache.  Returns None
+    when there is no PTF data in the range.  Callers must not modify the frame.
+    """
+    horizon = normalize_horizon(horizon)
+    start_dt, end_dt = pd.Timestamp(start_dt), pd.Timestamp(end_dt)
+
+    _check_ptf(engine)
+    frame = _cached(horizon, start_dt, end_dt)
+    if frame is not None:
+        return frame
+
+    frame = load_comparison(engine, horizon, start_dt, end_dt)
+    if frame is not None:
+        with _lock:
+            _frames[(horizon, start_dt, end_dt)] = frame
+            while len(_frames) > CACHE_SIZE:
+                _frames.popitem(last=False)
+    return frame
+
@@ -0,0 +1,184 @@
+"""
+Gap repair for the hourly series: find missing hours, refetch their months, bulk upsert
+"""
+import logging
+import threading
+import time
+from calendar import monthrange
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+import pandas as pd
+import requests
+from flask import current_app
+from sqlalchemy import text
+
+from ..database.config import db
+from ..functions import get_tgt_token
+from ..models.demand import DemandData
+from ..models.licensed_solar import LicensedSolarData
+from ..models.production import ProductionData
+from ..models.unlicensed_solar import UnlicensedSolarData
+from . import meteologica
+from .combined_solar import refresh_combined_solar
+from .demand_rollups import refresh_demand_rollups
+from .ingest import (
+    PRODUCTION_COLUMNS, REALTIME_CONSUMPTION_URL, REALTIME_GENERATION_URL,
+    fetch_epias_items, normalize_consumption_items, normalize_generation_items, upsert_frame,
+)
+from .rolling import refresh_rolling_state
+
+logger = logging.getLogger(__name__)
+
+# Series that can be repaired: where their months come from and which columns they write
+GAP_SERIES = {
+    'demand': {
+        'model': DemandData, 'columns': ['consumption'],
+        'source': 'epias', 'url': REALTIME_CONSUMPTION_URL, 'normalize': normalize_consumption_items,
+    },
+    'production': {
+        'model': ProductionData, 'columns': PRODUCTION_COLUMNS,
+        'source': 'epias', 'url': REALTIME_GENERATION_URL, 'normalize': normalize_generation_items,
+    },
+    'unlicensed_solar': {
+        'model': UnlicensedSolarData, 'columns': ['unlicensed_solar', 'update_id'],
+        'source': 'meteologica', 'content_id': meteologica.UNLICENSED_SOLAR_CONTENT,
+    },
+    'licensed_solar': {
+        'model': LicensedSolarData, 'columns': ['licensed_solar', 'update_id'],
+        'source': 'meteologica', 'content_id': meteologica.LICENSED_SOLAR_CONTENT,
+    },
+}
+
+DEFAULT_WORKERS = 4
+# Request starts per second across all workers; EPIAS answers bursts with 429s
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+
+
+class RateLimiter:
+    """Spaces request starts from any number of threads at least 1/rate seconds apart."""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def _retry_session():
+    session = requests.Session()
+    retries = requests.adapters.Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[500, 502, 503, 504, 429],
+    )
+    adapter = requests.adapters.HTTPAdapter(max_retries=retries, pool_maxsize=DEFAULT_WORKERS * 2)
+    session.mount('https://', adapter)
+    return session
+
+
+def find_missing_hours(series, start=None, end=None):
+    """Hours in [start, end] (default: the table's first..last hour) without a row in ``series``."""
+    table = GAP_SERIES[series]['model'].__tablename__
+    rows = db.session.execute(text(f"""
+        WITH bounds AS (
+            SELECT COALESCE(CAST(:start AS timestamp), date_trunc('hour', MIN(datetime))) AS lo,
+                   COALESCE(CAST(:end AS timestamp), date_trunc('hour', MAX(datetime))) AS hi
+            FROM {table}
+        )
+        SELECT h::timestamp
+        FROM bounds, generate_series(bounds.lo, bounds.hi, interval '1 hour') AS h
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {table} t WHERE t.datetime >= h AND t.datetime < h + interval '1 hour'
+        )
+        ORDER BY h
+    """), {'start': start, 'end': end}).fetchall()
+    return pd.DatetimeIndex([row[0] for row in rows])
+
+
+def _authenticate(spec):
+    if spec['source'] == 'epias':
+        return get_tgt_token(current_app.config.get('USERNAME'), current_app.config.get('PASSWORD'))
+    client = meteologica.get_client()
+    client.token()  # fail before any month is queued if the login is refused
+    return client
+
+
+def _fetch_month(spec, year, month, auth, session, limiter):
+    """One month of ``spec`` as a datetime + columns frame (runs in a worker thread)."""
+    limiter.wait()
+    if spec['source'] == 'epias':
+        first, last = date(year, month, 1), date(year, month, monthrange(year, month)[1])
+        return spec['normalize'](fetch_epias_items(spec['url'], first, last, auth, session=session))
+    # Only the wanted hours of the month are stored, so its cache validator is not recorded
+    # and the solar sync still sees the archive as changed
+    content, _changed, _meta = auth.fetch_month(spec['content_id'], year, month)
+    return meteologica.parse_hourly_zip(content, spec['columns'][0])
+
+
+def _after_write(series, first, last):
+    """Keep the derived tables in step with repaired hours."""
+    if series == 'demand':
+        refresh_demand_rollups(first, last)
+        return
+    if GAP_SERIES[series]['source'] == 'meteologica':
+        refresh_combined_solar(first, last)
+    refresh_rolling_state(from_day=first.date())
+
+
+def repair_gaps(series, hours, workers=DEFAULT_WORKERS, requests_per_second=DEFAULT_REQUESTS_PER_SECOND):
+    """Fetch ``hours`` of ``series`` from its source and upsert them in bulk.
+
+    ``hours`` may be missing hours or existing ones to re-check for revisions.
+    They are keyed in a DatetimeIndex, so matching fetched rows is a hash lookup.
+    The covering months are fetched concurrently, with request starts spaced by a
+    shared rate limiter. Returns counts plus the hours that are still missing and
+    the months that failed.
+    """
+    spec = GAP_SERIES[series]
+    wanted = pd.DatetimeIndex(pd.to_datetime(list(hours))).floor('h').unique().sort_values()
+    report = {'series': series, 'requested': len(wanted), 'repaired': 0, 'revised': 0,
+              'still_missing': [], 'failed_months': []}
+    if wanted.empty:
+        return report
+
+    months = sorted(set(zip(wanted.year, wanted.month)))
+    auth = _authenticate(spec)
+    limiter = RateLimiter(requests_per_second)
+    frames = []
+    with _retry_session() as session, ThreadPoolExecutor(max_workers=max(1, min(workers, len(months)))) as pool:
+        futures = {pool.submit(_fetch_month, spec, year, month, auth, session, limiter): (year, month)
+                   for year, month in months}
+        for future in as_completed(futures):
+            year, month = futures[future]
+            try:
+                frame = future.result()
+            except Exception as e:
+                logger.warning("%s %d-%02d fetch failed: %s", series, year, month, e)
+                report['failed_months'].append(f"{year}-{month:02d}")
+                continue
+            frames.append(frame[frame['datetime'].isin(wanted)])
+
+    found = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['datetime'] + spec['columns'])
+    stats = upsert_frame(spec['model'].__table__, found, spec['columns'])
+    db.session.commit()
+    if stats['inserted'] or stats['revised']:
+        _after_write(series, found['datetime'].min(), found['datetime'].max())
+
+    still_missing = wanted.difference(pd.DatetimeIndex(found['datetime']))
+    report.update({
+        'repaired': stats['inserted'],
+        'revised': stats['revised'],
+        'still_missing': [ts.strftime('%Y-%m-%d %H:%M') for ts in still_missing],
+    })
+    report['failed_months'].sort()
+    logger.info("%s gap repair: %d requested, %d repaired, %d revised, %d still missing",
+                series, report['requested'], report['repaired'], report['revised'], len(still_missing))
+    return report
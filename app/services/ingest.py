@@ -0,0 +1,392 @@
+"""
+Shared ingest path for EPIAS realtime generation and consumption payloads
+"""
+import logging
+from datetime import datetime, timedelta
+
+import pandas as pd
+import requests
+from sqlalchemy import literal_column, or_
+from sqlalchemy.dialects.postgresql import insert
+
+from ..database.config import db
+from ..models.demand import DemandData
+from ..models.production import ProductionData
+from .demand_rollups import refresh_demand_rollups
+from .rolling import refresh_rolling_state
+from .watermarks import get_watermark, record_run
+
+logger = logging.getLogger(__name__)
+
+# EPIAS realtime-generation field -> production_data column
+PRODUCTION_FIELD_MAP = {
+    'fueloil': 'fueloil',
+    'gasOil': 'gasoil',
+    'blackCoal': 'blackcoal',
+    'lignite': 'lignite',
+    'geothermal': 'geothermal',
+    'naturalGas': 'naturalgas',
+    'river': 'river',
+    'dammedHydro': 'dammedhydro',
+    'lng': 'lng',
+    'biomass': 'biomass',
+    'naphta': 'naphta',
+    'importCoal': 'importcoal',
+    'asphaltiteCoal': 'asphaltitecoal',
+    'wind': 'wind',
+    'nuclear': 'nuclear',
+    'sun': 'sun',
+    'importExport': 'importexport',
+    'total': 'total',
+    'wasteheat': 'wasteheat',
+}
+PRODUCTION_COLUMNS = list(PRODUCTION_FIELD_MAP.values())
+# Stored as 0 whatever EPIAS sends, as the update routes always did; the history has them zeroed
+ZEROED_PRODUCTION_COLUMNS = ['gasoil', 'nuclear']
+
+REALTIME_GENERATION_URL = "https://seffaflik.epias.com.tr/electricity-service/v1/generation/data/realtime-generation"
+REALTIME_CONSUMPTION_URL = "https://seffaflik.epias.com.tr/electricity-service/v1/consumption/data/realtime-consumption"
+
+UPSERT_BATCH_SIZE = 2000
+
+DEMAND_REVISIONS_WATERMARK = 'demand_revisions'
+REVISION_LOOKBACK_DAYS = 15
+# Upper bound on one revision window so a long outage cannot turn into one huge request
+REVISION_MAX_WINDOW_DAYS = 62
+REVISION_TOLERANCE = 0.01
+
+# Days before the watermark that every incremental sync re-reads for revisions
+INGEST_REVISION_DAYS = 2
+# Longest range sent to EPIAS in one realtime request
+INGEST_MAX_SPAN_DAYS = 31
+
+PRODUCTION_GAP_FILL_WATERMARK = 'production_gap_fill'
+# Realtime generation is published this many hours late; newer hours are not expected yet
+PUBLICATION_LAG_HOURS = 3
+# A day the gap fill already asked EPIAS for is not asked again before this; hours EPIAS
+# never publishes would otherwise be refetched on every request
+GAP_FILL_RETRY_MINUTES = 60
+
+
+def _to_local_naive(values):
+    """Parse EPIAS timestamps to naive Istanbul wall-clock time (how both tables store datetime)."""
+    parsed = pd.to_datetime(values)
+    if getattr(parsed.dt, 'tz', None) is not None:
+        parsed = parsed.dt.tz_localize(None)
+    return parsed
+
+
+def normalize_generation_items(items):
+    """Turn realtime-generation items into a frame of datetime + production_data columns.
+
+    The hour is taken from the ``hour`` field ("HH:00") on top of the calendar day in
+    ``date``, matching how the routes built DateTime before.  Fields missing or null
+    in the payload, and the ZEROED_PRODUCTION_COLUMNS, are stored as 0; duplicate
+    hours keep the last occurrence.
+    """
+    if not items:
+        return pd.DataFrame(columns=['datetime'] + PRODUCTION_COLUMNS)
+
+    raw = pd.json_normalize(items)
+    if 'hour' in raw.columns:
+        day = pd.to_datetime(raw['date'].astype(str).str.slice(0, 10), format='%Y-%m-%d')
+        hours = pd.to_numeric(raw['hour'].astype(str).str.slice(0, 2), errors='coerce')
+        stamps = day + pd.to_timedelta(hours, unit='h')
+    else:
+        stamps = _to_local_naive(raw['date'])
+
+    frame = (
+        raw.reindex(columns=list(PRODUCTION_FIELD_MAP), fill_value=0)
+        .rename(columns=PRODUCTION_FIELD_MAP)
+        .apply(pd.to_numeric, errors='coerce')
+        .fillna(0)
+    )
+    frame[ZEROED_PRODUCTION_COLUMNS] = 0.0
+    frame.insert(0, 'datetime', stamps)
+    frame = frame.dropna(subset=['datetime'])
+    return frame.drop_duplicates(subset=['datetime'], keep='last').sort_values('datetime').reset_index(drop=True)
+
+
+def normalize_consumption_items(items):
+    """Turn realtime-consumption items into a frame of datetime + consumption."""
+    if not items:
+        return pd.DataFrame(columns=['datetime', 'consumption'])
+
+    raw = pd.json_normalize(items)
+    frame = pd.DataFrame({
+        'datetime': _to_local_naive(raw['date']),
+        'consumption': pd.to_numeric(raw.get('consumption'), errors='coerce'),
+    })
+    frame = frame.dropna(subset=['datetime', 'consumption'])
+    return frame.drop_duplicates(subset=['datetime'], keep='last').sort_values('datetime').reset_index(drop=True)
+
+
+def _frame_records(frame, columns):
+    """Frame -> list of dicts with python datetimes/floats (update_id kept as text) and None for NaN."""
+    values = frame[columns].copy()
+    numeric = [c for c in columns if c != 'update_id']
+    values[numeric] = values[numeric].astype(float)
+    values = values.astype(object).where(values.notna(), None)
+    records = values.to_dict(orient='records')
+    for record, ts in zip(records, frame['datetime'].dt.to_pydatetime()):
+        record['datetime'] = ts
+    return records
+
+
+def upsert_frame(table, frame, value_columns, batch_size=UPSERT_BATCH_SIZE):
+    """Upsert ``frame`` into ``table`` keyed on datetime and return inserted/revised counts.
+
+    Rows whose values are identical to what is stored are left untouched, so
+    ``revised`` only counts hours EPIAS actually changed.  Everything runs in the
+    current ``db.session`` transaction; the caller commits.
+    """
+    stats = {'inserted': 0, 'revised': 0, 'unchanged': 0}
+    if frame is None or frame.empty:
+        return stats
+
+    records = _frame_records(frame, value_columns)
+    for i in range(0, len(records), batch_size):
+        batch = records[i:i + batch_size]
+        stmt = insert(table).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['datetime'],
+            set_={**{col: stmt.excluded[col] for col in value_columns},
+                  'created_at': stmt.excluded.created_at},
+            where=or_(*[table.c[col].is_distinct_from(stmt.excluded[col]) for col in value_columns]),
+        ).returning(literal_column('(xmax = 0)').label('inserted'))
+
+        flags = [row.inserted for row in db.session.execute(stmt)]
+        stats['inserted'] += sum(1 for f in flags if f)
+        stats['revised'] += sum(1 for f in flags if not f)
+        stats['unchanged'] += len(batch) - len(flags)
+
+    return stats
+
+
+def ingest_production_items(items, commit=True):
+    """Normalize and upsert a realtime-generation payload into production_data."""
+    frame = normalize_generation_items(items)
+    stats = upsert_frame(ProductionData.__table__, frame, PRODUCTION_COLUMNS)
+    if commit:
+        db.session.commit()
+    stats['first'] = frame['datetime'].min() if not frame.empty else None
+    stats['last'] = frame['datetime'].max() if not frame.empty else None
+    logger.info("production_data ingest: %(inserted)d inserted, %(revised)d revised, %(unchanged)d unchanged", stats)
+
+    if commit and (stats['inserted'] or stats['revised']):
+        _refresh_rolling(stats['first'].date())
+    return stats
+
+
+def _refresh_rolling(from_day):
+    """Extend the rolling state after an ingest; a failure here must not undo the ingest."""
+    try:
+        refresh_rolling_state(from_day=from_day)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Rolling state refresh failed: {str(e)}")
+
+
+def ingest_demand_items(items, commit=True):
+    """Normalize and upsert a realtime-consumption payload into demand_data."""
+    frame = normalize_consumption_items(items)
+    stats = upsert_frame(DemandData.__table__, frame, ['consumption'])
+    if commit:
+        db.session.commit()
+    stats['first'] = frame['datetime'].min() if not frame.empty else None
+    stats['last'] = frame['datetime'].max() if not frame.empty else None
+    logger.info("demand_data ingest: %(inserted)d inserted, %(revised)d revised, %(unchanged)d unchanged", stats)
+
+    if commit and (stats['inserted'] or stats['revised']):
+        refresh_demand_rollups(stats['first'], stats['last'])
+    return stats
+
+
+def fetch_epias_items(url, start_day, end_day, tgt_token, timeout=30, session=None):
+    """POST an EPIAS realtime request for whole days [start_day, end_day] and return its items."""
+    payload = {
+        "startDate": f"{start_day:%Y-%m-%d}T00:00:00+03:00",
+        "endDate": f"{end_day:%Y-%m-%d}T23:59:59+03:00",
+        "region": "TR1",
+    }
+    headers = {
+        'Content-Type': 'application/json',
+        'Accept': "application/json",
+        'TGT': tgt_token
+    }
+    response = (session or requests).post(url, headers=headers, json=payload, timeout=timeout)
+    response.raise_for_status()
+    return response.json().get('items', [])
+
+
+def missing_day_spans(model, start_day, end_day, now=None, lag_hours=PUBLICATION_LAG_HOURS, skip_days=()):
+    """Return [(first_day, last_day), ...] runs of days with at least one missing hour.
+
+    Only hours up to ``lag_hours`` before the current one are expected, so hours
+    EPIAS has not published yet do not count as missing.  Days in ``skip_days``
+    are left out.
+    """
+    now = now or datetime.now()
+    first = datetime.combine(start_day, datetime.min.time())
+    last = min(datetime.combine(end_day, datetime.min.time()) + timedelta(hours=23),
+               now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=lag_hours))
+    if last < first:
+        return []
+
+    present = pd.DatetimeIndex([
+        row[0] for row in db.session.query(model.datetime).filter(
+            model.datetime >= first, model.datetime <= last
+        ).all()
+    ])
+    expected = pd.date_range(first, last, freq='h')
+    missing = expected.difference(present)
+    if missing.empty:
+        return []
+
+    days = pd.DatetimeIndex(missing.normalize().unique())
+    days = days[~days.isin(pd.DatetimeIndex(list(skip_days)))]
+    if days.empty:
+        return []
+    # Consecutive days share a group id; each group becomes one API call
+    group = (days.to_series().diff() != pd.Timedelta(days=1)).cumsum()
+    return [(g.iloc[0].date(), g.iloc[-1].date()) for _, g in days.to_series().groupby(group)]
+
+
+def _recent_gap_fill_attempts(now):
+    """{iso day: iso attempt time} of the days the gap fill asked EPIAS for within GAP_FILL_RETRY_MINUTES."""
+    state = get_watermark(PRODUCTION_GAP_FILL_WATERMARK)
+    attempts = (state.last_result or {}).get('attempted', {}) if state else {}
+    cutoff = now - timedelta(minutes=GAP_FILL_RETRY_MINUTES)
+    return {day: at for day, at in attempts.items() if datetime.fromisoformat(at) >= cutoff}
+
+
+def fill_production_gaps(start_day, end_day, tgt_token_factory, now=None):
+    """Fetch and upsert only the missing production_data days in [start_day, end_day].
+
+    ``tgt_token_factory`` is called lazily so fully warm ranges never authenticate.
+    The days asked for are recorded under PRODUCTION_GAP_FILL_WATERMARK whether or
+    not EPIAS had their hours, and are not asked for again within GAP_FILL_RETRY_MINUTES.
+    """
+    now = now or datetime.now()
+    attempted = _recent_gap_fill_attempts(now)
+    spans = missing_day_spans(ProductionData, start_day, end_day, now=now, skip_days=list(attempted))
+    stats = {'inserted': 0, 'revised': 0, 'unchanged': 0, 'spans': len(spans)}
+    if not spans:
+        return stats
+
+    for span_start, span_end in spans:
+        for day in pd.date_range(span_start, span_end, freq='D'):
+            attempted[day.date().isoformat()] = now.isoformat()
+    try:
+        tgt_token = tgt_token_factory()
+        for span_start, span_end in spans:
+            items = fetch_epias_items(REALTIME_GENERATION_URL, span_start, span_end, tgt_token)
+            span_stats = upsert_frame(ProductionData.__table__, normalize_generation_items(items), PRODUCTION_COLUMNS)
+            for key in ('inserted', 'revised', 'unchanged'):
+                stats[key] += span_stats[key]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        record_run(PRODUCTION_GAP_FILL_WATERMARK, status='error', result={'attempted': attempted, 'error': str(e)})
+        raise
+    record_run(PRODUCTION_GAP_FILL_WATERMARK, result={'attempted': attempted, **stats})
+    if stats['inserted'] or stats['revised']:
+        _refresh_rolling(spans[0][0])
+    logger.info("production_data gap fill: %(spans)d span(s), %(inserted)d inserted, %(revised)d revised", stats)
+    return stats
+
+
+def sync_demand_revisions(tgt_token, lookback_days=REVISION_LOOKBACK_DAYS, tolerance=REVISION_TOLERANCE, now=None):
+    """Pick up EPIAS revisions to already stored demand hours.
+
+    The window starts ``lookback_days`` before the stored watermark (the end of the
+    last checked window) so missed runs are covered, and ends at the current hour.
+    It is fetched in one request, aligned with the stored values by a merge, and
+    only hours that moved by more than ``tolerance`` are upserted, in one batch.
+    """
+    now = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+    state = get_watermark(DEMAND_REVISIONS_WATERMARK)
+    anchor = min(state.watermark, now) if state and state.watermark else now
+    start = max(anchor - timedelta(days=lookback_days), now - timedelta(days=REVISION_MAX_WINDOW_DAYS))
+    end = now
+
+    fetched = normalize_consumption_items(
+        fetch_epias_items(REALTIME_CONSUMPTION_URL, start.date(), end.date(), tgt_token)
+    )
+    fetched = fetched[(fetched['datetime'] >= start) & (fetched['datetime'] <= end)]
+
+    stored = pd.DataFrame(
+        db.session.query(DemandData.datetime, DemandData.consumption).filter(
+            DemandData.datetime >= start, DemandData.datetime <= end
+        ).all(),
+        columns=['datetime', 'consumption']
+    )
+    stored['datetime'] = pd.to_datetime(stored['datetime'])
+
+    merged = fetched.merge(stored, on='datetime', how='inner', suffixes=('', '_stored'))
+    changed = merged[(merged['consumption'] - merged['consumption_stored']).abs() > tolerance]
+
+    stats = upsert_frame(
+        DemandData.__table__, changed[['datetime', 'consumption']], ['consumption'],
+        batch_size=max(len(changed), 1)
+    )
+    db.session.commit()
+    if not changed.empty:
+        refresh_demand_rollups(changed['datetime'].min(), changed['datetime'].max())
+
+    result = {
+        'checked': int(len(merged)),
+        'revised': int(stats['revised']),
+        'start': start.strftime('%Y-%m-%d %H:%M'),
+        'end': end.strftime('%Y-%m-%d %H:%M'),
+    }
+    record_run(DEMAND_REVISIONS_WATERMARK, watermark=end, result=result)
+    logger.info("demand revision sync %(start)s..%(end)s: %(checked)d checked, %(revised)d revised", result)
+    return result
+
+
+# Series kept current by the scheduler: name -> (model, EPIAS endpoint, ingest function)
+SYNC_SERIES = {
+    'production': (ProductionData, REALTIME_GENERATION_URL, ingest_production_items),
+    'demand': (DemandData, REALTIME_CONSUMPTION_URL, ingest_demand_items),
+}
+
+
+def sync_series(name, tgt_token, now=None):
+    """Ingest new hours of series ``name`` ('production' or 'demand') since its watermark.
+
+    The watermark is the newest hour stored by the previous run (falling back to the
+    table's MAX(datetime) on the first run).  Fetching starts INGEST_REVISION_DAYS
+    before it, so recently published hours that EPIAS revised are rewritten too;
+    unchanged hours are skipped by the upsert.
+    """
+    model, url, ingest = SYNC_SERIES[name]
+    now = now or datetime.now()
+    state = get_watermark(name)
+    watermark = state.watermark if state and state.watermark else db.session.query(db.func.max(model.datetime)).scalar()
+    if watermark is None:
+        raise ValueError(f"{model.__tablename__} is empty; populate it with the cao_charts scripts first")
+
+    start_day = (min(watermark, now) - timedelta(days=INGEST_REVISION_DAYS)).date()
+    totals = {'inserted': 0, 'revised': 0, 'unchanged': 0}
+    newest = watermark
+    day = start_day
+    while day <= now.date():
+        span_end = min(day + timedelta(days=INGEST_MAX_SPAN_DAYS - 1), now.date())
+        stats = ingest(fetch_epias_items(url, day, span_end, tgt_token))
+        for key in totals:
+            totals[key] += stats[key]
+        if stats['last'] is not None:
+            newest = max(newest, stats['last'].to_pydatetime())
+        day = span_end + timedelta(days=1)
+
+    result = {
+        'inserted': totals['inserted'],
+        'revised': totals['revised'],
+        'start': start_day.strftime('%Y-%m-%d'),
+        'end': newest.strftime('%Y-%m-%d %H:%M'),
+    }
+    record_run(name, watermark=newest, result=result)
+    logger.info("%s sync from %s: %d inserted, %d revised, watermark %s",
+                name, result['start'], result['inserted'], result['revised'], result['end'])
+    return result
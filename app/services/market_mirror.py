@@ -0,0 +1,279 @@
+"""
+Local mirror of the Supabase market tables, and the engine choice that reads from it while fresh
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from psycopg2 import sql
+
+from ..database.config import db
+from ..database.supabase import get_supabase_engine
+from .forecast_performance import HORIZON_TABLES
+from .watermarks import get_watermark, record_run
+
+logger = logging.getLogger(__name__)
+
+MARKET_MIRROR_ENABLED = os.getenv('MARKET_MIRROR', '1') != '0'
+
+METEOLOGICA_STAMP = 'From-yyyy-mm-dd-hh-mm'
+
+# (schema, table) -> the time column new and revised rows are found by (None copies
+# the whole table every run) and how many days are kept (None keeps everything).
+# Tables keep their Supabase schema and name locally, so the same SQL runs on both.
+MIRROR_TABLES = {
+    ('epias', 'ptf'): {'column': 'date', 'days': None},
+    ('epias', 'smf'): {'column': 'date', 'days': None},
+    ('epias', 'yal'): {'column': 'date', 'days': None},
+    ('epias', 'supply_demand'): {'column': 'date', 'days': 120},
+    ('epias', 'ramadan_dates'): {'column': None, 'days': None},
+    ('meteologica', 'historical_forecast'): {'column': 'date', 'days': None},
+    ('meteologica', 'price'): {'column': METEOLOGICA_STAMP, 'days': None},
+    ('meteologica', 'demand'): {'column': METEOLOGICA_STAMP, 'days': None},
+    ('meteologica', 'wind'): {'column': METEOLOGICA_STAMP, 'days': None},
+    ('meteologica', 'licensed_solar'): {'column': METEOLOGICA_STAMP, 'days': None},
+    ('meteologica', 'unlicensed_solar'): {'column': METEOLOGICA_STAMP, 'days': None},
+    ('meteologica', 'runofriver_hydro'): {'column': METEOLOGICA_STAMP, 'days': None},
+    ('meteologica', 'dam_hydro'): {'column': METEOLOGICA_STAMP, 'days': None},
+}
+for _tables in HORIZON_TABLES.values():
+    for _table in _tables.values():
+        MIRROR_TABLES[_table] = {'column': 'date', 'days': None}
+
+# Hours before the newest mirrored row (or now, for forecasts that run ahead) recopied every run
+MIRROR_OVERLAP_HOURS = 48
+# A mirror whose last successful run is older than this is not read from
+MIRROR_MAX_AGE_MINUTES = 45
+# How long the mirror states read for routing are reused within a process
+MIRROR_STATE_SECONDS = 60
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+_DATETIME_TYPE_PREFIXES = ('timestamp', 'date')
+
+_state_lock = threading.Lock()
+_state_cache = {'loaded_at': 0.0, 'states': {}}
+
+
+def _mirror_available():
+    """The mirror lives in the app database, so it needs that to be PostgreSQL."""
+    return MARKET_MIRROR_ENABLED and db.engine.dialect.name == 'postgresql'
+
+
+def watermark_name(table):
+    return f"mirror:{table[0]}.{table[1]}"
+
+
+def _as_table(table):
+    return tuple(table.split('.', 1)) if isinstance(table, str) else tuple(table)
+
+
+def _table_ident(table):
+    return sql.Identifier(*table)
+
+
+def _column_types(cursor, table):
+    """[(column, formatted type)] of ``table``, empty when it does not exist."""
+    cursor.execute(
+        "SELECT a.attname, format_type(a.atttypid, a.atttypmod) FROM pg_attribute a"
+        " JOIN pg_class c ON c.oid = a.attrelid JOIN pg_namespace n ON n.oid = c.relnamespace"
+        " WHERE n.nspname = %s AND c.relname = %s AND a.attnum > 0 AND NOT a.attisdropped"
+        " ORDER BY a.attnum",
+        table,
+    )
+    return cursor.fetchall()
+
+
+def _time_expr(column, column_type):
+    """The time column as a timestamp; text stamps are cast, which cannot use an index."""
+    if column_type.startswith(_DATETIME_TYPE_PREFIXES):
+        return sql.Identifier(column)
+    return sql.SQL("CAST({} AS timestamp)").format(sql.Identifier(column))
+
+
+def _ensure_local_table(cursor, table, columns):
+    """Create (or recreate after a source schema change) the local copy; True when it starts empty."""
+    if _column_types(cursor, table) == columns:
+        return False
+    cursor.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(table[0])))
+    cursor.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(_table_ident(table)))
+    cursor.execute(sql.SQL("CREATE TABLE {} ({})").format(
+        _table_ident(table),
+        sql.SQL(', ').join(sql.SQL("{} {}").format(sql.Identifier(name), sql.SQL(data_type))
+                           for name, data_type in columns),
+    ))
+    column = MIRROR_TABLES[table]['column']
+    if column:
+        cursor.execute(sql.SQL("CREATE INDEX {} ON {} ({})").format(
+            sql.Identifier(f"ix_{table[1]}_{column}"[:63]), _table_ident(table), sql.Identifier(column)))
+    logger.info("Created local mirror table %s.%s", *table)
+    return True
+
+
+def mirror_table(source, local, table, now=None):
+    """Copy the new and revised rows of ``table`` from ``source`` into ``local`` (psycopg2 connections).
+
+    The window from MIRROR_OVERLAP_HOURS before the stored watermark (or before
+    ``now``, whichever is earlier) is replaced wholesale, so the source needs no
+    unique key; the first run, or one after a schema change, copies everything
+    inside the table's retention.
+    """
+    spec = MIRROR_TABLES[table]
+    now = now or datetime.utcnow()
+    state = get_watermark(watermark_name(table))
+
+    with source.cursor() as src, local.cursor() as dst:
+        columns = _column_types(src, table)
+        if not columns:
+            raise ValueError(f"{table[0]}.{table[1]} does not exist on Supabase")
+        created = _ensure_local_table(dst, table, columns)
+
+        types = dict(columns)
+        where, since = sql.SQL("TRUE"), None
+        if spec['column']:
+            time_expr = _time_expr(spec['column'], types[spec['column']])
+            # A failed run rolled back its window, so the stored watermark still holds
+            if not created and state and state.watermark:
+                since = min(state.watermark, now) - timedelta(hours=MIRROR_OVERLAP_HOURS)
+            elif spec['days']:
+                since = now - timedelta(days=spec['days'])
+            if since is not None:
+                where = sql.SQL("{} >= {}").format(time_expr, sql.Literal(since))
+
+        column_list = sql.SQL(', ').join(sql.Identifier(name) for name, _ in columns)
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode='w+b') as buffer:
+            select = sql.SQL("SELECT {} FROM {} WHERE {}").format(column_list, _table_ident(table), where)
+            src.copy_expert(sql.SQL("COPY ({}) TO STDOUT WITH (FORMAT csv)").format(select).as_string(src), buffer)
+            source.rollback()
+            buffer.seek(0)
+            dst.execute(sql.SQL("DELETE FROM {} WHERE {}").format(_table_ident(table), where))
+            dst.copy_expert(sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+                _table_ident(table), column_list).as_string(dst), buffer)
+            copied = dst.rowcount
+
+        covers_from = None
+        watermark = None
+        if spec['column']:
+            if spec['days']:
+                covers_from = now - timedelta(days=spec['days'])
+                dst.execute(sql.SQL("DELETE FROM {} WHERE {} < {}").format(
+                    _table_ident(table), time_expr, sql.Literal(covers_from)))
+            dst.execute(sql.SQL("SELECT MAX({}) FROM {}").format(time_expr, _table_ident(table)))
+            watermark = dst.fetchone()[0]
+            if watermark is not None:
+                watermark = _naive_utc(watermark)
+        local.commit()
+
+    return {
+        'rows': copied,
+        'since': since.isoformat() if since else None,
+        'covers_from': covers_from.isoformat() if covers_from else None,
+        'watermark': watermark,
+        'recreated': created,
+    }
+
+
+def sync_market_mirror(tables=None, now=None):
+    """Refresh every mirrored table (or ``tables``); one failing table does not stop the others."""
+    if not _mirror_available():
+        return {}
+    results = {}
+    source = get_supabase_engine().raw_connection()
+    local = db.engine.raw_connection()
+    try:
+        for table in [_as_table(t) for t in (tables or MIRROR_TABLES)]:
+            name = watermark_name(table)
+            started = time.monotonic()
+            try:
+                result = mirror_table(source, local, table, now=now)
+            except Exception as e:
+                source.rollback()
+                local.rollback()
+                logger.error("Mirroring %s failed: %s", name, e)
+                record_run(name, status='error', result={'error': str(e)})
+                results[name] = {'error': str(e)}
+                continue
+            watermark = result.pop('watermark')
+            result['seconds'] = round(time.monotonic() - started, 2)
+            record_run(name, watermark=watermark, result=result)
+            results[name] = result
+    finally:
+        source.close()
+        local.close()
+    with _state_lock:
+        _state_cache['loaded_at'] = 0.0
+    return results
+
+
+def mirror_status():
+    """to_dict() of every mirrored table's watermark row, plus whether it is read from."""
+    from ..models.sync_state import SyncWatermark
+    rows = SyncWatermark.query.filter(SyncWatermark.name.like('mirror:%')).order_by(SyncWatermark.name).all()
+    by_name = {row.name: row for row in rows}
+    status = []
+    for table in MIRROR_TABLES:
+        row = by_name.get(watermark_name(table))
+        entry = row.to_dict() if row else {'name': watermark_name(table), 'last_status': None}
+        entry['fresh'] = mirror_is_fresh([table], since=datetime.utcnow()) if row else False
+        status.append(entry)
+    return status
+
+
+def _mirror_states():
+    """name -> (last successful run, covers_from) of every mirrored table, reread every MIRROR_STATE_SECONDS."""
+    with _state_lock:
+        if time.monotonic() - _state_cache['loaded_at'] < MIRROR_STATE_SECONDS:
+            return _state_cache['states']
+    from ..models.sync_state import SyncWatermark
+    rows = SyncWatermark.query.filter(SyncWatermark.name.like('mirror:%')).all()
+    states = {
+        row.name: (row.last_run_at, (row.last_result or {}).get('covers_from'))
+        for row in rows if row.last_status == 'ok'
+    }
+    with _state_lock:
+        _state_cache.update(loaded_at=time.monotonic(), states=states)
+    return states
+
+
+def _naive_utc(value):
+    """datetime/date/Timestamp (aware ones converted to UTC) -> naive datetime."""
+    value = pd.Timestamp(value)
+    if value.tzinfo is not None:
+        value = value.tz_convert('UTC').tz_localize(None)
+    return value.to_pydatetime()
+
+
+def mirror_is_fresh(tables, since=None):
+    """True when every table was mirrored within MIRROR_MAX_AGE_MINUTES and its copy reaches back to ``since``.
+
+    ``since`` None asks for the whole table, which only unbounded mirrors hold.
+    """
+    if not _mirror_available():
+        return False
+    states = _mirror_states()
+    oldest_run = datetime.now() - timedelta(minutes=MIRROR_MAX_AGE_MINUTES)
+    since = _naive_utc(since) if since is not None else None
+    for table in tables:
+        table = _as_table(table)
+        if table not in MIRROR_TABLES:
+            return False
+        last_run, covers_from = states.get(watermark_name(table), (None, None))
+        if last_run is None or last_run < oldest_run:
+            return False
+        if covers_from and (since is None or since < datetime.fromisoformat(covers_from)):
+            return False
+    return True
+
+
+def market_engine(*tables, since=None):
+    """Engine to read ``tables`` from: the local mirror while it is fresh, Supabase otherwise."""
+    try:
+        if mirror_is_fresh(tables, since):
+            return db.engine
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Mirror state unavailable, reading from Supabase: %s", e)
+    return get_supabase_engine()
@@ -0,0 +1,428 @@
+"""
+Merit-order inputs shared by the merit-order page and its Excel export, cached per date pair
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytz
+from requests import Session
+from requests.adapters import HTTPAdapter
+from sqlalchemy import text
+from urllib3 import Retry
+
+from .meteologica_hourly import read_hourly
+
+logger = logging.getLogger(__name__)
+
+DELTA_COLUMNS = ['demand', 'river', 'wind', 'solar']
+
+# Tables the comparison queries (and the power-plant recalculation) read
+MERIT_ORDER_TABLES = [
+    ('epias', 'ptf'), ('epias', 'supply_demand'),
+    ('meteologica', 'historical_forecast'), ('meteologica', 'price'), ('meteologica', 'demand'),
+    ('meteologica', 'wind'), ('meteologica', 'licensed_solar'), ('meteologica', 'unlicensed_solar'),
+    ('meteologica', 'runofriver_hydro'),
+]
+
+# Most scenarios one /merit-order-scenarios call evaluates
+MAX_SCENARIOS = 200
+
+# Meteologica forecasts are revised during the day, so cached frames only live this long
+MERIT_ORDER_CACHE_SECONDS = 600
+CACHE_SIZE = 16
+
+AIC_URL = 'https://seffaflik.epias.com.tr/electricity-service/v1/generation/data/aic'
+
+# Reference day: historical Meteologica forecasts against the realized PTF
+REF_QUERY = text("""
+SELECT
+    hf.date AS date,
+    DATE(hf.date) AS day,
+    TO_CHAR(hf.date, 'HH24:MI') AS hour,
+    ptf.price AS mcp_ref,
+    hf.demand_forecast AS demand,
+    hf.wind_forecast AS wind,
+    hf.licensed_solar_forecast + hf.unlicensed_solar_forecast AS solar,
+    hf.runofriver_forecast AS river
+FROM meteologica.historical_forecast hf
+JOIN epias.ptf ptf ON ptf.date = hf.date
+WHERE DATE(hf.date) = :gen_date
+ORDER BY hf.date
+""")
+
+# Reference day for a single plant: historical forecasts priced with the Meteologica price forecast
+# (the price joined in from meteologica_hourly; this query only when that is not fresh)
+FORECAST_REF_QUERY = text("""
+SELECT
+    hf.date AS date,
+    DATE(hf.date) AS day,
+    TO_CHAR(hf.date, 'HH24:MI') AS hour,
+    p.price_forecast AS mcp_ref,
+    hf.demand_forecast AS demand,
+    hf.wind_forecast AS wind,
+    hf.licensed_solar_forecast + hf.unlicensed_solar_forecast AS solar,
+    hf.runofriver_forecast AS river
+FROM meteologica.historical_forecast hf
+JOIN meteologica.price p ON TO_TIMESTAMP(p."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI:SI') = hf.date
+WHERE DATE(hf.date) = :gen_date
+ORDER BY hf.date
+""")
+
+HISTORICAL_FORECAST_QUERY = text("""
+SELECT
+    hf.date AS date,
+    DATE(hf.date) AS day,
+    TO_CHAR(hf.date, 'HH24:MI') AS hour,
+    hf.demand_forecast AS demand,
+    hf.wind_forecast AS wind,
+    hf.licensed_solar_forecast + hf.unlicensed_solar_forecast AS solar,
+    hf.runofriver_forecast AS river
+FROM meteologica.historical_forecast hf
+WHERE DATE(hf.date) = :gen_date
+ORDER BY hf.date
+""")
+
+# Prediction day: current Meteologica forecasts (when meteologica_hourly is not fresh)
+PRED_QUERY = text("""
+SELECT
+    CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP) AS date,
+    DATE(CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP)) AS day,
+    TO_CHAR(CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP), 'HH24:MI') AS hour,
+    p.price_forecast AS mcp_pred,
+    d.demand_forecast AS demand,
+    w.wind_forecast AS wind,
+    ls.licensed_forecast + us.unlicensed_forecast AS solar,
+    ror.runofriver_forecast AS river
+FROM meteologica.demand d
+JOIN meteologica.price p ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(p."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
+JOIN meteologica.wind w ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(w."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
+JOIN meteologica.licensed_solar ls ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(ls."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
+JOIN meteologica.unlicensed_solar us ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(us."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
+JOIN meteologica.runofriver_hydro ror ON TO_TIMESTAMP(d."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI') = TO_TIMESTAMP(ror."From-yyyy-mm-dd-hh-mm", 'YYYY-MM-DD HH24:MI')
+WHERE DATE(CAST(d."From-yyyy-mm-dd-hh-mm" AS TIMESTAMP)) = :pred_date
+ORDER BY date
+""")
+
+# Supply/demand curves of the reference day (for the merit-order price)
+SUPPLY_DEMAND_QUERY = text("""
+SELECT date, TO_CHAR(date, 'HH24:MI') AS hour, price, supply, demand
+FROM epias.supply_demand
+WHERE DATE(date) = :gen_date
+ORDER BY date, price
+""")
+
+# Open outages, the earliest-ending message per unit
+OUTAGES_QUERY = text("""
+SELECT
+    "uevcbName",
+    "caseStartDate",
+    "caseEndDate",
+    "operatorPower",
+    "capacityAtCaseTime",
+    ROUND("operatorPower" - "capacityAtCaseTime") AS "failureAmount"
+FROM (
+    SELECT *,
+           ROW_NUMBER() OVER (
+               PARTITION BY "uevcbName"
+               ORDER BY "caseEndDate" ASC
+           ) as row_num
+    FROM epias.market_messages
+    WHERE "caseEndDate" >= (CURRENT_TIMESTAMP + INTERVAL '3' HOUR)
+) t
+WHERE t.row_num = 1
+ORDER BY "failureAmount" DESC
+""")
+
+_lock = threading.Lock()
+_cache = OrderedDict()      # key -> (stored_at, value)
+
+
+def _cached(key, build, keep=None):
+    """``build()`` memoized under ``key`` for MERIT_ORDER_CACHE_SECONDS (LRU of CACHE_SIZE).
+
+    Values ``keep`` rejects are returned but not stored, so the next call retries.
+    """
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(key)
+        if hit and now - hit[0] < MERIT_ORDER_CACHE_SECONDS:
+            _cache.move_to_end(key)
+            return hit[1]
+    value = build()
+    if keep is not None and not keep(value):
+        return value
+    with _lock:
+        _cache[key] = (now, value)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+
+def load_prediction(engine, pred_date):
+    """The prediction day's hourly forecasts (date, day, hour, mcp_pred, demand, wind, solar, river).
+
+    Read from meteologica_hourly while it is fresh, otherwise by joining the
+    series tables on ``engine``.
+    """
+    start = pd.Timestamp(pred_date).to_pydatetime()
+    hourly = read_hourly(['price', 'demand', 'wind', 'licensed_solar', 'unlicensed_solar', 'runofriver_hydro'],
+                         start, start + timedelta(days=1))
+    if hourly is None:
+        with engine.connect() as conn:
+            pred_df = pd.read_sql(PRED_QUERY, con=conn, params={"pred_date": pred_date})
+    else:
+        pred_df = pd.DataFrame({
+            'date': hourly['date'],
+            'day': hourly['date'].dt.date,
+            'hour': hourly['date'].dt.strftime('%H:%M'),
+            'mcp_pred': hourly['price'],
+            'demand': hourly['demand'],
+            'wind': hourly['wind'],
+            'solar': hourly['licensed_solar'] + hourly['unlicensed_solar'],
+            'river': hourly['runofriver_hydro'],
+        })
+    pred_df['mcp_pred'] = pred_df['mcp_pred'].round(2)
+    return pred_df
+
+
+def load_forecast_reference(engine, gen_date):
+    """The reference day's historical forecasts with the Meteologica price forecast as ``mcp_ref``.
+
+    The price comes from meteologica_hourly while it is fresh, otherwise from
+    joining meteologica.price on its text stamp.
+    """
+    start = pd.Timestamp(gen_date).to_pydatetime()
+    prices = read_hourly(['price'], start, start + timedelta(days=1))
+    with engine.connect() as conn:
+        if prices is None:
+            return pd.read_sql(FORECAST_REF_QUERY, con=conn, params={"gen_date": gen_date})
+        ref_df = pd.read_sql(HISTORICAL_FORECAST_QUERY, con=conn, params={"gen_date": gen_date})
+    ref_df['date'] = pd.to_datetime(ref_df['date'])
+    ref_df = ref_df.merge(prices.rename(columns={'price': 'mcp_ref'}), on='date')
+    return ref_df[['date', 'day', 'hour', 'mcp_ref', 'demand', 'wind', 'solar', 'river']]
+
+
+class MeritOrderCurves:
+    """One day's supply/demand curves, grouped once into price-sorted arrays per hour.
+
+    The merit-order price of an hour is read off its curve at the trade
+    capacity (the point closest to zero) minus that hour's capacity delta:
+    the cheapest point at or below the shifted capacity, or the most
+    expensive point when the shift falls below the whole curve.  Hour ``i``
+    (in the order the hours first appear) pairs with the ``i``-th delta.
+    """
+
+    def __init__(self, supply_demand_df):
+        curves = supply_demand_df.dropna(subset=['price', 'capacity(Δ)'])
+        hours, keys, prices, starts, lasts, trades, floors = [], [], [], [], [], [], []
+        offset = 0
+        for row, (hour, group) in enumerate(curves.groupby('hour', sort=False)):
+            group = group.sort_values('price', kind='stable')
+            capacity = group['capacity(Δ)'].to_numpy(dtype=float)
+            hours.append(hour)
+            prices.append(group['price'].to_numpy(dtype=float))
+            # The first point at or below a capacity is the first one where the running
+            # minimum is, and the negated running minimum is sorted.  numpy orders complex
+            # numbers by real then imaginary part, so (hour, key) pairs of every hour
+            # live in one sorted array and are searched in a single call.
+            keys.append(row + 1j * -np.minimum.accumulate(capacity))
+            starts.append(offset)
+            lasts.append(offset + len(capacity) - 1)
+            trades.append(capacity[np.argmin(np.abs(capacity))])
+            floors.append(capacity.min())
+            offset += len(capacity)
+
+        self.hours = hours
+        self._keys = np.concatenate(keys) if keys else np.array([], dtype=complex)
+        self._prices = np.concatenate(prices) if prices else np.array([], dtype=float)
+        self._starts = np.array(starts, dtype=int)
+        self._lasts = np.array(lasts, dtype=int)
+        self._trades = np.array(trades, dtype=float)
+        self._floors = np.array(floors, dtype=float)
+
+    def curve(self, hour):
+        """``(prices, capacities)`` of one hour in price order."""
+        row = self.hours.index(hour)
+        start, stop = self._starts[row], self._lasts[row] + 1
+        return self._prices[start:stop], -self._keys[start:stop].imag
+
+    def price_matrix(self, capacity_deltas):
+        """Prices for a scenarios x hours array of capacity deltas.
+
+        Deltas past the last hour are ignored and a missing delta (NaN) gives
+        a NaN price.
+        """
+        deltas = np.atleast_2d(np.asarray(capacity_deltas, dtype=float))[:, :len(self.hours)]
+        hours = deltas.shape[1]
+        targets = self._trades[:hours] - deltas
+        missing = np.isnan(targets)
+        targets = np.where(missing, 0.0, targets)
+
+        rows = np.broadcast_to(np.arange(hours), targets.shape)
+        found = np.searchsorted(self._keys, rows + 1j * -targets, side='left')
+        positions = np.where(targets < self._floors[:hours], self._lasts[:hours], found)
+        return np.where(missing, np.nan, self._prices[positions])
+
+    def prices(self, capacity_deltas):
+        """Prices for one list of capacity deltas, one per hour."""
+        return self.price_matrix([capacity_deltas])[0]
+
+
+def scenario_error(scenario):
+    """Why ``scenario`` (one /merit-order-scenarios entry) is malformed, None when it is fine."""
+    plants = scenario.get('remove_plants') or []
+    if not isinstance(plants, str) and not (
+            isinstance(plants, list) and all(isinstance(plant, str) for plant in plants)):
+        return 'remove_plants must be a plant name or a list of plant names'
+    overrides = scenario.get('capacity_deltas') or {}
+    if not isinstance(overrides, dict):
+        return 'capacity_deltas must map hours to numbers'
+    for value in overrides.values():
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            return 'capacity_deltas must map hours to numbers'
+        try:
+            float(value)
+        except ValueError:
+            return 'capacity_deltas must map hours to numbers'
+    return None
+
+
+def evaluate_scenarios(diff, curves, scenarios, aic=None):
+    """Capacity deltas and merit-order prices of many scenarios against one curve set.
+
+    Every scenario starts from the base ``capacity_delta`` of ``diff``; its
+    ``capacity_deltas`` (hour -> delta) replace the base delta of those hours
+    and the today_aic row of every plant in ``remove_plants`` is subtracted
+    from the hours ``aic`` has, as /merit-order-power-plant-results does for
+    one plant.  Returns a dict of ``hours``, ``base`` prices, scenarios x hours
+    ``deltas`` and ``prices`` arrays, and the ``unknown_plants`` per scenario.
+    """
+    hours = diff['hour'].tolist()[:len(curves.hours)]
+    base = diff['capacity_delta'].to_numpy(dtype=float)[:len(hours)]
+    aic = aic.reindex(columns=hours).fillna(0) if aic is not None and not aic.empty else None
+
+    deltas = np.tile(base, (len(scenarios), 1))
+    unknown_plants = []
+    for row, scenario in enumerate(scenarios):
+        overrides = scenario.get('capacity_deltas') or {}
+        for column, hour in enumerate(hours):
+            if hour in overrides:
+                deltas[row, column] = float(overrides[hour])
+        plants = scenario.get('remove_plants') or []
+        plants = [plants] if isinstance(plants, str) else plants
+        known = [plant for plant in plants if aic is not None and plant in aic.index]
+        unknown_plants.append([plant for plant in plants if plant not in known])
+        if known:
+            deltas[row] -= aic.loc[known].to_numpy(dtype=float).sum(axis=0)
+
+    prices = curves.price_matrix(np.vstack([base, deltas]))
+    return {'hours': hours, 'base': prices[0], 'deltas': deltas, 'prices': prices[1:], 'unknown_plants': unknown_plants}
+
+
+def _load_comparison(engine, gen_date, pred_date):
+    with engine.connect() as conn:
+        ref_df = pd.read_sql(REF_QUERY, con=conn, params={"gen_date": gen_date})
+        supply_demand_df = pd.read_sql(SUPPLY_DEMAND_QUERY, con=conn, params={"gen_date": gen_date})
+    pred_df = load_prediction(engine, pred_date)
+    pred_df['day'] = pd.to_datetime(pred_df['day'])
+
+    df_diff = pd.merge(ref_df, pred_df, on='hour', suffixes=('_ref', '_pred'))
+    for col in DELTA_COLUMNS:
+        df_diff[f'{col}_delta'] = df_diff[f'{col}_pred'] - df_diff[f'{col}_ref']
+    df_diff['capacity_delta'] = (df_diff['demand_delta']
+                                 - df_diff['river_delta'] - df_diff['wind_delta']
+                                 - df_diff['solar_delta'])
+
+    if not supply_demand_df.empty:
+        supply_demand_df['capacity(Δ)'] = supply_demand_df['demand'] + supply_demand_df['supply']
+        curves = MeritOrderCurves(supply_demand_df)
+    else:
+        curves = None
+    return {'ref': ref_df, 'pred': pred_df, 'diff': df_diff, 'supply_demand': supply_demand_df, 'curves': curves}
+
+
+def merit_order_comparison(engine, gen_date, pred_date):
+    """Reference vs prediction frames for a date pair.
+
+    Returns a dict of ``ref`` and ``pred`` (the raw hourly forecasts), ``diff``
+    (merged on hour with ``<col>_delta`` and ``capacity_delta`` columns) and
+    ``supply_demand`` (the reference day's curves with ``capacity(Δ)``), plus
+    ``curves``, those curves as a MeritOrderCurves (None without curves).  The
+    frames are shared between requests; callers must copy before modifying.
+    """
+    return _cached(('comparison', gen_date, pred_date),
+                   lambda: _load_comparison(engine, gen_date, pred_date))
+
+
+def current_outages(engine):
+    """Open outages from epias.market_messages, largest first."""
+    def load():
+        with engine.connect() as conn:
+            return pd.read_sql(OUTAGES_QUERY, con=conn)
+    return _cached(('outages',), load)
+
+
+def _fetch_aic(uevcb, tgt_token, day_start):
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504])
+    items = []
+    failures = 0
+    with Session() as session:
+        session.mount('https://', HTTPAdapter(max_retries=retries))
+        for _, row in uevcb.iterrows():
+            try:
+                response = session.post(
+                    AIC_URL,
+                    json={
+                        "startDate": day_start.isoformat(),
+                        "endDate": day_start.isoformat(),
+                        "region": "TR1",
+                        "organizationId": int(row['organizationId']),
+                        "uevcbId": int(row['id'])
+                    },
+                    headers={
+                        "Accept-Language": "en",
+                        "Accept": "application/json",
+                        "Content-Type": "application/json",
+                        "TGT": tgt_token
+                    },
+                    timeout=15
+                )
+                if response.status_code == 200:
+                    response_items = response.json().get("items", [])
+                    for item in response_items:
+                        item["uevcbId"] = int(row['id'])
+                    items.extend(response_items)
+                else:
+                    failures += 1
+            except Exception as e:
+                logger.warning("AIC fetch error for %s: %s", row['name'], e)
+                failures += 1
+
+    if not items:
+        return pd.DataFrame(), failures
+    eak_df = pd.DataFrame.from_records(items)
+    eak_df = eak_df[['date', 'uevcbId', 'toplam']].copy()
+    eak_df = eak_df.merge(uevcb[["id", "name"]], left_on="uevcbId", right_on="id", how="left").drop(columns=['id', 'uevcbId'])
+    eak_df['date'] = pd.to_datetime(eak_df['date'])
+    eak_df['hour'] = eak_df['date'].dt.strftime('%H:%M')
+    return eak_df.pivot(index="name", columns="hour", values="toplam").fillna(0), failures
+
+
+def today_aic(uevcb_path, get_token):
+    """Today's AIC of the plants listed in ``uevcb_path`` as a plant x hour pivot.
+
+    Returns ``(pivot, fetch_failures)``; the pivot is empty when no plant
+    answered.  ``get_token`` is only called when the cached pivot has expired.
+    """
+    today_start = datetime.now(pytz.timezone('Europe/Istanbul')).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def load():
+        uevcb = pd.read_excel(uevcb_path, sheet_name='Sheet2')
+        return _fetch_aic(uevcb, get_token(), today_start)
+    return _cached(('aic', uevcb_path, today_start.date()), load, keep=lambda value: not value[0].empty)
@@ -0,0 +1,335 @@
+"""
+Meteologica xTraders API: shared client, monthly historical ZIPs for the solar series
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import Retry
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://api-markets.meteologica.com/api/v1"
+
+# Content IDs of the series stored locally
+UNLICENSED_SOLAR_CONTENT = 1430
+LICENSED_SOLAR_CONTENT = 1429
+
+# Downloaded month archives, <dir>/<content_id>/<YYYY-MM>.zip plus a .json validator file
+CACHE_DIR = os.getenv('METEOLOGICA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'meteologica_cache'))
+
+# A login is reused this long before a fresh one is taken; a 401/403 also forces one
+TOKEN_TTL_SECONDS = 50 * 60
+# Month archives downloaded at once
+DEFAULT_FETCH_WORKERS = 4
+
+
+def get_token(timeout=30, session=None):
+    """Log in with XTRADERS_USERNAME / XTRADERS_PASSWORD and return the API token."""
+    username = os.getenv('XTRADERS_USERNAME')
+    password = os.getenv('XTRADERS_PASSWORD')
+    if not username or not password:
+        raise ValueError("XTRADERS_USERNAME and XTRADERS_PASSWORD must be set in environment variables")
+
+    http = session or requests
+    response = http.post(f"{API_URL}/login", json={"user": username, "password": password}, timeout=timeout)
+    response.raise_for_status()
+    token = response.json().get("token")
+    if not token:
+        raise ValueError("Meteologica login returned no token")
+    return token
+
+
+def _cache_paths(content_id, year, month, cache_dir=None):
+    folder = os.path.join(cache_dir or CACHE_DIR, str(content_id))
+    os.makedirs(folder, exist_ok=True)
+    stem = os.path.join(folder, f"{year}-{month:02d}")
+    return stem + '.zip', stem + '.json'
+
+
+def archive_path(content_id, year, month, cache_dir=None):
+    """Path of the cached archive for a month (it exists once fetch_month_cached has run)."""
+    return _cache_paths(content_id, year, month, cache_dir)[0]
+
+
+def _validator(headers):
+    return {
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+        'size': int(headers['Content-Length']) if headers.get('Content-Length', '').isdigit() else None,
+    }
+
+
+def _same_validator(cached, fresh):
+    """True when the server's validator proves the archive did not change."""
+    if cached.get('etag') and fresh.get('etag'):
+        return cached['etag'] == fresh['etag']
+    if cached.get('last_modified') and fresh.get('last_modified'):
+        return cached['last_modified'] == fresh['last_modified'] and cached.get('size') in (None, fresh.get('size'))
+    return False
+
+
+def save_cache_meta(content_id, year, month, meta, cache_dir=None):
+    """Record ``meta`` (from fetch_month_cached) as the validator of the cached month archive."""
+    if not meta:
+        return
+    meta_path = _cache_paths(content_id, year, month, cache_dir)[1]
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(meta_path + '.tmp', meta_path)
+
+
+def fetch_month_cached(content_id, year, month, token, session=None, cache_dir=None, timeout=60):
+    """Return ``(content, changed, meta)`` for a month archive, reusing the on-disk copy.
+
+    A HEAD request (or a conditional GET answered with 304) whose ETag,
+    Last-Modified or size matches the cached validator means the archive has not
+    changed, so nothing is downloaded and ``changed`` is False.  Servers that
+    send no validators fall back to comparing the downloaded bytes' hash.
+
+    A changed archive is written to the cache but its validator is only
+    returned as ``meta``: the caller passes it to save_cache_meta once the
+    month's rows are stored, so a failed write leaves the month changed for the
+    next run.  ``meta`` is None when there is nothing to record.
+    """
+    zip_path, meta_path = _cache_paths(content_id, year, month, cache_dir)
+    cached = {}
+    if os.path.exists(zip_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            cached = json.load(f)
+
+    http = session or requests
+    url = f"{API_URL}/contents/{content_id}/historical_data/{year}/{month}"
+    if cached:
+        try:
+            head = http.head(url, params={"token": token}, timeout=timeout)
+            if head.status_code == 200 and _same_validator(cached, _validator(head.headers)):
+                with open(zip_path, 'rb') as f:
+                    return f.read(), False, None
+        except requests.RequestException:
+            pass
+
+    headers = {}
+    if cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+    response = http.get(url, params={"token": token}, headers=headers, timeout=timeout)
+    if response.status_code == 304 and cached:
+        with open(zip_path, 'rb') as f:
+            return f.read(), False, None
+    response.raise_for_status()
+    if 'zip' not in response.headers.get('content-type', '') and not response.content.startswith(b'PK'):
+        logger.warning("Meteologica %s %d-%02d: response is not a ZIP", content_id, year, month)
+        return None, False, None
+
+    content = response.content
+    meta = _validator(response.headers)
+    meta['size'] = len(content)
+    meta['sha256'] = hashlib.sha256(content).hexdigest()
+    changed = meta['sha256'] != cached.get('sha256')
+    if not changed:
+        # Same bytes as the stored month, only the validator moved
+        if meta != cached:
+            save_cache_meta(content_id, year, month, meta, cache_dir)
+        return content, False, None
+    with open(zip_path + '.tmp', 'wb') as f:
+        f.write(content)
+    os.replace(zip_path + '.tmp', zip_path)
+    return content, True, meta
+
+
+class MeteologicaClient:
+    """Login reuse and a pooled, retrying session for the xTraders API; safe across threads."""
+
+    def __init__(self, workers=DEFAULT_FETCH_WORKERS, token_ttl=TOKEN_TTL_SECONDS):
+        self.workers = workers
+        self.token_ttl = token_ttl
+        self.session = requests.Session()
+        retries = Retry(
+            total=4,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['HEAD', 'GET'],
+        )
+        self.session.mount('https://', HTTPAdapter(max_retries=retries, pool_maxsize=workers * 2))
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires = 0.0
+
+    def token(self):
+        """The cached token, logging in again once it is older than ``token_ttl``."""
+        with self._lock:
+            if not self._token or time.monotonic() >= self._expires:
+                self._token = get_token(session=self.session)
+                self._expires = time.monotonic() + self.token_ttl
+            return self._token
+
+    def _invalidate(self, token):
+        # Only the first thread to see a rejected token forces the next login
+        with self._lock:
+            if self._token == token:
+                self._token = None
+
+    def fetch_month(self, content_id, year, month, cache_dir=None):
+        """fetch_month_cached with the shared token, logging in again once if it was rejected."""
+        token = self.token()
+        try:
+            return fetch_month_cached(content_id, year, month, token, session=self.session, cache_dir=cache_dir)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code not in (401, 403):
+                raise
+            self._invalidate(token)
+            return fetch_month_cached(content_id, year, month, self.token(), session=self.session, cache_dir=cache_dir)
+
+    def fetch_months(self, months, workers=None, cache_dir=None):
+        """Fetch ``(content_id, year, month)`` archives concurrently.
+
+        Yields ``(key, content, changed, meta, error)`` in completion order so
+        callers can parse one month while the others download; a failed month
+        carries its exception in ``error`` instead of stopping the rest.  ``meta``
+        goes to save_cache_meta once the month is stored.
+        """
+        months = list(months)
+        if not months:
+            return
+        workers = max(1, min(workers or self.workers, len(months)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self.fetch_month, *key, cache_dir=cache_dir): key for key in months}
+            for future in as_completed(futures):
+                key = futures.pop(future)
+                try:
+                    content, changed, meta = future.result()
+                except Exception as e:
+                    logger.warning("Meteologica %s %d-%02d fetch failed: %s", *key, e)
+                    yield key, None, False, None, e
+                    continue
+                yield key, content, changed, meta, None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide MeteologicaClient, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MeteologicaClient()
+        return _client
+
+
+def _file_timestamp(name):
+    """``1430_202508141513.json`` -> Timestamp('2025-08-14 15:13'), None if it does not match."""
+    stem = name.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    parts = stem.split('_')
+    if len(parts) < 2 or len(parts[1]) < 12:
+        return None
+    return pd.to_datetime(parts[1][:12], format='%Y%m%d%H%M', errors='coerce')
+
+
+def _forecast_value(payload):
+    for entry in payload.get('data') or []:
+        if entry.get('forecast') not in (None, ''):
+            return float(entry['forecast'])
+    return None
+
+
+def _open_archive(source):
+    """ZipFile over ``source`` bytes, or over the file at path ``source`` (members are read on demand)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return zipfile.ZipFile(io.BytesIO(source))
+    return zipfile.ZipFile(source)
+
+
+def _member_value(archive, name):
+    raw = archive.read(name)
+    try:
+        return _forecast_value(json.loads(raw))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def parse_hourly_zip(source, value_column, since=None):
+    """Turn a monthly archive into an hourly frame of datetime, ``value_column`` and update_id.
+
+    ``source`` is the archive's bytes or the path of a cached archive (members
+    are then read from disk, not loaded up front).  Each JSON member is one issue
+    stamped in its filename (``update_id`` is that YYYYMMDDHHMM stamp); like the
+    update routes, the issue closest to the top of each hour is kept, falling back to
+    the next issue of that hour when a member has no forecast.  With ``since`` (an
+    update_id), hours before that issue's hour are skipped without being read.
+    Members are decompressed in stamp order only until each hour has a value.
+    """
+    empty = pd.DataFrame(columns=['datetime', value_column, 'update_id'])
+    if not source:
+        return empty
+
+    with _open_archive(source) as archive:
+        names = pd.Series([n for n in archive.namelist() if n.endswith('.json')], dtype=object)
+        stamps = pd.to_datetime(names.map(_file_timestamp), errors='coerce')
+        files = pd.DataFrame({'name': names, 'stamp': stamps}).dropna(subset=['stamp'])
+        files['datetime'] = files['stamp'].dt.floor('h')
+        if since:
+            files = files[files['datetime'] >= pd.to_datetime(since, format='%Y%m%d%H%M').floor('h')]
+        if files.empty:
+            return empty
+        files = files.sort_values('stamp', kind='stable')
+
+        rows = []
+        for hour, issues in files.groupby('datetime', sort=True):
+            for name, stamp in zip(issues['name'], issues['stamp']):
+                value = _member_value(archive, name)
+                if value is not None and not pd.isna(value):
+                    rows.append((hour, value, stamp.strftime('%Y%m%d%H%M')))
+                    break
+
+    if not rows:
+        return empty
+    return pd.DataFrame(rows, columns=['datetime', value_column, 'update_id'])
+
+
+def fetch_and_parse_months(client, months, value_column, workers=None, processes=None):
+    """Download month archives on ``client`` and parse each one on a process pool as it arrives.
+
+    For backfills over many months: a single archive holds at most one chosen
+    member per hour, too few to be worth splitting, so the months themselves
+    are spread over ``processes`` workers (parsed inline when it is 1 or less).
+    Yields ``(key, frame, meta, error)``; ``meta`` goes to save_cache_meta once
+    the frame is stored.
+    """
+    if not processes or processes <= 1:
+        for key, content, _changed, meta, error in client.fetch_months(months, workers=workers):
+            if error is not None:
+                yield key, None, None, error
+                continue
+            try:
+                yield key, parse_hourly_zip(archive_path(*key) if content else None, value_column), meta, None
+            except Exception as e:
+                yield key, None, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        parsing = {}
+        for key, content, _changed, meta, error in client.fetch_months(months, workers=workers):
+            if error is not None:
+                yield key, None, None, error
+                continue
+            parsing[pool.submit(parse_hourly_zip, archive_path(*key) if content else None, value_column)] = (key, meta)
+        for future in as_completed(parsing):
+            key, meta = parsing[future]
+            try:
+                yield key, future.result(), meta, None
+            except Exception as e:
+                yield key, None, None, e
@@ -0,0 +1,122 @@
+"""
+Wide hourly Meteologica forecast table, rebuilt from the local mirror after every copy
+"""
+import logging
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+from ..database.config import db
+from .market_mirror import MIRROR_MAX_AGE_MINUTES, METEOLOGICA_STAMP, mirror_is_fresh, watermark_name
+from .watermarks import get_watermark, record_run
+
+logger = logging.getLogger(__name__)
+
+METEOLOGICA_HOURLY_WATERMARK = 'meteologica_hourly'
+
+# meteologica_hourly column -> (mirrored Meteologica table, its value column)
+SERIES = {
+    'demand': ('demand', 'demand_forecast'),
+    'price': ('price', 'price_forecast'),
+    'wind': ('wind', 'wind_forecast'),
+    'licensed_solar': ('licensed_solar', 'licensed_forecast'),
+    'unlicensed_solar': ('unlicensed_solar', 'unlicensed_forecast'),
+    'runofriver_hydro': ('runofriver_hydro', 'runofriver_forecast'),
+    'dam_hydro': ('dam_hydro', 'conventional_forecast'),
+}
+SOURCE_TABLES = [('meteologica', table) for table, _ in SERIES.values()]
+
+
+def _refresh_sql(since):
+    # Every series is stamped once into a timestamp (one row per hour), then joined on it;
+    # demand drives the join because every reader needs it.  The series tables have no
+    # unique key and carry no issue time, so a stamp stored twice keeps its non-null,
+    # then largest, value: the same row on every rebuild whatever order the mirror copied them in
+    where = "WHERE ts >= :since" if since is not None else ""
+    ctes = ",\n".join(
+        f"""{column} AS (
+    SELECT DISTINCT ON (ts) ts, value FROM (
+        SELECT CAST("{METEOLOGICA_STAMP}" AS timestamp) AS ts, {value} AS value FROM meteologica.{table}
+    ) s {where} ORDER BY ts, value IS NULL, value DESC
+)""" for column, (table, value) in SERIES.items())
+    joins = "\n".join(f"LEFT JOIN {column} ON {column}.ts = demand.ts" for column in SERIES if column != 'demand')
+    return f"""WITH {ctes}
+INSERT INTO meteologica_hourly (date, {', '.join(SERIES)}, updated_at)
+SELECT demand.ts, {', '.join(f'{column}.value' for column in SERIES)}, :updated_at
+FROM demand
+{joins}"""
+
+
+def refresh_meteologica_hourly(since=None):
+    """Rebuild the hours from ``since`` on (every hour when None) from the mirrored series tables."""
+    with db.engine.begin() as conn:
+        if since is None:
+            conn.execute(text("DELETE FROM meteologica_hourly"))
+        else:
+            conn.execute(text("DELETE FROM meteologica_hourly WHERE date >= :since"), {'since': since})
+        params = {'updated_at': datetime.now()}
+        if since is not None:
+            params['since'] = since
+        rows = conn.execute(text(_refresh_sql(since)), params).rowcount
+        newest = conn.execute(text("SELECT MAX(date) FROM meteologica_hourly")).scalar()
+    return {'rows': rows, 'since': since.isoformat() if since else None, 'newest': newest}
+
+
+def sync_meteologica_hourly(mirror_results):
+    """Refresh after a mirror run from the earliest hour any series was recopied from.
+
+    ``mirror_results`` is what sync_market_mirror returned.  A series copied
+    whole, or a previous refresh that failed, rebuilds every hour.
+    """
+    windows = [mirror_results[name] for name in map(watermark_name, SOURCE_TABLES) if name in mirror_results]
+    windows = [result for result in windows if 'error' not in result]
+    if not windows:
+        return None
+
+    state = get_watermark(METEOLOGICA_HOURLY_WATERMARK)
+    since = None
+    if state and state.last_status == 'ok' and all(result.get('since') for result in windows):
+        since = min(datetime.fromisoformat(result['since']) for result in windows)
+
+    try:
+        result = refresh_meteologica_hourly(since)
+    except Exception as e:
+        logger.error("Refreshing meteologica_hourly failed: %s", e)
+        record_run(METEOLOGICA_HOURLY_WATERMARK, status='error', result={'error': str(e)})
+        raise
+    newest = result.pop('newest')
+    record_run(METEOLOGICA_HOURLY_WATERMARK, watermark=newest, result=result)
+    return result
+
+
+def meteologica_hourly_is_fresh(since=None):
+    """True when the mirrored series reach back to ``since`` and the table was rebuilt after their last copy."""
+    if not mirror_is_fresh(SOURCE_TABLES, since):
+        return False
+    state = get_watermark(METEOLOGICA_HOURLY_WATERMARK)
+    return (state is not None and state.last_status == 'ok' and state.last_run_at is not None
+            and state.last_run_at >= datetime.now() - timedelta(minutes=MIRROR_MAX_AGE_MINUTES))
+
+
+def read_hourly(columns, start, end=None):
+    """``date`` plus ``columns`` of the hours in [start, end) that have every one of them.
+
+    None while the table is not fresh, so the caller joins the series tables instead.
+    """
+    try:
+        if not meteologica_hourly_is_fresh(since=start):
+            return None
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("meteologica_hourly state unavailable: %s", e)
+        return None
+    conditions = ["date >= :start"] + ([] if end is None else ["date < :end"])
+    conditions += [f"{column} IS NOT NULL" for column in columns]
+    query = text(f"SELECT date, {', '.join(columns)} FROM meteologica_hourly"
+                 f" WHERE {' AND '.join(conditions)} ORDER BY date")
+    params = {'start': start} if end is None else {'start': start, 'end': end}
+    with db.engine.connect() as conn:
+        frame = pd.read_sql(query, con=conn, params=params)
+    frame['date'] = pd.to_datetime(frame['date'])
+    return frame
@@ -0,0 +1,248 @@
+"""
+Incremental 7-day rolling averages backing /get-rolling-data
+"""
+import logging
+from collections import deque
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from dateutil import tz
+from sqlalchemy import func
+
+from ..database.config import db
+from ..models.combined_solar import CombinedSolarHourly
+from ..models.production import ProductionData
+from ..models.rolling import RollingDailyState
+from .combined_solar import ensure_combined_solar
+
+logger = logging.getLogger(__name__)
+
+WINDOW_DAYS = 7
+# Days before the newest stored day that every refresh recomputes, so EPIAS
+# revisions and solar days that complete late are picked up
+LOOKBACK_DAYS = 7
+# Solar series are averaged over daytime hours only (07:00-18:00)
+SOLAR_HOURS = range(7, 19)
+
+PRODUCTION_COLUMNS = [
+    c.name for c in ProductionData.__table__.columns
+    if c.name not in ('id', 'datetime', 'created_at')
+]
+PRODUCTION_SERIES = PRODUCTION_COLUMNS + ['renewablestotal']
+SOLAR_SERIES = ['sun', 'unlicensed_solar', 'licensed_solar', 'solar_combined']
+RATIO_SERIES = 'renewablesratio'
+
+
+def _chart_index(values):
+    """Stored naive datetimes -> naive Istanbul chart time.
+
+    Same convention as precalculate_historical_averages.py (``astimezone(pytz.UTC)``
+    then Europe/Istanbul), so current-year points line up with the historical years.
+    """
+    index = pd.DatetimeIndex(pd.to_datetime(values))
+    return (
+        index.tz_localize(tz.tzlocal(), ambiguous='NaT', nonexistent='shift_forward')
+        .tz_convert('Europe/Istanbul')
+        .tz_localize(None)
+    )
+
+
+def _load_series(columns, start, end):
+    """Hourly frame (chart-time index) of ``columns`` stored in [start, end)."""
+    model = columns[0].class_
+    rows = db.session.query(model.datetime, *columns).filter(
+        model.datetime >= start, model.datetime < end
+    ).all()
+    frame = pd.DataFrame(rows, columns=['datetime'] + [c.key for c in columns])
+    if frame.empty:
+        return frame.drop(columns='datetime')
+
+    frame.index = _chart_index(frame.pop('datetime'))
+    frame = frame[frame.index.notna()]
+    return frame.groupby(frame.index.floor('h')).mean()
+
+
+def _complete_days(frame, today):
+    if frame.empty:
+        return set()
+    counts = frame.groupby(frame.index.normalize()).size()
+    return {d.date() for d, c in counts.items() if c == 24 and d.date() != today}
+
+
+def compute_daily_averages(start_day, end_day, today=None):
+    """Daily averages of every rolling series for complete days in [start_day, end_day].
+
+    Returns ``{series: [(day, avg, hours), ...]}`` ordered by day.  Production series
+    need 24 production hours; solar series and the renewables ratio need 24 hours
+    flagged present for each solar source that has data (falling back to production
+    completeness).  Solar comes from combined_solar_hourly.
+    """
+    today = today or datetime.now().date()
+    lo = datetime.combine(start_day - timedelta(days=1), datetime.min.time())
+    hi = datetime.combine(end_day + timedelta(days=2), datetime.min.time())
+
+    production = _load_series([getattr(ProductionData, c) for c in PRODUCTION_COLUMNS], lo, hi)
+    if production.empty:
+        return {}
+    ensure_combined_solar(lo, hi)
+    solar = _load_series([
+        CombinedSolarHourly.unlicensed_solar, CombinedSolarHourly.licensed_solar,
+        CombinedSolarHourly.solar_combined, CombinedSolarHourly.has_unlicensed, CombinedSolarHourly.has_licensed,
+    ], lo, hi)
+
+    prod_complete = _complete_days(production, today)
+    solar_sources = []
+    if not solar.empty:
+        for flag in ('has_unlicensed', 'has_licensed'):
+            present = solar.pop(flag) > 0
+            if present.any():
+                solar_sources.append(_complete_days(solar[present], today))
+    solar_complete = set.intersection(*solar_sources) if solar_sources else set(prod_complete)
+
+    hourly = production.join(solar, how='outer') if not solar.empty else production
+    for column in ('unlicensed_solar', 'licensed_solar', 'solar_combined'):
+        hourly[column] = hourly[column].fillna(0) if column in hourly else 0.0
+    hourly['renewablestotal'] = hourly['geothermal'] + hourly['biomass'] + hourly['wind'] + hourly['solar_combined']
+    hourly[RATIO_SERIES] = (hourly['renewablestotal'] / hourly['total']).replace([np.inf, -np.inf], np.nan)
+
+    day_key = hourly.index.normalize()
+    daytime = hourly[hourly.index.hour.isin(SOLAR_HOURS)]
+    daytime_key = daytime.index.normalize()
+
+    daily_means = hourly.groupby(day_key).mean()
+    daily_hours = hourly.groupby(day_key).count()
+    solar_means = daytime[SOLAR_SERIES].groupby(daytime_key).mean()
+    solar_hours = daytime[SOLAR_SERIES].groupby(daytime_key).count()
+
+    result = {}
+    for series in PRODUCTION_SERIES + SOLAR_SERIES + [RATIO_SERIES]:
+        if series in SOLAR_SERIES:
+            means, hours, complete = solar_means[series], solar_hours[series], solar_complete
+        elif series == RATIO_SERIES:
+            means, hours, complete = daily_means[series], daily_hours[series], solar_complete
+        else:
+            means, hours, complete = daily_means[series], daily_hours[series], prod_complete
+        result[series] = [
+            (d.date(), None if pd.isnull(avg) else float(avg), int(hours.get(d, 0)))
+            for d, avg in means.items()
+            if d.date() in complete and start_day <= d.date() <= end_day
+        ]
+    return result
+
+
+def _previous_averages(start_day):
+    """Last WINDOW_DAYS-1 daily averages per series before ``start_day`` in the same year."""
+    rows = db.session.query(
+        RollingDailyState.series, RollingDailyState.daily_avg
+    ).filter(
+        RollingDailyState.day >= max(date(start_day.year, 1, 1), start_day - timedelta(days=60)),
+        RollingDailyState.day < start_day
+    ).order_by(RollingDailyState.series, RollingDailyState.day).all()
+
+    previous = {}
+    for series, avg in rows:
+        previous.setdefault(series, deque(maxlen=WINDOW_DAYS - 1)).append(avg)
+    return previous
+
+
+def refresh_rolling_state(from_day=None, year=None):
+    """Extend the rolling state with newly complete days and return the rows written.
+
+    Only the tail is recomputed: the last LOOKBACK_DAYS before the newest stored day,
+    or from ``from_day`` when an ingest touched older hours.  ``year`` rebuilds a
+    whole year from 1 January (used by the backfill script).  Windows restart each
+    year, matching how the charts have always been computed.
+    """
+    today = datetime.now().date()
+    if year is not None:
+        start = date(year, 1, 1)
+        end = min(date(year, 12, 31), today - timedelta(days=1))
+    else:
+        latest = db.session.query(func.max(RollingDailyState.day)).scalar()
+        if latest is None:
+            start = date(today.year, 1, 1)
+        else:
+            start = max(latest - timedelta(days=LOOKBACK_DAYS), date(latest.year, 1, 1))
+        if from_day is not None:
+            start = max(min(start, from_day - timedelta(days=1)), date(today.year - 1, 1, 1))
+        end = today - timedelta(days=1)
+    if start > end:
+        return 0
+
+    daily = compute_daily_averages(start, end, today=today)
+    previous = _previous_averages(start)
+
+    records = []
+    now = datetime.now()
+    for series, entries in daily.items():
+        window = deque(previous.get(series, ()), maxlen=WINDOW_DAYS)
+        window_year = start.year
+        for day, avg, hours in entries:
+            if day.year != window_year:
+                window.clear()
+                window_year = day.year
+            window.append(avg)
+            values = [v for v in window if v is not None]
+            window_sum = float(sum(values)) if values else None
+            records.append({
+                'series': series,
+                'day': day,
+                'daily_avg': avg,
+                'hours': hours,
+                'window_sum': window_sum,
+                'window_count': len(values),
+                'rolling_avg': window_sum / len(values) if values else None,
+                'updated_at': now,
+            })
+
+    db.session.query(RollingDailyState).filter(
+        RollingDailyState.day >= start, RollingDailyState.day <= end
+    ).delete(synchronize_session=False)
+    if records:
+        db.session.execute(RollingDailyState.__table__.insert(), records)
+    db.session.commit()
+
+    logger.info("Rolling state refreshed for %s..%s: %d rows", start, end, len(records))
+    return len(records)
+
+
+def has_rolling_state(year):
+    return db.session.query(RollingDailyState.id).filter(
+        RollingDailyState.day >= date(year, 1, 1),
+        RollingDailyState.day <= date(year, 12, 31)
+    ).first() is not None
+
+
+def rolling_series_for_year(year):
+    """``{series: [rolling avg per complete day]}`` plus ``renewablesratio_monthly`` for ``year``."""
+    rows = db.session.query(
+        RollingDailyState.series,
+        RollingDailyState.day,
+        RollingDailyState.daily_avg,
+        RollingDailyState.hours,
+        RollingDailyState.rolling_avg
+    ).filter(
+        RollingDailyState.day >= date(year, 1, 1),
+        RollingDailyState.day <= date(year, 12, 31)
+    ).order_by(RollingDailyState.series, RollingDailyState.day).all()
+
+    result = {}
+    ratio_sum = [0.0] * 12
+    ratio_hours = [0] * 12
+    for series, day, daily_avg, hours, rolling_avg in rows:
+        if series == RATIO_SERIES:
+            if daily_avg is not None and hours:
+                ratio_sum[day.month - 1] += daily_avg * hours
+                ratio_hours[day.month - 1] += hours
+            continue
+        result.setdefault(series, []).append(
+            round(float(rolling_avg), 2) if rolling_avg is not None else None
+        )
+
+    if rows:
+        result['renewablesratio_monthly'] = [
+            round(ratio_sum[m] / ratio_hours[m], 4) if ratio_hours[m] else None
+            for m in range(12)
+        ]
+    return result
@@ -0,0 +1,126 @@
+"""
+Incremental sync of the Meteologica solar series into unlicensed/licensed_solar_data
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from ..database.config import db
+from ..models.licensed_solar import LicensedSolarData
+from ..models.unlicensed_solar import UnlicensedSolarData
+from . import meteologica
+from .combined_solar import refresh_combined_solar
+from .ingest import upsert_frame
+from .rolling import refresh_rolling_state
+from .watermarks import record_run
+
+logger = logging.getLogger(__name__)
+
+# series -> (model, Meteologica content id); the series name is also the value column
+SOLAR_SERIES = {
+    'unlicensed_solar': (UnlicensedSolarData, meteologica.UNLICENSED_SOLAR_CONTENT),
+    'licensed_solar': (LicensedSolarData, meteologica.LICENSED_SOLAR_CONTENT),
+}
+
+SOLAR_LOOKBACK_DAYS = 30
+
+# Watermark of the combined run queued from the update endpoints; each series also keeps its own
+SOLAR_WATERMARK = 'solar'
+
+
+def _months(start, end):
+    months = []
+    current = start.replace(day=1)
+    while current <= end:
+        months.append((current.year, current.month))
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def sync_solar(series=None, lookback_days=SOLAR_LOOKBACK_DAYS, now=None, force=False, client=None):
+    """Bring the solar series (default: all of them) up to date for the last ``lookback_days``.
+
+    Every series' month archives are fetched together through the shared
+    Meteologica client and parsed as they arrive.  Months whose validator shows
+    no change are skipped entirely; changed ones are parsed only from the hour of
+    the newest update_id already stored, so a routine run reads just the new
+    issues.  ``force`` re-parses every month in the window.
+    """
+    names = list(series or SOLAR_SERIES)
+    client = client or meteologica.get_client()
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    start = (now - timedelta(days=lookback_days)).replace(minute=0, second=0, microsecond=0)
+    by_content = {SOLAR_SERIES[name][1]: name for name in names}
+    since = {name: None if force else db.session.query(db.func.max(SOLAR_SERIES[name][0].update_id)).scalar()
+             for name in names}
+
+    frames = {name: [] for name in names}
+    skipped = {name: [] for name in names}
+    failures = {name: [] for name in names}
+    # Validators of the changed archives, recorded only after their rows are committed
+    fetched = {name: [] for name in names}
+    keys = [(SOLAR_SERIES[name][1], year, month) for name in names for year, month in _months(start, now)]
+    for (content_id, year, month), content, changed, meta, error in client.fetch_months(keys):
+        name = by_content[content_id]
+        if error is not None:
+            failures[name].append(f"{year}-{month:02d}: {error}")
+            continue
+        if not changed and since[name]:
+            skipped[name].append(f"{year}-{month:02d}")
+            continue
+        frame = meteologica.parse_hourly_zip(content, name, since=since[name])
+        frames[name].append(frame[(frame['datetime'] >= start) & (frame['datetime'] <= now)])
+        fetched[name].append((content_id, year, month, meta))
+
+    results, found = {}, {}
+    for name in names:
+        model = SOLAR_SERIES[name][0]
+        found[name] = (pd.concat(frames[name], ignore_index=True) if frames[name]
+                       else pd.DataFrame(columns=['datetime', name, 'update_id']))
+        stats = upsert_frame(model.__table__, found[name], [name, 'update_id'])
+        db.session.commit()
+        for content_id, year, month, meta in fetched[name]:
+            meteologica.save_cache_meta(content_id, year, month, meta)
+        results[name] = {
+            'inserted': stats['inserted'],
+            'revised': stats['revised'],
+            'parsed_hours': int(len(found[name])),
+            'skipped_months': sorted(skipped[name]),
+            'fetch_failures': sorted(failures[name]),
+        }
+
+    written = [found[name]['datetime'] for name in names if results[name]['inserted'] or results[name]['revised']]
+    if written:
+        first, last = min(w.min() for w in written), max(w.max() for w in written)
+        try:
+            refresh_combined_solar(first, last)
+            refresh_rolling_state(from_day=first.date())
+        except Exception as e:
+            db.session.rollback()
+            logger.warning("Combined solar / rolling state refresh failed after solar sync: %s", e)
+
+    newest = {}
+    for name in names:
+        stamp = found[name]['update_id'].max() if not found[name].empty else None
+        newest[name] = pd.to_datetime(stamp, format='%Y%m%d%H%M').to_pydatetime() if stamp else None
+        failed = failures[name] and not frames[name]
+        record_run(name, watermark=newest[name], status='error' if failed else 'ok',
+                   result=dict(results[name], start=start.strftime('%Y-%m-%d %H:%M'), end=now.strftime('%Y-%m-%d %H:%M')))
+        logger.info("%s sync: %d inserted, %d revised, %d months unchanged, %d failed", name,
+                    results[name]['inserted'], results[name]['revised'], len(skipped[name]), len(failures[name]))
+
+    result = {
+        'inserted': sum(r['inserted'] for r in results.values()),
+        'revised': sum(r['revised'] for r in results.values()),
+        'series': results,
+        'start': start.strftime('%Y-%m-%d %H:%M'),
+        'end': now.strftime('%Y-%m-%d %H:%M'),
+    }
+    if series is None:
+        # Data is complete up to the series that lags behind
+        stamps = [stamp for stamp in newest.values() if stamp]
+        failed = any(failures[name] and not frames[name] for name in names)
+        record_run(SOLAR_WATERMARK, watermark=min(stamps) if stamps else None,
+                   status='error' if failed else 'ok', result=result)
+    return result
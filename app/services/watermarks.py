@@ -0,0 +1,59 @@
+"""
+Stored watermarks for the background sync jobs
+"""
+import logging
+from datetime import datetime
+
+from ..database.config import db
+from ..models.sync_state import SyncWatermark
+
+logger = logging.getLogger(__name__)
+
+
+def get_watermark(name):
+    """Return the SyncWatermark row for ``name`` (None if the job never ran)."""
+    return SyncWatermark.query.filter_by(name=name).first()
+
+
+def record_run(name, watermark=None, status='ok', result=None):
+    """Store the outcome of a sync run; ``watermark`` only moves when given."""
+    row = get_watermark(name)
+    if row is None:
+        row = SyncWatermark(name=name)
+        db.session.add(row)
+    if watermark is not None:
+        row.watermark = watermark
+    row.last_run_at = datetime.now()
+    row.last_status = status
+    row.last_result = result or {}
+    row.updated_at = datetime.now()
+    db.session.commit()
+    return row
+
+
+def request_run(name, force=False):
+    """Ask the scheduler to run sync ``name`` on its next poll (a forced run when ``force``); returns the row."""
+    row = get_watermark(name)
+    if row is None:
+        row = SyncWatermark(name=name)
+        db.session.add(row)
+    row.requested_at = datetime.now()
+    if force:
+        row.force_requested = True
+    row.updated_at = datetime.now()
+    db.session.commit()
+    return row
+
+
+def pending_requests(names):
+    """{name: forced} of the names out of ``names`` with a run requested since their last run."""
+    return {row.name: bool(row.force_requested)
+            for row in SyncWatermark.query.filter(SyncWatermark.name.in_(names)).all() if row.pending}
+
+
+def clear_force_request(name):
+    """Drop the forced-run request of ``name`` once the scheduler picks it up."""
+    row = get_watermark(name)
+    if row is not None and row.force_requested:
+        row.force_requested = False
+        db.session.commit()
@@ -3,6 +3,8 @@ export const aic = {
     toggleLoading: null,
     displayMessage: null,
     toggleButtonLoading: null,
+    // Server thins longer ranges to this many hours before sending them
+    maxPoints: 2000,
 
     // Initialize with helper functions
     setup(helpers) {
@@ -31,7 +33,7 @@ export const aic = {
             console.log('Loading AIC data for range:', range);
             this.toggleButtonLoading(button, true);
 
-            const response = await fetch(`/get_aic_data?range=${range}`);
+            const response = await fetch(`/get_aic_data?range=${range}&max_points=${this.maxPoints}`);
             const result = await response.json();
             console.log('AIC data received:', result);
 
@@ -145,6 +145,158 @@ def send_daily_email_report(app):
         app.logger.error(f"Error in send_daily_email_report: {str(e)}")
         raise
 
+def _run_sync(app, name, sync):
+    """Run ``sync(tgt_token)`` and record a failure on watermark ``name``; needs an app context"""
+    from ..database.config import db
+    from ..functions import get_tgt_token
+    from ..services.watermarks import record_run
+
+    try:
+        tgt_token = get_tgt_token(app.config.get('USERNAME'), app.config.get('PASSWORD'))
+        return sync(tgt_token)
+    except Exception as e:
+        db.session.rollback()
+        record_run(name, status='error', result={'error': str(e)})
+        raise
+
+def sync_demand_revisions_job(app):
+    """Re-check the recent demand window for EPIAS revisions"""
+    try:
+        with app.app_context():
+            from ..services.ingest import sync_demand_revisions, DEMAND_REVISIONS_WATERMARK
+
+            app.logger.info(f"Demand revision job triggered at {datetime.now(timezone('Europe/Istanbul'))}")
+            result = _run_sync(app, DEMAND_REVISIONS_WATERMARK, sync_demand_revisions)
+            app.logger.info(f"Demand revision job checked {result['checked']} hours, revised {result['revised']}")
+
+    except Exception as e:
+        app.logger.error(f"Error in sync_demand_revisions_job: {str(e)}")
+        raise
+
+def sync_series_job(app, name):
+    """Ingest new production/demand hours since the stored watermark"""
+    try:
+        with app.app_context():
+            from ..services.ingest import sync_series
+
+            app.logger.info(f"{name} sync job triggered at {datetime.now(timezone('Europe/Istanbul'))}")
+            result = _run_sync(app, name, lambda tgt_token: sync_series(name, tgt_token))
+            app.logger.info(f"{name} sync added {result['inserted']} hours, revised {result['revised']}, watermark {result['end']}")
+
+    except Exception as e:
+        app.logger.error(f"Error in sync_series_job ({name}): {str(e)}")
+        raise
+
+def sync_solar_job(app, force=False):
+    """Sync licensed and unlicensed solar together from the Meteologica archives (every month re-parsed when ``force``)"""
+    try:
+        with app.app_context():
+            from ..database.config import db
+            from ..services.solar_sync import sync_solar, SOLAR_WATERMARK
+            from ..services.watermarks import record_run
+
+            app.logger.info(f"Solar sync job triggered at {datetime.now(timezone('Europe/Istanbul'))}")
+            try:
+                result = sync_solar(force=force)
+            except Exception as e:
+                db.session.rollback()
+                record_run(SOLAR_WATERMARK, status='error', result={'error': str(e)})
+                raise
+            app.logger.info(f"Solar sync added {result['inserted']} hours, revised {result['revised']}")
+
+    except Exception as e:
+        app.logger.error(f"Error in sync_solar_job: {str(e)}")
+        raise
+
+def update_forecast_metrics_job(app):
+    """Fold newly published PTF days into the daily forecast-error metrics"""
+    try:
+        with app.app_context():
+            from ..database.config import db
+            from ..services.forecast_metrics import sync_forecast_metrics, FORECAST_METRICS_WATERMARK
+            from ..services.forecast_performance import HORIZON_TABLES, comparison_tables
+            from ..services.market_mirror import market_engine
+            from ..services.watermarks import record_run
+
+            app.logger.info(f"Forecast metrics job triggered at {datetime.now(timezone('Europe/Istanbul'))}")
+            try:
+                tables = {t for horizon in HORIZON_TABLES for t in comparison_tables(horizon)}
+                result = sync_forecast_metrics(market_engine(*tables))
+            except Exception as e:
+                db.session.rollback()
+                record_run(FORECAST_METRICS_WATERMARK, status='error', result={'error': str(e)})
+                raise
+            app.logger.info(f"Forecast metrics job wrote {result['written']} daily rows")
+
+    except Exception as e:
+        app.logger.error(f"Error in update_forecast_metrics_job: {str(e)}")
+        raise
+
+def mirror_market_tables_job(app):
+    """Copy new and revised rows of the hot Supabase market tables into the local mirror, then rebuild meteologica_hourly"""
+    try:
+        with app.app_context():
+            from ..services.market_mirror import sync_market_mirror
+            from ..services.meteologica_hourly import sync_meteologica_hourly
+
+            results = sync_market_mirror()
+            failed = [name for name, result in results.items() if 'error' in result]
+            copied = sum(result.get('rows') or 0 for result in results.values())
+            app.logger.info(f"Market mirror copied {copied} rows into {len(results) - len(failed)} tables"
+                            + (f", failed: {', '.join(failed)}" if failed else ""))
+
+            hourly = sync_meteologica_hourly(results)
+            if hourly is not None:
+                app.logger.info(f"meteologica_hourly rebuilt {hourly['rows']} hours from {hourly['since'] or 'the start'}")
+
+    except Exception as e:
+        app.logger.error(f"Error in mirror_market_tables_job: {str(e)}")
+        raise
+
+def update_feature_store_job(app):
+    """Append the newest hours to the stored Chronos feature frames"""
+    try:
+        with app.app_context():
+            from ..database.config import db
+            from ..forecasting.utils import get_database_connection
+            from ..services.feature_store import sync_feature_store, FEATURE_STORE_WATERMARK
+            from ..services.watermarks import record_run
+
+            try:
+                result = sync_feature_store(get_database_connection())
+            except Exception as e:
+                db.session.rollback()
+                record_run(FEATURE_STORE_WATERMARK, status='error', result={'error': str(e)})
+                raise
+            app.logger.info(f"Feature store rebuilt {result['written']} rows from {result['since']}")
+
+    except Exception as e:
+        app.logger.error(f"Error in update_feature_store_job: {str(e)}")
+        raise
+
+def process_sync_requests(app):
+    """Run the syncs requested from the update endpoints since their last run"""
+    with app.app_context():
+        from ..services.ingest import SYNC_SERIES, DEMAND_REVISIONS_WATERMARK
+        from ..services.solar_sync import SOLAR_WATERMARK
+        from ..services.watermarks import clear_force_request, pending_requests
+
+        pending = pending_requests(list(SYNC_SERIES) + [SOLAR_WATERMARK, DEMAND_REVISIONS_WATERMARK])
+        for name, forced in pending.items():
+            if forced:
+                clear_force_request(name)
+    for name, forced in pending.items():
+        try:
+            if name == SOLAR_WATERMARK:
+                sync_solar_job(app, force=forced)
+            elif name == DEMAND_REVISIONS_WATERMARK:
+                sync_demand_revisions_job(app)
+            else:
+                sync_series_job(app, name)
+        except Exception:
+            # Already logged and recorded on the watermark; keep going with the other series
+            continue
+
 def init_scheduler(app):
     """Initialize the scheduler with proper timezone and error handling"""
     tz = timezone('Europe/Istanbul')
@@ -236,6 +388,100 @@ def init_scheduler(app):
         misfire_grace_time=900  # 15 minutes grace time
     )
 
+    # Schedule incremental production/demand ingest (hourly, a few minutes apart)
+    for name, minute in (('production', 20), ('demand', 25)):
+        scheduler.add_job(
+            sync_series_job,
+            trigger=CronTrigger(minute=minute, timezone=tz),
+            id=f'{name}_sync',
+            name=f'Ingest new {name} hours hourly at :{minute}',
+            args=[app, name],
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=300  # 5 minutes grace time
+        )
+
+    # Pick up syncs requested from the update endpoints (polls every minute)
+    scheduler.add_job(
+        process_sync_requests,
+        trigger=CronTrigger(minute='*', timezone=tz),
+        id='sync_requests',
+        name='Run requested production/demand/solar syncs',
+        args=[app],
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=30
+    )
+
+    # Schedule combined solar sync (hourly at :40)
+    scheduler.add_job(
+        sync_solar_job,
+        trigger=CronTrigger(minute=40, timezone=tz),
+        id='solar_sync',
+        name='Sync licensed and unlicensed solar hourly at :40',
+        args=[app],
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=300  # 5 minutes grace time
+    )
+
+    # Schedule forecast-error metrics after the day-ahead PTF publication (with a retry an hour later)
+    for hour in (14, 15):
+        scheduler.add_job(
+            update_forecast_metrics_job,
+            trigger=CronTrigger(hour=hour, minute=20, timezone=tz),
+            id=f'forecast_metrics_{hour}',
+            name=f'Update daily forecast-error metrics at {hour}:20',
+            args=[app],
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=900  # 15 minutes grace time
+        )
+
+    # Schedule the local market-table mirror (every 15 minutes)
+    scheduler.add_job(
+        mirror_market_tables_job,
+        trigger=CronTrigger(minute='5,20,35,50', timezone=tz),
+        id='market_mirror',
+        name='Mirror Supabase market tables every 15 minutes',
+        args=[app],
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=300  # 5 minutes grace time
+    )
+
+    # Schedule the Chronos feature store (hourly at :25, after the :20 mirror run)
+    scheduler.add_job(
+        update_feature_store_job,
+        trigger=CronTrigger(minute=25, timezone=tz),
+        id='feature_store',
+        name='Append new hours to the Chronos feature store at :25',
+        args=[app],
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=300  # 5 minutes grace time
+    )
+
+    # Schedule demand revision pass (every 6 hours at :50)
+    demand_revisions = CronTrigger(hour='*/6', minute=50, timezone=tz)
+    scheduler.add_job(
+        sync_demand_revisions_job,
+        trigger=demand_revisions,
+        id='demand_revision_sync',
+        name='Check demand revisions every 6 hours at :50',
+        args=[app],
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=900  # 15 minutes grace time
+    )
+
     # Add error listener
     def job_listener(event):
         """Handle different types of scheduler events"""
@@ -268,6 +514,6 @@ def init_scheduler(app):
     
     try:
         scheduler.start()
-        app.logger.info(f"Scheduler started at {datetime.now(tz)}. Daily updates at 16:05 (retry at 16:45), hourly updates at :30, realtime updates at 05:00 and 12:00, email report at 16:10")
+        app.logger.info(f"Scheduler started at {datetime.now(tz)}. Daily updates at 16:05 (retry at 16:45), hourly updates at :30, realtime updates at 05:00 and 12:00, email report at 16:10, production/demand sync at :20/:25, demand revisions every 6 hours at :50")
     except Exception as e:
         app.logger.error(f"Error starting scheduler: {str(e)}")
\ No newline at end of file
@@ -6,7 +6,8 @@ bind = f"0.0.0.0:{port}"
 
 # 2 workers × 4 threads = 8 concurrent request slots.
 # gthread avoids forking the heavy ML process memory on each worker start.
-workers = 2
-threads = 4
+# app/database/supabase.py sizes its pool from the same two variables.
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
 worker_class = "gthread"
 timeout = 180
@@ -0,0 +1,44 @@
+"""create rolling daily state table
+
+Revision ID: 20260301000001
+Revises: 20250814000001
+Create Date: 2026-03-01 00:00:01.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '20260301000001'
+down_revision = '20250814000001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'rolling_daily_state' not in inspector.get_table_names():
+        op.create_table('rolling_daily_state',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('series', sa.String(length=32), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('daily_avg', sa.Float(), nullable=True),
+            sa.Column('hours', sa.Integer(), nullable=False),
+            sa.Column('window_sum', sa.Float(), nullable=True),
+            sa.Column('window_count', sa.Integer(), nullable=False),
+            sa.Column('rolling_avg', sa.Float(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('series', 'day', name='uq_rolling_daily_state_series_day')
+        )
+        op.create_index(op.f('ix_rolling_daily_state_day'), 'rolling_daily_state', ['day'], unique=False)
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'rolling_daily_state' in inspector.get_table_names():
+        op.drop_index(op.f('ix_rolling_daily_state_day'), table_name='rolling_daily_state')
+        op.drop_table('rolling_daily_state')
@@ -0,0 +1,106 @@
+"""create demand rollup tables
+
+Revision ID: 20260301000002
+Revises: 20260301000001
+Create Date: 2026-03-01 00:00:02.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '20260301000002'
+down_revision = '20260301000001'
+branch_labels = None
+depends_on = None
+
+def _aggregate_columns():
+    return [
+        sa.Column('consumption_sum', sa.Float(), nullable=False),
+        sa.Column('consumption_mean', sa.Float(), nullable=False),
+        sa.Column('consumption_peak', sa.Float(), nullable=False),
+        sa.Column('hours_present', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    ]
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    tables = inspector.get_table_names()
+
+    if 'demand_daily_rollup' not in tables:
+        op.create_table('demand_daily_rollup',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            *_aggregate_columns(),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('day')
+        )
+
+    if 'demand_weekly_rollup' not in tables:
+        op.create_table('demand_weekly_rollup',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('iso_year', sa.Integer(), nullable=False),
+            sa.Column('iso_week', sa.Integer(), nullable=False),
+            sa.Column('week_start', sa.Date(), nullable=False),
+            *_aggregate_columns(),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('iso_year', 'iso_week', name='uq_demand_weekly_rollup_iso_week')
+        )
+
+    if 'demand_monthly_rollup' not in tables:
+        op.create_table('demand_monthly_rollup',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('year', sa.Integer(), nullable=False),
+            sa.Column('month', sa.Integer(), nullable=False),
+            *_aggregate_columns(),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('year', 'month', name='uq_demand_monthly_rollup_year_month')
+        )
+
+    # Build the history from what demand_data already holds.  Outside the guards: the app's
+    # create_all usually creates these tables before the upgrade runs
+    op.execute("""
+        INSERT INTO demand_daily_rollup (day, consumption_sum, consumption_mean, consumption_peak, hours_present, updated_at)
+        SELECT datetime::date, SUM(consumption), AVG(consumption), MAX(consumption), COUNT(*), NOW()
+        FROM demand_data
+        GROUP BY 1
+        ON CONFLICT (day) DO UPDATE SET
+            consumption_sum = EXCLUDED.consumption_sum, consumption_mean = EXCLUDED.consumption_mean,
+            consumption_peak = EXCLUDED.consumption_peak, hours_present = EXCLUDED.hours_present,
+            updated_at = EXCLUDED.updated_at
+    """)
+    op.execute("""
+        INSERT INTO demand_weekly_rollup (iso_year, iso_week, week_start, consumption_sum, consumption_mean, consumption_peak, hours_present, updated_at)
+        SELECT EXTRACT(isoyear FROM datetime)::int, EXTRACT(week FROM datetime)::int,
+               MIN(date_trunc('week', datetime))::date,
+               SUM(consumption), AVG(consumption), MAX(consumption), COUNT(*), NOW()
+        FROM demand_data
+        GROUP BY 1, 2
+        ON CONFLICT (iso_year, iso_week) DO UPDATE SET
+            week_start = EXCLUDED.week_start,
+            consumption_sum = EXCLUDED.consumption_sum, consumption_mean = EXCLUDED.consumption_mean,
+            consumption_peak = EXCLUDED.consumption_peak, hours_present = EXCLUDED.hours_present,
+            updated_at = EXCLUDED.updated_at
+    """)
+    op.execute("""
+        INSERT INTO demand_monthly_rollup (year, month, consumption_sum, consumption_mean, consumption_peak, hours_present, updated_at)
+        SELECT EXTRACT(year FROM datetime)::int, EXTRACT(month FROM datetime)::int,
+               SUM(consumption), AVG(consumption), MAX(consumption), COUNT(*), NOW()
+        FROM demand_data
+        GROUP BY 1, 2
+        ON CONFLICT (year, month) DO UPDATE SET
+            consumption_sum = EXCLUDED.consumption_sum, consumption_mean = EXCLUDED.consumption_mean,
+            consumption_peak = EXCLUDED.consumption_peak, hours_present = EXCLUDED.hours_present,
+            updated_at = EXCLUDED.updated_at
+    """)
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    tables = inspector.get_table_names()
+
+    for table in ('demand_monthly_rollup', 'demand_weekly_rollup', 'demand_daily_rollup'):
+        if table in tables:
+            op.drop_table(table)
@@ -0,0 +1,40 @@
+"""create sync watermark table
+
+Revision ID: 20260301000003
+Revises: 20260301000002
+Create Date: 2026-03-01 00:00:03.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '20260301000003'
+down_revision = '20260301000002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'sync_watermark' not in inspector.get_table_names():
+        op.create_table('sync_watermark',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=64), nullable=False),
+            sa.Column('watermark', sa.DateTime(), nullable=True),
+            sa.Column('last_run_at', sa.DateTime(), nullable=True),
+            sa.Column('last_status', sa.String(length=16), nullable=True),
+            sa.Column('last_result', sa.JSON(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name')
+        )
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'sync_watermark' in inspector.get_table_names():
+        op.drop_table('sync_watermark')
@@ -0,0 +1,32 @@
+"""add requested_at to sync watermark
+
+Revision ID: 20260301000004
+Revises: 20260301000003
+Create Date: 2026-03-01 00:00:04.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '20260301000004'
+down_revision = '20260301000003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    columns = [c['name'] for c in inspector.get_columns('sync_watermark')]
+    if 'requested_at' not in columns:
+        op.add_column('sync_watermark', sa.Column('requested_at', sa.DateTime(), nullable=True))
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    columns = [c['name'] for c in inspector.get_columns('sync_watermark')]
+    if 'requested_at' in columns:
+        op.drop_column('sync_watermark', 'requested_at')
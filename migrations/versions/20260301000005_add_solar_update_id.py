@@ -0,0 +1,40 @@
+"""add update_id to solar tables
+
+Revision ID: 20260301000005
+Revises: 20260301000004
+Create Date: 2026-03-01 00:00:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '20260301000005'
+down_revision = '20260301000004'
+branch_labels = None
+depends_on = None
+
+TABLES = ['unlicensed_solar_data', 'licensed_solar_data']
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    for table in TABLES:
+        if table not in inspector.get_table_names():
+            continue
+        columns = [c['name'] for c in inspector.get_columns(table)]
+        if 'update_id' not in columns:
+            op.add_column(table, sa.Column('update_id', sa.String(length=50), nullable=True))
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    for table in TABLES:
+        if table not in inspector.get_table_names():
+            continue
+        columns = [c['name'] for c in inspector.get_columns(table)]
+        if 'update_id' in columns:
+            op.drop_column(table, 'update_id')
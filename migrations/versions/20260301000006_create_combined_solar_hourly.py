@@ -0,0 +1,61 @@
+"""create combined solar hourly table
+
+Revision ID: 20260301000006
+Revises: 20260301000005
+Create Date: 2026-03-01 00:00:06.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '20260301000006'
+down_revision = '20260301000005'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'combined_solar_hourly' not in inspector.get_table_names():
+        op.create_table('combined_solar_hourly',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('datetime', sa.DateTime(), nullable=False),
+            sa.Column('unlicensed_solar', sa.Float(), nullable=True),
+            sa.Column('licensed_solar', sa.Float(), nullable=True),
+            sa.Column('solar_combined', sa.Float(), nullable=False),
+            sa.Column('has_unlicensed', sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column('has_licensed', sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('datetime')
+        )
+
+    # Build the table from what the two solar tables already hold.  Outside the guard: the app's
+    # create_all usually creates the table before the upgrade runs
+    op.execute("""
+        INSERT INTO combined_solar_hourly
+            (datetime, unlicensed_solar, licensed_solar, solar_combined, has_unlicensed, has_licensed, updated_at)
+        SELECT hour_start, u.value, l.value, COALESCE(u.value, 0) + COALESCE(l.value, 0),
+               u.value IS NOT NULL, l.value IS NOT NULL, NOW()
+        FROM (SELECT date_trunc('hour', datetime) AS hour_start, AVG(unlicensed_solar) AS value
+              FROM unlicensed_solar_data GROUP BY 1) u
+        FULL OUTER JOIN (SELECT date_trunc('hour', datetime) AS hour_start, AVG(licensed_solar) AS value
+              FROM licensed_solar_data GROUP BY 1) l USING (hour_start)
+        ON CONFLICT (datetime) DO UPDATE SET
+            unlicensed_solar = EXCLUDED.unlicensed_solar,
+            licensed_solar = EXCLUDED.licensed_solar,
+            solar_combined = EXCLUDED.solar_combined,
+            has_unlicensed = EXCLUDED.has_unlicensed,
+            has_licensed = EXCLUDED.has_licensed,
+            updated_at = EXCLUDED.updated_at
+    """)
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'combined_solar_hourly' in inspector.get_table_names():
+        op.drop_table('combined_solar_hourly')
@@ -0,0 +1,46 @@
+"""create daily forecast error metrics table
+
+Revision ID: 20260301000007
+Revises: 20260301000006
+Create Date: 2026-03-01 00:00:07.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '20260301000007'
+down_revision = '20260301000006'
+branch_labels = None
+depends_on = None
+
+SUM_COLUMNS = ['sum_abs_error', 'sum_sq_error', 'sum_error', 'sum_actual', 'sum_abs_actual', 'sum_sq_actual']
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'forecast_error_daily' not in inspector.get_table_names():
+        op.create_table('forecast_error_daily',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('horizon', sa.String(length=8), nullable=False),
+            sa.Column('source', sa.String(length=32), nullable=False),
+            sa.Column('hours', sa.Integer(), nullable=False),
+            *[sa.Column(name, sa.Float(), nullable=False) for name in SUM_COLUMNS],
+            sa.Column('direction_hits', sa.Integer(), nullable=False),
+            sa.Column('direction_hours', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('day', 'horizon', 'source', name='uq_forecast_error_daily_day_horizon_source')
+        )
+        op.create_index('ix_forecast_error_daily_day', 'forecast_error_daily', ['day'])
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'forecast_error_daily' in inspector.get_table_names():
+        op.drop_index('ix_forecast_error_daily_day', table_name='forecast_error_daily')
+        op.drop_table('forecast_error_daily')
@@ -0,0 +1,48 @@
+"""create stored chronos feature table
+
+Revision ID: 20260301000008
+Revises: 20260301000007
+Create Date: 2026-03-01 00:00:08.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '20260301000008'
+down_revision = '20260301000007'
+branch_labels = None
+depends_on = None
+
+FEATURE_COLUMNS = [
+    'demand', 'wind', 'hydro', 'solar', 'ptf', 'system_direction', 'is_holiday', 'is_ramadan', 'hour',
+    'is_peak_off_peak1', 'is_peak_off_peak2', 'is_peak_peak',
+    'week_part_Saturday', 'week_part_Sunday', 'week_part_Weekday',
+    'demand_renewable_diff', 'demand_diff24', 'smf_lag24', 'smf_lag168', 'smf_ptf_diff_lag24',
+    'system_direction_lag1', 'system_direction_ma3', 'system_direction_ma6', 'system_direction_ma12',
+]
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'chronos_feature_hourly' not in inspector.get_table_names():
+        op.create_table('chronos_feature_hourly',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('model_variant', sa.String(length=16), nullable=False),
+            sa.Column('date', sa.DateTime(), nullable=False),
+            *[sa.Column(name, sa.Float(), nullable=True) for name in FEATURE_COLUMNS],
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('model_variant', 'date', name='uq_chronos_feature_hourly_variant_date')
+        )
+        op.create_index('ix_chronos_feature_hourly_date', 'chronos_feature_hourly', ['date'])
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'chronos_feature_hourly' in inspector.get_table_names():
+        op.drop_index('ix_chronos_feature_hourly_date', table_name='chronos_feature_hourly')
+        op.drop_table('chronos_feature_hourly')
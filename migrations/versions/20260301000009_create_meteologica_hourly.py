@@ -0,0 +1,37 @@
+"""create wide hourly meteologica forecast table
+
+Revision ID: 20260301000009
+Revises: 20260301000008
+Create Date: 2026-03-01 00:00:09.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '20260301000009'
+down_revision = '20260301000008'
+branch_labels = None
+depends_on = None
+
+SERIES_COLUMNS = ['demand', 'price', 'wind', 'licensed_solar', 'unlicensed_solar', 'runofriver_hydro', 'dam_hydro']
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'meteologica_hourly' not in inspector.get_table_names():
+        op.create_table('meteologica_hourly',
+            sa.Column('date', sa.DateTime(), nullable=False),
+            *[sa.Column(name, sa.Float(), nullable=True) for name in SERIES_COLUMNS],
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('date')
+        )
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'meteologica_hourly' in inspector.get_table_names():
+        op.drop_table('meteologica_hourly')
@@ -0,0 +1,33 @@
+"""add force_requested to sync watermark
+
+Revision ID: 20260301000010
+Revises: 20260301000009
+Create Date: 2026-03-01 00:00:10.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '20260301000010'
+down_revision = '20260301000009'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    columns = [c['name'] for c in inspector.get_columns('sync_watermark')]
+    if 'force_requested' not in columns:
+        op.add_column('sync_watermark', sa.Column('force_requested', sa.Boolean(), nullable=False,
+                                                  server_default=sa.false()))
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    columns = [c['name'] for c in inspector.get_columns('sync_watermark')]
+    if 'force_requested' in columns:
+        op.drop_column('sync_watermark', 'force_requested')
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.forecast_metrics import SUM_COLUMNS, hourly_contributions, metrics_from_sums
+
+
+@pytest.fixture(scope="module")
+def frame():
+    """Three days of hourly PTF and forecasts, with gaps in both"""
+    rng = np.random.default_rng(7)
+    dates = pd.date_range('2026-03-01', periods=72, freq='h')
+    actual = 2500 + 400 * np.sin(np.arange(72) / 24 * 2 * np.pi) + rng.normal(0, 80, 72)
+    frame = pd.DataFrame({
+        'date': dates,
+        'actual_price': actual,
+        'best_price': actual + rng.normal(0, 120, 72),
+        'meteologica_avg': actual + rng.normal(30, 200, 72),
+    })
+    frame.loc[[5, 40], 'actual_price'] = np.nan
+    frame.loc[[10, 23, 24, 50], 'best_price'] = np.nan
+    return frame
+
+
+def _direct(frame, column):
+    """The page's metrics computed over every hour at once, plus the direction hit rate"""
+    valid = frame.dropna(subset=['actual_price', column])
+    a, f = valid['actual_price'].to_numpy(), valid[column].to_numpy()
+    ss_tot = np.sum((a - a.mean()) ** 2)
+    metrics = {
+        'wmape': round(float(np.sum(np.abs(a - f)) / np.sum(np.abs(a)) * 100), 2),
+        'rmse': round(float(np.sqrt(np.mean((a - f) ** 2))), 2),
+        'r2': round(float(1 - np.sum((a - f) ** 2) / ss_tot), 2),
+    }
+    rows = frame.dropna(subset=['actual_price']).reset_index(drop=True)
+    hits = pairs = 0
+    for previous, current in zip(rows.iloc[:-1].itertuples(), rows.iloc[1:].itertuples()):
+        if current.date - previous.date != pd.Timedelta(hours=1):
+            continue
+        prev_f, cur_f = getattr(previous, column), getattr(current, column)
+        if pd.isna(prev_f) or pd.isna(cur_f):
+            continue
+        pairs += 1
+        hits += np.sign(cur_f - prev_f) == np.sign(current.actual_price - previous.actual_price)
+    return metrics, hits, pairs
+
+
+@pytest.mark.parametrize('column', ['best_price', 'meteologica_avg'])
+def test_summed_daily_rows_reproduce_the_direct_metrics(frame, column):
+    hourly = hourly_contributions(frame)
+    daily = hourly.groupby(['day', 'source'])[SUM_COLUMNS].sum().reset_index()
+    assert daily['day'].nunique() == 3
+
+    totals = daily[daily['source'] == column][SUM_COLUMNS].sum()
+    metrics = metrics_from_sums(totals)
+    expected, hits, pairs = _direct(frame, column)
+
+    for key in ('wmape', 'rmse', 'r2'):
+        assert metrics[key] == pytest.approx(expected[key], abs=0.01), key
+    assert metrics['hours'] == len(frame.dropna(subset=['actual_price', column]))
+    assert (totals['direction_hits'], totals['direction_hours']) == (hits, pairs)
+    assert metrics['hit_rate'] == round(hits / pairs * 100, 2)
+
+
+def test_direction_pairs_span_the_day_boundary(frame):
+    hourly = hourly_contributions(frame)
+    midnight = hourly[(hourly['source'] == 'meteologica_avg') & (hourly['date'] == pd.Timestamp('2026-03-02'))]
+    # 00:00 on the second day is compared with 23:00 of the first, which is stored under the first day
+    assert midnight['direction_hours'].tolist() == [1]
+    first_hour = hourly[(hourly['source'] == 'meteologica_avg') & (hourly['date'] == pd.Timestamp('2026-03-01'))]
+    assert first_hour['direction_hours'].tolist() == [0]
+
+
+def test_no_hours_gives_zero_metrics():
+    assert metrics_from_sums({'hours': 0})['wmape'] == 0
@@ -0,0 +1,114 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.merit_order import MeritOrderCurves, evaluate_scenarios, scenario_error
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'merit_order_curves.json')
+
+
+@pytest.fixture(scope="module")
+def recorded():
+    """Curves, capacity-delta scenarios and the prices the per-hour pandas implementation gave for them"""
+    with open(FIXTURE) as f:
+        data = json.load(f)
+    curves = pd.DataFrame(data['curves'])
+    curves['capacity(Δ)'] = curves['demand'] + curves['supply']
+    return curves, data['scenarios'], data['expected']
+
+
+def test_prices_match_recorded_results(recorded):
+    curves, scenarios, expected = recorded
+    engine = MeritOrderCurves(curves)
+    for name, deltas in scenarios.items():
+        assert engine.prices(deltas).tolist() == expected[name], name
+
+
+def test_price_matrix_matches_single_scenarios(recorded):
+    curves, scenarios, expected = recorded
+    engine = MeritOrderCurves(curves)
+    full = [name for name, deltas in scenarios.items() if len(deltas) >= len(engine.hours)]
+    matrix = engine.price_matrix([scenarios[name][:len(engine.hours)] for name in full])
+    assert matrix.shape == (len(full), 24)
+    for row, name in zip(matrix, full):
+        assert row.tolist() == expected[name], name
+
+
+def test_missing_delta_gives_no_price(recorded):
+    curves, scenarios, expected = recorded
+    deltas = list(scenarios['typical'])
+    deltas[3] = float('nan')
+    prices = MeritOrderCurves(curves).prices(deltas)
+    assert np.isnan(prices[3])
+    assert [p for i, p in enumerate(prices) if i != 3] == [p for i, p in enumerate(expected['typical']) if i != 3]
+
+
+@pytest.fixture(scope="module")
+def scenario_inputs(recorded):
+    """Base diff from the 'typical' deltas and an AIC pivot that only covers the first 12 hours"""
+    curves, scenarios, _expected = recorded
+    engine = MeritOrderCurves(curves)
+    diff = pd.DataFrame({'hour': engine.hours, 'capacity_delta': scenarios['typical'][:len(engine.hours)]})
+    aic = pd.DataFrame([[100.0] * 12, [250.0] * 12], index=['PLANT A', 'PLANT B'], columns=engine.hours[:12])
+    return engine, diff, aic
+
+
+def test_scenarios_apply_overrides_then_remove_plants(scenario_inputs):
+    engine, diff, aic = scenario_inputs
+    base = diff['capacity_delta'].to_numpy(dtype=float)
+    first, last = engine.hours[0], engine.hours[-1]
+    result = evaluate_scenarios(diff, engine, [
+        {'name': 'base'},
+        {'capacity_deltas': {first: 500, last: '-750.5'}},
+        {'remove_plants': ['PLANT A', 'PLANT B']},
+        {'capacity_deltas': {first: 500}, 'remove_plants': 'PLANT A'},
+    ], aic)
+
+    assert result['hours'] == engine.hours
+    deltas = result['deltas']
+    assert deltas[0].tolist() == base.tolist()
+    assert deltas[1][0] == 500 and deltas[1][-1] == -750.5
+    assert deltas[1][1:-1].tolist() == base[1:-1].tolist()
+    # AIC is subtracted where the pivot has the hour; the hours it lacks count as 0
+    assert deltas[2][:12].tolist() == (base[:12] - 350).tolist()
+    assert deltas[2][12:].tolist() == base[12:].tolist()
+    # An override sets the hour's delta, the removal then comes off it
+    assert deltas[3][0] == 400
+    assert deltas[3][1:12].tolist() == (base[1:12] - 100).tolist()
+
+    assert result['base'].tolist() == engine.prices(base).tolist()
+    for row, scenario_deltas in zip(result['prices'], deltas):
+        assert row.tolist() == engine.prices(scenario_deltas).tolist()
+
+
+def test_unknown_plants_are_reported_and_left_out(scenario_inputs):
+    engine, diff, aic = scenario_inputs
+    result = evaluate_scenarios(diff, engine, [{'remove_plants': ['PLANT A', 'NO SUCH PLANT']}], aic)
+    assert result['unknown_plants'] == [['NO SUCH PLANT']]
+    assert result['deltas'][0][:12].tolist() == (diff['capacity_delta'][:12] - 100).tolist()
+
+    without_aic = evaluate_scenarios(diff, engine, [{'remove_plants': ['PLANT A']}], None)
+    assert without_aic['unknown_plants'] == [['PLANT A']]
+    assert without_aic['deltas'][0].tolist() == diff['capacity_delta'].tolist()
+
+
+@pytest.mark.parametrize('scenario', [
+    {'capacity_deltas': {'00:00': True}},
+    {'capacity_deltas': {'00:00': 'abc'}},
+    {'capacity_deltas': {'00:00': None}},
+    {'capacity_deltas': {'00:00': [1]}},
+    {'capacity_deltas': [100]},
+    {'remove_plants': [['PLANT A']]},
+    {'remove_plants': 5},
+])
+def test_malformed_scenarios_are_rejected(scenario):
+    assert scenario_error(scenario) is not None
+
+
+def test_well_formed_scenarios_pass():
+    assert scenario_error({}) is None
+    assert scenario_error({'remove_plants': 'PLANT A', 'capacity_deltas': {'00:00': 10, '01:00': -2.5, '02:00': '7'}}) is None
+    assert scenario_error({'remove_plants': ['PLANT A', 'PLANT B']}) is None
@@ -0,0 +1,55 @@
+import io
+import json
+import zipfile
+
+import pandas as pd
+
+from app.services.meteologica import parse_hourly_zip
+
+
+def _archive(members):
+    """In-memory month archive of ``{member name: payload}`` (a str payload is stored as is)"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, payload in members.items():
+            archive.writestr(name, payload if isinstance(payload, str) else json.dumps(payload))
+    return buffer.getvalue()
+
+
+def _issue(value):
+    return {'data': [{'forecast': value}]}
+
+
+ARCHIVE = _archive({
+    # 00:00 hour: the earliest issue is kept
+    '1430_202601010000.json': _issue(10),
+    '1430_202601010015.json': _issue(11),
+    # 01:00 hour: the earliest issue is not valid JSON, the next one has no forecast
+    '1430_202601010100.json': 'not json',
+    '1430_202601010110.json': {'data': [{'forecast': None}]},
+    '1430_202601010120.json': _issue(21),
+    '1430_202601010130.json': _issue(22),
+    # 02:00 hour: a single issue published late in the hour
+    '1430_202601010245.json': _issue(30),
+    # 03:00 hour: nothing usable at all
+    '1430_202601010300.json': {'data': []},
+    'readme.txt': 'ignored',
+})
+
+
+def test_keeps_the_earliest_issue_with_a_value_per_hour():
+    frame = parse_hourly_zip(ARCHIVE, 'unlicensed_solar')
+    assert frame['datetime'].tolist() == list(pd.date_range('2026-01-01', periods=3, freq='h'))
+    assert frame['unlicensed_solar'].tolist() == [10.0, 21.0, 30.0]
+    assert frame['update_id'].tolist() == ['202601010000', '202601010120', '202601010245']
+
+
+def test_since_skips_the_hours_before_that_issue():
+    frame = parse_hourly_zip(ARCHIVE, 'unlicensed_solar', since='202601010110')
+    assert frame['datetime'].tolist() == list(pd.date_range('2026-01-01 01:00', periods=2, freq='h'))
+    assert frame['unlicensed_solar'].tolist() == [21.0, 30.0]
+
+
+def test_empty_source_gives_an_empty_frame():
+    assert parse_hourly_zip(None, 'licensed_solar').columns.tolist() == ['datetime', 'licensed_solar', 'update_id']
+    assert parse_hourly_zip(ARCHIVE, 'licensed_solar', since='202602010000').empty